@@ -1,138 +1,285 @@
-import pinecone
+import logging
 import os
-from typing import Any, Dict, List, Optional
-from langchain_groq import ChatGroq
-from langchain_pinecone import PineconeVectorStore
+from typing import Any, Dict, Iterator, List, Optional
 from langchain.embeddings.base import Embeddings
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_core.output_parsers import StrOutputParser
 from langchain.schema import Document
 
-def uni_agent(query: str, embedding_model: Embeddings) -> str:
+from app.core.config import (
+    ANSWER_CACHE,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    EXPANSION_CONFIDENCE,
+    HYBRID_FUSED_K,
+    HYBRID_SEARCH,
+    MAX_CHUNKS_PER_PAGE,
+    METADATA_FILTER,
+    QUERY_EXPANSION,
+    VECTOR_BACKEND,
+)
+from app.core.retrieval import MultiQueryRetrieval, RetrievalResult, dedupe_pages, format_context, section_filter
+from app.core.scheduler import RequestAborted, check_deadline
+from app.core.streaming import ErrorMessage, timed_stream
+from app.utils.clients import get_llm, get_or_create, get_or_create_versioned
+from app.utils.keyword_index import BM25Index, keyword_index_path
+from app.utils.semantic_cache import SemanticCache
+from app.utils.vector_store import get_vector_store, read_index_version, read_sections
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "aup-website-data"
+
+# Multi-query generation prompt
+QUERY_PROMPT = PromptTemplate(
+    input_variables=["question"],
+    template="""<think>
+    I need to generate multiple versions of this question to improve vector search retrieval.
+    I should consider:
+    1. Different phrasings of the same core question
+    2. More specific versions of the question
+    3. More general versions of the question
+    4. Questions that focus on different aspects of the topic
+    5. Questions that use different terminology for the same concepts
+    </think>
+
+    Generate five different versions of the given question to improve retrieval of relevant documents.
+    Create variations that might match different ways the information could be stored in a university knowledge base.
+
+    Original question: {question}
+
+    Provide exactly 5 alternative questions, each on a new line, without numbering or explanation:
+    """,
+)
+
+# Response generation prompt
+RESPONSE_TEMPLATE = """<think>
+I'm analyzing a university-related question and the retrieved context. I need to:
+1. Identify the specific information request
+2. Determine if the context contains the answer
+3. Plan how to structure my response to be most helpful
+4. Identify any key university policies, procedures, or details to include
+</think>
+
+You are a specialized university information assistant with access to the institution's knowledge base.
+
+CONTEXT INFORMATION:
+{context}
+
+STUDENT QUESTION:
+{question}
+
+INSTRUCTIONS:
+- Answer the question comprehensively using ONLY information from the provided context
+- Structure your response with clear headings and organized sections
+- Include specific details, dates, requirements, and procedures relevant to the question
+- When referencing forms or applications, include how to access them
+- Specify relevant departments, offices, or contact information when applicable
+- If the context doesn't fully answer the question, clearly state what information is available
+  and what's missing, suggesting where the student might find complete information
+- Maintain a helpful, informative tone throughout your response
+"""
+
+
+class UniAgent:
     """
-    Handle university-specific inquiries using a retrieval-augmented generation approach.
-    
+    Retrieval-augmented generation pipeline over the university knowledge base.
+
+    The vector store, retrieval stage, LLM client and chain are built once and reused
+    for every question, so an instance can be shared by concurrent sessions.
+    """
+
+    def __init__(self, embedding_model: Embeddings, index_name: str = INDEX_NAME):
+        # Set up the language model
+        self.prompt = ChatPromptTemplate.from_template(RESPONSE_TEMPLATE)
+        self.llm = get_llm("deepseek-r1-distill-llama-70b", max_tokens=2048)
+
+        # Set up vector store and retriever
+        self.vector_store = get_vector_store(embedding_model, index_name)
+
+        # Keyword index built at ingest time, if available
+        keyword_path = keyword_index_path(index_name)
+        self.keyword_index = BM25Index.load(keyword_path) if HYBRID_SEARCH and os.path.exists(keyword_path) else None
+
+        # Site sections recorded by page-aware ingestion, used to narrow searches
+        self.sections = read_sections(index_name) if METADATA_FILTER else {}
+
+        # Adaptive multi-query retrieval: variants are only generated when the
+        # original question does not find a confident match on its own
+        self.retrieval = MultiQueryRetrieval(
+            vector_store=self.vector_store,
+            llm=self.llm,
+            query_prompt=QUERY_PROMPT,
+            k=3,  # Increase number of results
+            score_threshold=0.4,  # Slightly lower threshold for better recall
+            confidence=EXPANSION_CONFIDENCE,
+            expansion=QUERY_EXPANSION,
+            keyword_index=self.keyword_index,
+            fused_k=HYBRID_FUSED_K,
+        )
+
+        # Set up the chain
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
+        self.chain = {"context": self.get_context, "question": lambda x: x} | self.answer_chain
+
+    def retrieve(self, query_str: str) -> RetrievalResult:
+        """
+        Retrieve context documents together with the queries used and stage timings.
+
+        Questions that name a site section are searched within it first,
+        without query expansion. Unless that finds a match as confident as
+        EXPANSION_CONFIDENCE, the whole index is searched instead, so a
+        question that merely uses a section's name ("home", "news") is not
+        confined to it.
+        """
+        metadata_filter = section_filter(query_str, self.sections)
+        if metadata_filter:
+            result = self.retrieval.retrieve(query_str, filter=metadata_filter, expand=False)
+            if result.documents and result.best_relevance >= EXPANSION_CONFIDENCE:
+                return result
+            logger.info("No confident match within %s (best relevance %.3f), searching the whole index",
+                        metadata_filter, result.best_relevance)
+        return self.retrieval.retrieve(query_str)
+
+    def get_context(self, query_str: str) -> str:
+        """Retrieve and format the prompt context, stopping if the request's deadline passed meanwhile"""
+        return self._format_context(self.get_relevant_documents(query_str))
+
+    def _format_context(self, documents: List[Document]) -> str:
+        context = format_context(documents)
+        check_deadline("answer generation")
+        return context
+
+    def get_relevant_documents(self, query_str: str) -> List[Document]:
+        """Retrieve context documents, returning an error document (see retrieval_failed) on failure"""
+        try:
+            return dedupe_pages(self.retrieve(query_str).documents, MAX_CHUNKS_PER_PAGE)
+        except Exception as e:
+            logger.warning("University retrieval failed: %s", e)
+            # Return a document with the error information
+            return [Document(
+                page_content="Error retrieving information from the university knowledge base. " +
+                            "The system may be experiencing technical difficulties.",
+                metadata={"error": str(e)}
+            )]
+
+    def invoke(self, query: str) -> str:
+        """Answer a university question"""
+        return self.chain.invoke(query)
+
+    def stream(self, query: str) -> Iterator[str]:
+        """
+        Answer a university question, yielding text chunks as the model produces them.
+
+        When retrieval failed, the answer (which explains the failure) ends
+        with an empty ErrorMessage so that it is not cached.
+        """
+        documents = self.get_relevant_documents(query)
+        yield from self.answer_chain.stream({"context": self._format_context(documents), "question": query})
+        if retrieval_failed(documents):
+            yield ErrorMessage("")
+
+def retrieval_failed(documents: List[Document]) -> bool:
+    """Whether documents are the error placeholder returned when retrieval failed"""
+    return any("error" in doc.metadata for doc in documents)
+
+def get_uni_agent(embedding_model: Embeddings) -> UniAgent:
+    """
+    Get the process-wide university agent for an embedding model.
+
+    The agent is rebuilt when storeEmbedding.py re-indexes the corpus, so the
+    local index, keyword index and sections are re-opened from the new files.
+
     Args:
-        query: The user's university-related question
         embedding_model: The embedding model for vector search
-        
+
     Returns:
-        A comprehensive response based on university knowledge base
+        The shared UniAgent instance
     """
-    # Get Pinecone API key from environment
-    pinecone_api_key = os.getenv("PINECONE_API_KEY")
-    if not pinecone_api_key:
-        return "Error: Pinecone API key not found. Please check your environment variables."
-
-    # Initialize Pinecone
-    pc = pinecone.Pinecone(api_key=pinecone_api_key)
-    
-    # Multi-query generation prompt
-    QUERY_PROMPT = PromptTemplate(
-        input_variables=["question"],
-        template="""<think>
-        I need to generate multiple versions of this question to improve vector search retrieval.
-        I should consider:
-        1. Different phrasings of the same core question
-        2. More specific versions of the question
-        3. More general versions of the question
-        4. Questions that focus on different aspects of the topic
-        5. Questions that use different terminology for the same concepts
-        </think>
-        
-        Generate five different versions of the given question to improve retrieval of relevant documents.
-        Create variations that might match different ways the information could be stored in a university knowledge base.
-        
-        Original question: {question}
-        
-        Provide exactly 5 alternative questions, each on a new line, without numbering or explanation:
-        """,
+    return get_or_create_versioned(
+        ("uni_agent", id(embedding_model)), read_index_version(INDEX_NAME), lambda: UniAgent(embedding_model)
     )
 
-    # Response generation prompt
-    template = """<think>
-    I'm analyzing a university-related question and the retrieved context. I need to:
-    1. Identify the specific information request
-    2. Determine if the context contains the answer
-    3. Plan how to structure my response to be most helpful
-    4. Identify any key university policies, procedures, or details to include
-    </think>
-    
-    You are a specialized university information assistant with access to the institution's knowledge base.
-    
-    CONTEXT INFORMATION:
-    {context}
-    
-    STUDENT QUESTION:
-    {question}
-    
-    INSTRUCTIONS:
-    - Answer the question comprehensively using ONLY information from the provided context
-    - Structure your response with clear headings and organized sections
-    - Include specific details, dates, requirements, and procedures relevant to the question
-    - When referencing forms or applications, include how to access them
-    - Specify relevant departments, offices, or contact information when applicable
-    - If the context doesn't fully answer the question, clearly state what information is available
-      and what's missing, suggesting where the student might find complete information
-    - Maintain a helpful, informative tone throughout your response
+def get_answer_cache(embedding_model: Embeddings) -> SemanticCache:
     """
+    Get the process-wide semantic answer cache for university questions.
 
-    # Set up the language model
-    prompt = ChatPromptTemplate.from_template(template)
-    llm = ChatGroq(
-        model_name="deepseek-r1-distill-llama-70b", 
-        max_tokens=2048
-    )
+    Entries are invalidated whenever storeEmbedding.py re-indexes the corpus.
+
+    Args:
+        embedding_model: The embedding model used to compare queries
+
+    Returns:
+        The shared SemanticCache instance
+    """
+    return get_or_create(("answer_cache", id(embedding_model)), lambda: SemanticCache(
+        embedding_model,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        max_entries=ANSWER_CACHE_SIZE,
+        ttl_seconds=ANSWER_CACHE_TTL,
+        version_fn=lambda: read_index_version(INDEX_NAME),
+    ))
+
+def uni_agent_stream(query: str, embedding_model: Embeddings) -> Iterator[str]:
+    """
+    Stream the answer to a university question, using retrieval-augmented generation.
+
+    Cached answers are yielded in one piece; otherwise retrieval runs first and
+    the answer is yielded chunk by chunk as the LLM generates it. The complete
+    answer is cached once the stream finishes.
+
+    Args:
+        query: The user's university-related question
+        embedding_model: The embedding model for vector search
+
+    Yields:
+        Chunks of the response text (including any <think> block)
+    """
+    return timed_stream("university", _uni_answer_chunks(query, embedding_model))
+
+def _uni_answer_chunks(query: str, embedding_model: Embeddings) -> Iterator[str]:
+    # Get Pinecone API key from environment (not needed for the local index)
+    pinecone_api_key = os.getenv("PINECONE_API_KEY")
+    if VECTOR_BACKEND == "pinecone" and not pinecone_api_key:
+        yield ErrorMessage("Error: Pinecone API key not found. Please check your environment variables.")
+        return
 
-    # Set up vector store and retriever
     try:
-        index_name = "aup-website-data"
-        index = pc.Index(index_name)
-        vector_store = PineconeVectorStore(index=index, embedding=embedding_model)
-        
-        # Base retriever with improved parameters
-        base_retriever = vector_store.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={
-                "k": 3,  # Increase number of results
-                "score_threshold": 0.4,  # Slightly lower threshold for better recall
-            },
-        )
-        
-        # Multi-query retriever for improved results
-        retriever = MultiQueryRetriever.from_llm(
-            retriever=base_retriever,
-            llm=llm,
-            prompt=QUERY_PROMPT
-        )
-        
-        # Define the retrieval function with error handling
-        def get_relevant_documents(query_str: str) -> List[Document]:
-            try:
-                return retriever.get_relevant_documents(query_str)
-            except Exception as e:
-                # Return a document with the error information
-                return [Document(
-                    page_content="Error retrieving information from the university knowledge base. " +
-                                "The system may be experiencing technical difficulties.",
-                    metadata={"error": str(e)}
-                )]
-        
-        # Set up the chain
-        chain = (
-            {"context": lambda x: get_relevant_documents(x), "question": lambda x: x}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-        
-        
-        def get_response(input_query):
-            return chain.invoke(input_query)
-        
-        response = get_response(query)
-        return response
-        
+        cache = get_answer_cache(embedding_model) if ANSWER_CACHE else None
+        if cache is not None:
+            query_vector = cache.embed(query)
+            cached = cache.lookup(query, query_vector)
+            if cached is not None:
+                yield cached[0]
+                return
+
+        agent = get_uni_agent(embedding_model)
+        parts = []
+        failed = False
+        for chunk in agent.stream(query):
+            failed = failed or isinstance(chunk, ErrorMessage)
+            parts.append(chunk)
+            yield chunk
+
+        # An answer written around a failed retrieval must not be replayed to later questions
+        if cache is not None and not failed:
+            cache.store(query, "".join(parts), query_vector)
+
+    except RequestAborted:
+        raise
     except Exception as e:
-        return f"I encountered an issue with the university knowledge base: {str(e)}. Please try again later or contact technical support if the problem persists."
\ No newline at end of file
+        yield ErrorMessage(f"I encountered an issue with the university knowledge base: {str(e)}. Please try again later or contact technical support if the problem persists.")
+
+def uni_agent(query: str, embedding_model: Embeddings) -> str:
+    """
+    Handle university-specific inquiries using a retrieval-augmented generation approach.
+
+    Args:
+        query: The user's university-related question
+        embedding_model: The embedding model for vector search
+
+    Returns:
+        A comprehensive response based on university knowledge base
+    """
+    return "".join(uni_agent_stream(query, embedding_model))
@@ -1,256 +1,286 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    CSVLoader
-)
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+import logging
 import os
-import tempfile
-
 
-def university_tutor(query: str, mode: str = "general", file_paths: Optional[List[str]] = None) -> str:
-    """
-    Process academic queries using an AI tutor.
+from app.core.compression import estimate_tokens
+from app.core.config import (
+    DOCUMENT_CACHE_MB,
+    FILE_CONTEXT_TOKENS,
+    FILE_MAP_CONCURRENCY,
+    FILE_MAP_SECTIONS,
+    FILE_PARSE_TOKENS,
+    FILE_SECTION_TOKENS,
+    FILE_TOP_K,
+    PARSE_PAGES_PER_PART,
+    PARSE_WORKERS,
+)
+from app.core.document_qa import DocumentIndex, format_chunks, is_summary_request, map_reduce_context
+from app.core.scheduler import check_deadline
+from app.core.streaming import ErrorMessage, timed_stream
+from app.utils.clients import get_llm, get_or_create
+from app.utils.documents import DocumentCache
+from app.utils.embeddings import get_embedding_model
+from app.utils.parsing import ParsePool
+
+logger = logging.getLogger(__name__)
+
+GENERAL_TEMPLATE = """<think>
+You are analyzing a student's academic question. Consider:
+1. What field of study does this question belong to?
+2. What level of detail would be appropriate?
+3. What key concepts should be explained?
+4. What examples would help illustrate these concepts?
+5. Are there any common misconceptions to address?
+</think>
+
+You are a highly knowledgeable university professor with expertise across multiple disciplines.
+
+INSTRUCTIONS:
+- Provide comprehensive, academically rigorous explanations
+- Break down complex topics into clear, understandable components
+- Use specific examples and analogies to illustrate concepts
+- Structure your response with appropriate headings and subheadings
+- Include relevant equations, theories, or models when applicable
+- Address common misconceptions related to the topic
+- When appropriate, suggest further reading or related concepts
+- Use academic language while remaining accessible
+
+Student question: {question}
+"""
+
+FILE_TEMPLATE = """<think>
+You are analyzing files uploaded by a student. Consider:
+1. What are the main topics covered in these documents?
+2. What specific information does the student want to know?
+3. How can you best organize the information to answer their query?
+4. What key insights from the documents are most relevant?
+</think>
+
+You are a highly skilled academic assistant helping a student understand the content of their documents.
+
+DOCUMENT CONTENT:
+{document_content}
+
+STUDENT QUESTION:
+{question}
+
+INSTRUCTIONS:
+- Answer the student's question using ONLY information from the provided documents if document information is not available use your own knowledge to answer user query
+- Provide a comprehensive, well-structured response
+- Use headings and sections to organize your response when appropriate
+- Include relevant details, quotes, data, or examples from the documents
+- If the student's question cannot be answered from the documents, state this clearly
+- When referencing specific content, indicate which document or section it came from
+- Maintain academic rigor while ensuring clarity and accessibility
+"""
+
+SECTION_TEMPLATE = """You are summarizing one part of documents uploaded by a student, as a step towards answering their request.
+
+DOCUMENT PART:
+{document_content}
+
+STUDENT REQUEST:
+{question}
+
+INSTRUCTIONS:
+- Summarize this part concisely, keeping the key points, definitions, figures and data relevant to the request
+- Use only information from this part
+- Do not add an introduction or conclusion
+"""
+
+
+def get_general_chain():
+    """Get the shared chain for general academic questions"""
+    def build_chain():
+        prompt = ChatPromptTemplate.from_template(GENERAL_TEMPLATE)
+        llm = get_llm("deepseek-r1-distill-llama-70b", temperature=0.2)
+        return (
+            {"question": lambda x: x}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
 
-    Args:
-        query: The user's academic question
-        mode: The mode of operation - "general" for general questions, "file" for file-based summarization
-        file_paths: List of file paths for summarization (required if mode is "file")
+    return get_or_create(("tutor_general_chain",), build_chain)
 
-    Returns:
-        A comprehensive academic response
-    """
-    if mode == "general":
-        template = """<think>
-        You are analyzing a student's academic question. Consider:
-        1. What field of study does this question belong to?
-        2. What level of detail would be appropriate?
-        3. What key concepts should be explained?
-        4. What examples would help illustrate these concepts?
-        5. Are there any common misconceptions to address?
-        </think>
-
-        You are a highly knowledgeable university professor with expertise across multiple disciplines.
-
-        INSTRUCTIONS:
-        - Provide comprehensive, academically rigorous explanations
-        - Break down complex topics into clear, understandable components
-        - Use specific examples and analogies to illustrate concepts
-        - Structure your response with appropriate headings and subheadings
-        - Include relevant equations, theories, or models when applicable
-        - Address common misconceptions related to the topic
-        - When appropriate, suggest further reading or related concepts
-        - Use academic language while remaining accessible
-
-        Student question: {question}
-        """
-
-        prompt = ChatPromptTemplate.from_template(template)
-
-        llm = ChatGroq(
-            model_name="deepseek-r1-distill-llama-70b", 
-            temperature=0.2
+def get_file_chain():
+    """Get the shared chain for questions about uploaded documents"""
+    def build_chain():
+        prompt = ChatPromptTemplate.from_template(FILE_TEMPLATE)
+        # Use a more powerful model for document analysis
+        llm = get_llm("deepseek-r1-distill-llama-70b", temperature=0.1, max_tokens=2048)
+        return (
+            {"document_content": lambda x: x["document_content"], "question": lambda x: x["question"]}
+            | prompt
+            | llm
+            | StrOutputParser()
         )
 
-        chain = (
-            {"question": lambda x: x}
+    return get_or_create(("tutor_file_chain",), build_chain)
+
+def get_section_chain():
+    """Get the shared chain summarizing one section of long documents (the map step)"""
+    def build_chain():
+        prompt = ChatPromptTemplate.from_template(SECTION_TEMPLATE)
+        llm = get_llm("deepseek-r1-distill-llama-70b", temperature=0.1, max_tokens=1024)
+        return (
+            {"document_content": lambda x: x["document_content"], "question": lambda x: x["question"]}
             | prompt
             | llm
             | StrOutputParser()
         )
 
-        def get_response(input_query):
-            return chain.invoke(input_query)
+    return get_or_create(("tutor_section_chain",), build_chain)
+
+def university_tutor_stream(query: str, mode: str = "general", file_paths: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Stream the AI tutor's answer to an academic query.
 
-        response = get_response(query)
-        return response
+    Args:
+        query: The user's academic question
+        mode: The mode of operation - "general" for general questions, "file" for file-based summarization
+        file_paths: List of file paths for summarization (required if mode is "file")
+
+    Yields:
+        Chunks of the response text (including any <think> block) as the model produces them
+    """
+    if mode == "general":
+        return timed_stream("general", get_general_chain().stream(query))
 
     elif mode == "file":
         if not file_paths:
             raise ValueError("File paths must be provided in 'file' mode.")
 
-        documents = []
-        for file_path in file_paths:
-            try:
-                loader = get_file_loader(file_path)
-                documents.extend(loader.load())
-            except Exception as e:
-                return f"Error processing file: {os.path.basename(file_path)}. {str(e)}"
+        return summarize_file_stream(query, file_paths)
+
+    else:
+        raise ValueError("Invalid mode. Use 'general' or 'file'.")
+
+def university_tutor(query: str, mode: str = "general", file_paths: Optional[List[str]] = None) -> str:
+    """
+    Process academic queries using an AI tutor.
+
+    Args:
+        query: The user's academic question
+        mode: The mode of operation - "general" for general questions, "file" for file-based summarization
+        file_paths: List of file paths for summarization (required if mode is "file")
+
+    Returns:
+        A comprehensive academic response
+    """
+    return "".join(university_tutor_stream(query, mode, file_paths))
 
+def get_document_cache() -> DocumentCache:
+    """Get the process-wide cache of parsed and chunked uploads"""
+    def build_cache():
+        # Split text into chunks for better processing
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=100,
             length_function=len,
         )
+        return DocumentCache(text_splitter, max_chars=int(DOCUMENT_CACHE_MB * 1_000_000))
 
-        chunks = text_splitter.split_documents(documents)
+    return get_or_create(("document_cache",), build_cache)
 
-        consolidated_text = "\n\n".join([chunk.page_content for chunk in chunks])
+def get_parse_pool() -> ParsePool:
+    """Get the process-wide pool of worker processes parsing uploads"""
+    return get_or_create(("parse_pool",), lambda: ParsePool(
+        workers=PARSE_WORKERS or None,
+        pages_per_part=PARSE_PAGES_PER_PART,
+    ))
 
-        MAX_CONTEXT_LENGTH = 32000
-        if len(consolidated_text) > MAX_CONTEXT_LENGTH:
-            consolidated_text = consolidated_text[:MAX_CONTEXT_LENGTH] + "..."
-
-        template = """<think>
-        You are analyzing files uploaded by a student. Consider:
-        1. What are the main topics covered in these documents?
-        2. What specific information does the student want to know?
-        3. How can you best organize the information to answer their query?
-        4. What key insights from the documents are most relevant?
-        </think>
-
-        You are a highly skilled academic assistant helping a student understand the content of their documents.
+def summarize_uploads_stream(query: str, uploads: List[Tuple[str, bytes]]) -> Iterator[str]:
+    """
+    Stream an answer to a question about uploaded files.
 
-        DOCUMENT CONTENT:
-        {document_content}
+    The files not processed before are parsed from memory on worker
+    processes and split first. Short files are sent whole. Otherwise
+    summary requests are answered from parallel section summaries, and
+    other questions from the chunks most similar to them. The answer is
+    then yielded chunk by chunk as the model generates it, followed by a
+    note naming the files and any that could not be read.
 
-        STUDENT QUESTION:
-        {question}
+    Args:
+        query: The user's question about the documents
+        uploads: (file name, file contents) of each uploaded file
 
-        INSTRUCTIONS:
-        - Answer the student's question using ONLY information from the provided documents if document information is not available use your own knowledge to answer user query
-        - Provide a comprehensive, well-structured response
-        - Use headings and sections to organize your response when appropriate
-        - Include relevant details, quotes, data, or examples from the documents
-        - If the student's question cannot be answered from the documents, state this clearly
-        - When referencing specific content, indicate which document or section it came from
-        - Maintain academic rigor while ensuring clarity and accessibility
-        """
+    Yields:
+        Chunks of the response text (including any <think> block)
+    """
+    return timed_stream("file", _file_answer_chunks(query, uploads))
 
-        prompt = ChatPromptTemplate.from_template(template)
+def summarize_file_stream(query: str, file_paths: List[str]) -> Iterator[str]:
+    """
+    Stream an answer to a question about files on disk.
 
-        llm = ChatGroq(
-            model_name="deepseek-r1-distill-llama-70b",
-            temperature=0.1,
-            max_tokens=2048
-        )
+    Args:
+        query: The user's question about the documents
+        file_paths: Paths to the files
 
-        chain = (
-            {"document_content": lambda x: consolidated_text, "question": lambda x: x}
-            | prompt
-            | llm
-            | StrOutputParser()
+    Yields:
+        Chunks of the response text (including any <think> block)
+    """
+    uploads = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            uploads.append((os.path.basename(file_path), f.read()))
+    return summarize_uploads_stream(query, uploads)
+
+def _file_answer_chunks(query: str, uploads: List[Tuple[str, bytes]]) -> Iterator[str]:
+    # Load and process documents in parallel; follow-up questions reuse the cached chunks
+    results = get_document_cache().load_all(uploads, get_parse_pool(), max_chars=FILE_PARSE_TOKENS * 4)
+    documents = [result.document for result in results if result.document is not None]
+    failures = [result for result in results if result.error is not None]
+    if not documents:
+        yield ErrorMessage("\n".join(f"Error processing file: {result.name}. {result.error}" for result in failures))
+        return
+
+    chunks = [chunk for document in documents for chunk in document.chunks]
+    total_tokens = sum(estimate_tokens(chunk.page_content) for chunk in chunks)
+    if total_tokens <= FILE_CONTEXT_TOKENS:
+        # Short documents fit whole
+        context = format_chunks(chunks)
+    elif is_summary_request(query):
+        # Whole-document requests need every part: summarize sections in parallel, then combine
+        context = map_reduce_context(
+            query, chunks, get_section_chain(),
+            section_tokens=FILE_SECTION_TOKENS, token_budget=FILE_CONTEXT_TOKENS,
+            max_concurrency=FILE_MAP_CONCURRENCY, max_sections=FILE_MAP_SECTIONS,
         )
-
-        def get_response(input_query, content):
-            return chain.invoke(input_query)
-
-        response = get_response(query, consolidated_text[:100])
-
-        file_names = [os.path.basename(path) for path in file_paths]
-        response += f"\n\n_Analysis based on {len(file_names)} document(s): {', '.join(file_names)}_"
-
-        return response
-
     else:
-        raise ValueError("Invalid mode. Use 'general' or 'file'.")
+        # Send only the chunks relevant to the question
+        index = DocumentIndex.from_documents(documents, get_document_cache(), get_embedding_model())
+        context = format_chunks(index.search(query, token_budget=FILE_CONTEXT_TOKENS, k=FILE_TOP_K))
+    logger.info("Answering about %d file(s) (~%d tokens) from a ~%d token context",
+                len(documents), total_tokens, estimate_tokens(context))
 
-def get_file_loader(file_path: str):
-    """Get the appropriate document loader based on file extension"""
-    file_extension = os.path.splitext(file_path)[1].lower()
-    
-    if file_extension == '.pdf':
-        return PyPDFLoader(file_path)
-    elif file_extension == '.txt':
-        return TextLoader(file_path)
-    elif file_extension == '.csv':
-        return CSVLoader(file_path)
-    elif file_extension in ['.docx', '.doc']:
-        return Docx2txtLoader(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {file_extension}")
+    # Generate summary or answer question about the document
+    check_deadline("answer generation")
+    yield from get_file_chain().stream({"document_content": context, "question": query})
+
+    # Include info about processed files
+    file_names = [result.name for result in results if result.document is not None]
+    yield f"\n\n_Analysis based on {len(file_names)} document(s): {', '.join(file_names)}_"
+    partial = [result.name for result in results if result.document is not None and not result.document.complete]
+    if partial:
+        yield f"\n\n_Only the first part of {', '.join(partial)} was read; the files are longer than the reading limit._"
+    for result in failures:
+        # A file that could not be read does not stop the answer about the others
+        yield ErrorMessage(f"\n\n_Could not read {result.name}: {result.error}_")
 
 def summarize_file(query: str, file_paths: List[str]) -> str:
     """
     Summarize content from uploaded files and answer questions about them.
-    
+
     Args:
         query: The user's question about the document
         file_paths: Paths to the uploaded files
-        
+
     Returns:
         A response addressing the query in the context of the uploaded files
     """
-    # Load and process documents
-    documents = []
-    for file_path in file_paths:
-        try:
-            loader = get_file_loader(file_path)
-            documents.extend(loader.load())
-        except Exception as e:
-            return f"Error processing file: {os.path.basename(file_path)}. {str(e)}"
-    
-    # Split text into chunks for better processing
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=100,
-        length_function=len,
-    )
-    
-    chunks = text_splitter.split_documents(documents)
-    
-    # Prepare consolidated text for the model
-    consolidated_text = "\n\n".join([chunk.page_content for chunk in chunks])
-    
-    # If text is too long, trim it while keeping as much as possible
-    MAX_CONTEXT_LENGTH = 32000
-    if len(consolidated_text) > MAX_CONTEXT_LENGTH:
-        consolidated_text = consolidated_text[:MAX_CONTEXT_LENGTH] + "..."
-    
-    # Generate summary or answer question about the document
-    template = """<think>
-    You are analyzing files uploaded by a student. Consider:
-    1. What are the main topics covered in these documents?
-    2. What specific information does the student want to know?
-    3. How can you best organize the information to answer their query?
-    4. What key insights from the documents are most relevant?
-    </think>
-    
-    You are a highly skilled academic assistant helping a student understand the content of their documents.
-    
-    DOCUMENT CONTENT:
-    {document_content}
-    
-    STUDENT QUESTION:
-    {question}
-    
-    INSTRUCTIONS:
-    - Answer the student's question using ONLY information from the provided documents if document information is not available use your own knowledge to answer user query
-    - Provide a comprehensive, well-structured response
-    - Use headings and sections to organize your response when appropriate
-    - Include relevant details, quotes, data, or examples from the documents
-    - If the student's question cannot be answered from the documents, state this clearly
-    - When referencing specific content, indicate which document or section it came from
-    - Maintain academic rigor while ensuring clarity and accessibility
-    """
-    
-    prompt = ChatPromptTemplate.from_template(template)
-    
-    # Use a more powerful model for document analysis
-    llm = ChatGroq(
-        model_name="deepseek-r1-distill-llama-70b",
-        temperature=0.1,
-        max_tokens=2048
-    )
-    
-    chain = (
-        {"document_content": lambda x: consolidated_text, "question": lambda x: x}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    def get_response(input_query, content):
-        return chain.invoke(input_query)
-    
-    response = get_response(query, consolidated_text[:100])  # Use first 100 chars of content as cache key
-    
-    # Include info about processed files
-    file_names = [os.path.basename(path) for path in file_paths]
-    response += f"\n\n_Analysis based on {len(file_names)} document(s): {', '.join(file_names)}_"
-    
-    return response
\ No newline at end of file
+    return "".join(summarize_file_stream(query, file_paths))
@@ -1,102 +1,190 @@
 from langchain_tavily import TavilySearch
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+import logging
 import os
+from typing import Iterator
 
-def web_agent(query: str) -> str:
+from app.core.compression import compress_web_results, estimate_tokens, snippet_context
+from app.core.config import (
+    WEB_CONTEXT_COMPRESSION,
+    WEB_CONTEXT_TOKENS,
+    WEB_SEARCH_CACHE,
+    WEB_SEARCH_CACHE_PATH,
+    WEB_SEARCH_CACHE_STALE,
+    WEB_SEARCH_CACHE_TTL,
+)
+from app.core.scheduler import check_deadline
+from app.core.streaming import ErrorMessage, timed_stream
+from app.utils.clients import get_llm, get_or_create
+from app.utils.embeddings import get_embedding_model
+from app.utils.search_cache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_TEMPLATE = """<think>
+I'm analyzing web search results to answer a user question. I need to:
+1. Identify the most relevant information from the search results
+2. Synthesize information from multiple sources
+3. Determine how to present the information clearly
+4. Note any inconsistencies or gaps in the search results
+5. Organize my response logically
+</think>
+
+You are a web research specialist providing accurate, up-to-date information.
+
+SEARCH RESULTS:
+{context}
+
+USER QUESTION:
+{question}
+
+INSTRUCTIONS:
+- Synthesize a comprehensive answer based ONLY on the provided search results
+- Structure your response with clear headings and logical organization
+- Include relevant facts, figures, and details from the search results
+- Cite sources for specific information using [Source: X] notation
+- When information from different sources conflicts, acknowledge this and present both perspectives
+- If the search results don't adequately answer the question:
+  1. Clearly state what information is missing
+  2. Provide the partial information available
+- Maintain a balanced, informative tone throughout
+- Format your response for maximum readability and comprehension
+"""
+
+# Configure Tavily search with improved parameters; they are also part of the
+# search cache key, so changing them never serves results of other settings
+SEARCH_PARAMS = dict(
+    max_results=1,  # Increased for better coverage
+    include_domains=None,  # Allow all domains
+    exclude_domains=None,
+    include_raw_content=True,  # Get full text
+    include_images=False,
+    include_image_descriptions=False,
+    search_depth="advanced",  # Use advanced search for better results
+    time_range="year",  # Wider time range for more comprehensive results
+)
+
+def get_search_tool() -> TavilySearch:
+    """Get the shared Tavily search tool"""
+    return get_or_create(("tavily_search",), lambda: TavilySearch(**SEARCH_PARAMS))
+
+def get_search_cache() -> SearchCache:
+    """Get the shared persistent cache of Tavily results"""
+    return get_or_create(("search_cache",), lambda: SearchCache(
+        path=WEB_SEARCH_CACHE_PATH,
+        ttl_seconds=WEB_SEARCH_CACHE_TTL,
+        stale_seconds=WEB_SEARCH_CACHE_STALE,
+    ))
+
+def search_web(query: str):
     """
-    Handle queries requiring current web information using search and summarization.
-    
+    Run a Tavily search, served from the search cache when enabled.
+
     Args:
-        query: The user's question requiring web search
-        
+        query: The search query
+
     Returns:
-        A comprehensive response based on web search results
+        The Tavily results
+
+    Raises:
+        Exception: If the search failed (failures are never cached)
+    """
+    def search():
+        result = get_search_tool().invoke(query)
+        # The tool reports API failures as {"error": ...} instead of raising
+        if isinstance(result, dict) and "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    if not WEB_SEARCH_CACHE:
+        return search()
+    return get_search_cache().get_or_search(query, SEARCH_PARAMS, search)
+
+def get_web_chain():
+    """Get the shared response generation chain for web search results"""
+    def build_chain():
+        prompt = ChatPromptTemplate.from_template(RESPONSE_TEMPLATE)
+        llm = get_llm("deepseek-r1-distill-llama-70b", temperature=0.2)
+        return (
+            {"context": lambda x: x["context"], "question": lambda x: x["question"]}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
+
+    return get_or_create(("web_chain",), build_chain)
+
+def web_agent_stream(query: str) -> Iterator[str]:
     """
+    Stream the answer to a query requiring current web information.
+
+    The web search and context compression run first; the answer is then
+    yielded chunk by chunk as the LLM generates it.
+
+    Args:
+        query: The user's question requiring web search
+
+    Yields:
+        Chunks of the response text (including any <think> block)
+    """
+    return timed_stream("web search", _web_answer_chunks(query))
+
+def _web_answer_chunks(query: str) -> Iterator[str]:
     # Check if Tavily API key is available
     tavily_api_key = os.getenv("TAVILY_API_KEY")
     if not tavily_api_key:
-        return "Error: Web search capabilities are currently unavailable. Please ask a different type of question."
-    
-    template = """<think>
-    I'm analyzing web search results to answer a user question. I need to:
-    1. Identify the most relevant information from the search results
-    2. Synthesize information from multiple sources
-    3. Determine how to present the information clearly
-    4. Note any inconsistencies or gaps in the search results
-    5. Organize my response logically
-    </think>
-    
-    You are a web research specialist providing accurate, up-to-date information.
-    
-    SEARCH RESULTS:
-    {context}
-    
-    USER QUESTION:
-    {question}
-    
-    INSTRUCTIONS:
-    - Synthesize a comprehensive answer based ONLY on the provided search results
-    - Structure your response with clear headings and logical organization
-    - Include relevant facts, figures, and details from the search results
-    - Cite sources for specific information using [Source: X] notation
-    - When information from different sources conflicts, acknowledge this and present both perspectives
-    - If the search results don't adequately answer the question:
-      1. Clearly state what information is missing
-      2. Provide the partial information available
-    - Maintain a balanced, informative tone throughout
-    - Format your response for maximum readability and comprehension
-    """
+        yield ErrorMessage("Error: Web search capabilities are currently unavailable. Please ask a different type of question.")
+        return
+
+    search_failed = False
 
-    # Configure Tavily search with improved parameters
-    tool = TavilySearch(
-        max_results=1,  # Increased for better coverage
-        include_domains=None,  # Allow all domains
-        exclude_domains=None,
-        include_raw_content=True,  # Get full text
-        include_images=False,
-        include_image_descriptions=False,
-        search_depth="advanced",  # Use advanced search for better results
-        time_range="year",  # Wider time range for more comprehensive results
-    )
-    
     # Define search function with error handling
     def perform_web_search(query_str: str):
+        nonlocal search_failed
         try:
-            return tool.invoke(query_str)
+            return search_web(query_str)
         except Exception as e:
+            search_failed = True
             return [{
                 "content": f"Error performing web search: {str(e)}. The search service may be unavailable.",
                 "url": "https://example.com/error"
             }]
-    
-    
-    def get_search_results(input_query):
-        return perform_web_search(input_query)
-    
+
     # Get web search results
-    web_result = get_search_results(query)
+    check_deadline("web search")
+    web_result = perform_web_search(query)
 
-    # Set up the response generation
-    prompt = ChatPromptTemplate.from_template(template)
-    llm = ChatGroq(
-            model_name="deepseek-r1-distill-llama-70b", 
-            temperature=0.2
+    context = web_result
+    if WEB_CONTEXT_COMPRESSION:
+        # Keep only the passages of the raw pages that are relevant to the question
+        compressed = compress_web_results(query, web_result, get_embedding_model(), token_budget=WEB_CONTEXT_TOKENS)
+        logger.info(
+            "Web context compressed from ~%d to ~%d tokens (%d of %d passages) in %.0f ms",
+            compressed.tokens_before, compressed.tokens_after, compressed.passages_kept,
+            compressed.passages, compressed.milliseconds,
         )
+        context = compressed.text
+        if not context:
+            # Nothing fit or matched; the snippets stand in, never the raw pages
+            context = snippet_context(web_result, token_budget=WEB_CONTEXT_TOKENS)
+            logger.info("No web passages kept, answering from the result snippets")
 
-    chain = (
-        {"context": lambda x: web_result, "question": lambda x: x}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
- 
-    def get_response(input_query):
-        return chain.invoke(input_query)
-    
-    # Use a hash of the first search result as part of the cache key
-    response = get_response(query)
-    
-    return response
\ No newline at end of file
+    logger.info("Generating the web answer from a ~%d token context", estimate_tokens(str(context)))
+    check_deadline("answer generation")
+    yield from get_web_chain().stream({"context": context, "question": query})
+    if search_failed:
+        # The answer explains the failed search; keep it out of the response cache
+        yield ErrorMessage("")
+
+def web_agent(query: str) -> str:
+    """
+    Handle queries requiring current web information using search and summarization.
+
+    Args:
+        query: The user's question requiring web search
+
+    Returns:
+        A comprehensive response based on web search results
+    """
+    return "".join(web_agent_stream(query))
@@ -0,0 +1,149 @@
+import re
+import time
+from typing import Any, List, NamedTuple, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.keyword_index import tokenize
+
+# Sentence boundaries: end punctuation followed by whitespace, or a line break
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+
+
+class CompressedContext(NamedTuple):
+    """Web context cut down to the passages most relevant to a question"""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    passages: int
+    passages_kept: int
+    milliseconds: float
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count of a text (about four characters per token in English)"""
+    return (len(text) + 3) // 4
+
+def split_passages(text: str, max_chars: int = 400) -> List[str]:
+    """Split text into passages of whole sentences of at most about max_chars characters"""
+    passages, current = [], ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        passages.append(current)
+    return passages
+
+def search_results(web_result: Any) -> List[dict]:
+    """The list of result dicts in a Tavily response (or an already unpacked list)"""
+    if isinstance(web_result, dict):
+        return web_result.get("results") or []
+    if isinstance(web_result, list):
+        return [result for result in web_result if isinstance(result, dict)]
+    return []
+
+def source_header(result: dict) -> str:
+    """The line naming a search result's title and URL, for [Source: X] citations"""
+    url = result.get("url", "")
+    return f"Source: {result.get('title') or url} ({url})"
+
+def snippet_context(web_result: Any, token_budget: int = 1500) -> str:
+    """
+    The title, URL and search snippet of each result, cut to token_budget.
+
+    The fallback when compression keeps no passages; the raw page content is
+    never included.
+    """
+    blocks, used = [], 0
+    for result in search_results(web_result):
+        block = source_header(result) + "\n" + (result.get("content") or "").strip()
+        tokens = estimate_tokens(block)
+        if used + tokens > token_budget:
+            # Keep what fits of the first result over the budget
+            if token_budget > used:
+                blocks.append(block[:(token_budget - used) * 4])
+            break
+        blocks.append(block)
+        used += tokens
+    return "\n\n".join(blocks)
+
+def compress_web_results(
+    question: str,
+    web_result: Any,
+    embedding_model: Embeddings,
+    token_budget: int = 1500,
+    max_candidates: int = 128,
+    passage_chars: int = 400,
+) -> CompressedContext:
+    """
+    Keep the passages of web search results that best answer a question.
+
+    The raw content of every result (or its snippet when there is none) is
+    split into sentence passages. When there are more than max_candidates, a
+    keyword-overlap prefilter picks which ones are embedded. Candidates are
+    ranked by cosine similarity to the question and taken best first until
+    token_budget is reached, then rendered in their original order under a
+    "Source: title (url)" line per result so the model can cite them.
+
+    Args:
+        question: The user's question
+        web_result: The Tavily response
+        embedding_model: Model used to embed the question and passages
+        token_budget: Approximate token limit of the returned context
+        max_candidates: Most passages embedded per question
+        passage_chars: Approximate passage length in characters
+
+    Returns:
+        The compressed context with token and passage counts and its cost in ms
+    """
+    start = time.perf_counter()
+    results = search_results(web_result)
+    # (result number, position in the result, text)
+    passages: List[Tuple[int, int, str]] = []
+    for number, result in enumerate(results):
+        content = result.get("raw_content") or result.get("content") or ""
+        for position, passage in enumerate(split_passages(content, passage_chars)):
+            passages.append((number, position, passage))
+    tokens_before = estimate_tokens(str(web_result))
+
+    candidates = passages
+    if len(passages) > max_candidates:
+        terms = set(tokenize(question))
+        overlap = [len(terms.intersection(tokenize(text))) for _, _, text in passages]
+        best = sorted(range(len(passages)), key=lambda i: overlap[i], reverse=True)[:max_candidates]
+        candidates = [passages[i] for i in sorted(best)]
+
+    kept: List[Tuple[int, int, str]] = []
+    if candidates:
+        query = np.asarray(embedding_model.embed_query(question), dtype=np.float32)
+        vectors = np.asarray(embedding_model.embed_documents([text for _, _, text in candidates]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * max(float(np.linalg.norm(query)), 1e-12)
+        similarities = vectors @ query / np.maximum(norms, 1e-12)
+        headers = [source_header(result) for result in results]
+        used, cited = 0, set()
+        for i in np.argsort(-similarities, kind="stable"):
+            number, _, text = candidates[i]
+            # The first passage of a result also pays for its source line
+            tokens = estimate_tokens(text) + (0 if number in cited else estimate_tokens(headers[number]))
+            if used + tokens > token_budget:
+                continue
+            kept.append(candidates[i])
+            cited.add(number)
+            used += tokens
+        kept.sort()
+
+    blocks = []
+    for number, result in enumerate(results):
+        texts = [text for kept_number, _, text in kept if kept_number == number]
+        if texts:
+            blocks.append(source_header(result) + "\n" + "\n...\n".join(texts))
+    text = "\n\n".join(blocks)
+    return CompressedContext(
+        text, tokens_before, estimate_tokens(text), len(passages), len(kept), (time.perf_counter() - start) * 1000
+    )
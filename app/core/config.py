@@ -0,0 +1,149 @@
+import os
+
+
+def _get_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to the default"""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting such as "1", "true" or "no" from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Query routing: "llm" always asks the Groq classifier, "local" only uses the
+# embedding router, "hybrid" uses the embedding router and falls back to the
+# LLM when the router is not confident enough.
+ROUTER_MODE = os.getenv("ROUTER_MODE", "hybrid").strip().lower()
+
+# Minimum cosine-similarity gap between the best and second best route before
+# the local router is trusted without asking the LLM.
+ROUTER_MARGIN = _get_float("ROUTER_MARGIN", 0.04)
+
+# Vector store backend: "pinecone" for the hosted index, "local" for the
+# in-process memory-mapped index stored under LOCAL_INDEX_DIR.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./vector_index")
+
+# Upper bound on concurrent vector searches issued by the multi-query retriever
+RETRIEVAL_WORKERS = int(_get_float("RETRIEVAL_WORKERS", 5))
+
+# Adaptive multi-query: skip query expansion when the best first-pass match has
+# at least this relevance score (Pinecone scale, (cosine + 1) / 2). Set to a
+# value above 1 to always expand.
+EXPANSION_CONFIDENCE = _get_float("EXPANSION_CONFIDENCE", 0.85)
+
+# How query variants are produced when expansion is needed: "llm" asks the
+# model for rephrasings, "local" uses keyword and synonym rewrites.
+QUERY_EXPANSION = os.getenv("QUERY_EXPANSION", "llm").strip().lower()
+
+# Fuse BM25 keyword search with dense retrieval when a keyword index was built
+# by storeEmbedding.py (stored next to the local vector index).
+HYBRID_SEARCH = _get_bool("HYBRID_SEARCH", True)
+# Chunks kept from the fused ranking, so adding keyword hits does not grow the prompt
+HYBRID_FUSED_K = int(_get_float("HYBRID_FUSED_K", 4))
+
+# Semantic answer cache for university questions: a stored answer is reused
+# when a new query's embedding has at least ANSWER_CACHE_THRESHOLD cosine
+# similarity with a cached one.
+ANSWER_CACHE = _get_bool("ANSWER_CACHE", True)
+ANSWER_CACHE_THRESHOLD = _get_float("ANSWER_CACHE_THRESHOLD", 0.95)
+ANSWER_CACHE_SIZE = int(_get_float("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL = _get_float("ANSWER_CACHE_TTL", 86400)
+
+# Embedding cache: vectors are kept in an in-memory LRU and persisted to SQLite,
+# keyed by model name and text hash, for both queries and ingested chunks.
+EMBEDDING_CACHE = _get_bool("EMBEDDING_CACHE", True)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/vectors.sqlite3")
+EMBEDDING_CACHE_SIZE = int(_get_float("EMBEDDING_CACHE_SIZE", 10000))
+
+# Micro-batching of concurrent embedding requests: a batch is flushed when it
+# holds EMBEDDING_BATCH_SIZE texts or EMBEDDING_BATCH_WAIT_MS has passed.
+EMBEDDING_BATCHING = _get_bool("EMBEDDING_BATCHING", True)
+EMBEDDING_BATCH_SIZE = int(_get_float("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_BATCH_WAIT_MS = _get_float("EMBEDDING_BATCH_WAIT_MS", 2.0)
+
+# Ingestion: chunks are embedded INGEST_BATCH_SIZE at a time and upserted by up
+# to INGEST_WORKERS concurrent writers.
+INGEST_BATCH_SIZE = int(_get_float("INGEST_BATCH_SIZE", 64))
+INGEST_WORKERS = int(_get_float("INGEST_WORKERS", 4))
+
+# Page-aware retrieval: questions naming a site section (e.g. "admissions") are
+# first searched within that section (the whole index is searched when no match
+# there reaches EXPANSION_CONFIDENCE), and at most MAX_CHUNKS_PER_PAGE chunks of
+# any one page are put in the prompt.
+METADATA_FILTER = _get_bool("METADATA_FILTER", True)
+MAX_CHUNKS_PER_PAGE = int(_get_float("MAX_CHUNKS_PER_PAGE", 2))
+
+# Crawler used by dataScraper.py: pages fetched in parallel, and the token-bucket
+# rate limit applied to each host (requests per second).
+SCRAPER_CONCURRENCY = int(_get_float("SCRAPER_CONCURRENCY", 8))
+SCRAPER_RATE_LIMIT = _get_float("SCRAPER_RATE_LIMIT", 2.0)
+
+# Deduplication before indexing: lines on at least BOILERPLATE_FRACTION of the
+# scraped pages are stripped, and pages whose SimHash differs from an earlier
+# page in at most NEAR_DUPLICATE_DISTANCE of 64 bits are dropped.
+BOILERPLATE_FRACTION = _get_float("BOILERPLATE_FRACTION", 0.3)
+NEAR_DUPLICATE_DISTANCE = int(_get_float("NEAR_DUPLICATE_DISTANCE", 3))
+
+# Tavily search results are cached on disk by normalized query and search
+# parameters. Results younger than WEB_SEARCH_CACHE_TTL seconds are served
+# directly; for WEB_SEARCH_CACHE_STALE seconds after that they are still
+# served while a background search refreshes them.
+WEB_SEARCH_CACHE = _get_bool("WEB_SEARCH_CACHE", True)
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", "./search_cache/tavily.sqlite3")
+WEB_SEARCH_CACHE_TTL = _get_float("WEB_SEARCH_CACHE_TTL", 3600)
+WEB_SEARCH_CACHE_STALE = _get_float("WEB_SEARCH_CACHE_STALE", 86400)
+
+# Raw web pages are cut down to the passages most similar to the question,
+# within about WEB_CONTEXT_TOKENS tokens, before the answer is generated.
+WEB_CONTEXT_COMPRESSION = _get_bool("WEB_CONTEXT_COMPRESSION", True)
+WEB_CONTEXT_TOKENS = int(_get_float("WEB_CONTEXT_TOKENS", 1500))
+
+# Agent requests from every session share REQUEST_WORKERS workers. At most
+# REQUEST_QUEUE_SIZE requests wait for a worker (more are turned away as busy),
+# and a request is abandoned after REQUEST_TIMEOUT seconds.
+REQUEST_WORKERS = int(_get_float("REQUEST_WORKERS", 8))
+REQUEST_QUEUE_SIZE = int(_get_float("REQUEST_QUEUE_SIZE", 16))
+REQUEST_TIMEOUT = _get_float("REQUEST_TIMEOUT", 60)
+
+# Complete answers are cached in a SQLite file shared by every app process,
+# keyed by route, normalized query and uploaded file hashes. Each route has
+# its own TTL in seconds, and beyond RESPONSE_CACHE_SIZE answers the least
+# recently used are evicted.
+RESPONSE_CACHE = _get_bool("RESPONSE_CACHE", True)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./response_cache/responses.sqlite3")
+RESPONSE_CACHE_SIZE = int(_get_float("RESPONSE_CACHE_SIZE", 2000))
+RESPONSE_CACHE_TTL_UNIVERSITY = _get_float("RESPONSE_CACHE_TTL_UNIVERSITY", 86400)
+RESPONSE_CACHE_TTL_WEB = _get_float("RESPONSE_CACHE_TTL_WEB", 1800)
+RESPONSE_CACHE_TTL_GENERAL = _get_float("RESPONSE_CACHE_TTL_GENERAL", 86400)
+RESPONSE_CACHE_TTL_FILES = _get_float("RESPONSE_CACHE_TTL_FILES", 86400)
+
+# Uploaded files are parsed and chunked once per distinct content; up to about
+# DOCUMENT_CACHE_MB megabytes of their text is kept in memory for follow-up
+# questions, least recently used first out.
+DOCUMENT_CACHE_MB = _get_float("DOCUMENT_CACHE_MB", 200)
+
+# Questions about uploaded files are answered from the FILE_TOP_K chunks most
+# similar to the question, within about FILE_CONTEXT_TOKENS tokens. Summary
+# requests over longer files summarize sections of about FILE_SECTION_TOKENS
+# tokens first, FILE_MAP_CONCURRENCY LLM calls at a time and at most
+# FILE_MAP_SECTIONS of them (longer files are sampled at evenly spaced sections).
+FILE_CONTEXT_TOKENS = int(_get_float("FILE_CONTEXT_TOKENS", 3000))
+FILE_TOP_K = int(_get_float("FILE_TOP_K", 12))
+FILE_SECTION_TOKENS = int(_get_float("FILE_SECTION_TOKENS", 3000))
+FILE_MAP_CONCURRENCY = int(_get_float("FILE_MAP_CONCURRENCY", 4))
+FILE_MAP_SECTIONS = int(_get_float("FILE_MAP_SECTIONS", 12))
+
+# Uploads are parsed on PARSE_WORKERS processes (0 for one per CPU core), large
+# PDFs in parts of at least PARSE_PAGES_PER_PART pages. Parsing stops once
+# about FILE_PARSE_TOKENS tokens of text have been read for one question.
+PARSE_WORKERS = int(_get_float("PARSE_WORKERS", 0))
+PARSE_PAGES_PER_PART = int(_get_float("PARSE_PAGES_PER_PART", 8))
+FILE_PARSE_TOKENS = int(_get_float("FILE_PARSE_TOKENS", 250000))
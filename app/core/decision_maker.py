@@ -1,63 +1,117 @@
-from langchain_groq import ChatGroq
+import time
+from typing import Callable, NamedTuple, Optional
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-def take_decision(query: str) -> str:
+from app.core.config import ROUTER_MODE, ROUTER_MARGIN
+from app.utils.clients import get_llm, get_or_create
+
+VALID_ROUTES = ["university", "web search", "general"]
+
+
+class RouteDecision(NamedTuple):
+    """Outcome of routing a query, including which path made the decision"""
+    route: str
+    source: str  # "local" or "llm"
+    confidence: Optional[float]
+    elapsed_ms: float
+
+
+CLASSIFIER_TEMPLATE = """<think>
+Analyzing user query:
+1. Is this about university life, academics, campus resources, or specific institutional knowledge?
+2. Does this require current information, facts that change regularly, or recent events?
+3. Is this a general academic, theoretical, or conceptual question?
+
+Key indicators:
+- University: mentions specific university programs, campus services, enrollment, etc.
+- Web search: requires current information like weather, news, prices, etc.
+- General: academic concepts, theories, explanations, how-to questions
+</think>
+
+You are a specialized classifier determining which AI system should handle a user query.
+
+INSTRUCTIONS:
+Analyze the query and return EXACTLY ONE of these three classifications:
+- "university" - for questions about specific university programs, policies, campus resources, 
+                student services, administrative procedures, etc.
+- "web search" - for questions requiring current information, news, events, prices, 
+                weather, or other frequently changing data
+- "general" - for academic concept explanations, theoretical questions, study advice,
+            career guidance, and other general knowledge questions
+
+IMPORTANT: Return ONLY the classification word without any additional text or explanation.
+
+User query: {question}
+Classification:
+"""
+
+def get_classifier_chain():
+    """Get the shared Groq classifier chain"""
+    def build_chain():
+        prompt = ChatPromptTemplate.from_template(CLASSIFIER_TEMPLATE)
+        llm = get_llm("gemma2-9b-it", max_tokens=10)
+        return (
+            {"question": lambda x: x}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
+
+    return get_or_create(("classifier_chain",), build_chain)
+
+def llm_decision(query: str) -> str:
     """
-    Decide which agent should handle the user's query.
+    Ask the Groq classifier which agent should handle the user's query.
     Returns: "university", "web search", or "general"
     """
-    template = """<think>
-    Analyzing user query:
-    1. Is this about university life, academics, campus resources, or specific institutional knowledge?
-    2. Does this require current information, facts that change regularly, or recent events?
-    3. Is this a general academic, theoretical, or conceptual question?
-    
-    Key indicators:
-    - University: mentions specific university programs, campus services, enrollment, etc.
-    - Web search: requires current information like weather, news, prices, etc.
-    - General: academic concepts, theories, explanations, how-to questions
-    </think>
-    
-    You are a specialized classifier determining which AI system should handle a user query.
-    
-    INSTRUCTIONS:
-    Analyze the query and return EXACTLY ONE of these three classifications:
-    - "university" - for questions about specific university programs, policies, campus resources, 
-                    student services, administrative procedures, etc.
-    - "web search" - for questions requiring current information, news, events, prices, 
-                    weather, or other frequently changing data
-    - "general" - for academic concept explanations, theoretical questions, study advice,
-                career guidance, and other general knowledge questions
-    
-    IMPORTANT: Return ONLY the classification word without any additional text or explanation.
-    
-    User query: {question}
-    Classification:
-    """
-    
-    prompt = ChatPromptTemplate.from_template(template)
-    
-    llm = ChatGroq(
-        model_name="gemma2-9b-it",
-        max_tokens=10
-    )
-    
-    chain = (
-        {"question": lambda x: x}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    def get_response(input_query):
-        return chain.invoke(input_query).strip().lower()
-    
-    result = get_response(query)
-    
+    result = get_classifier_chain().invoke(query).strip().lower()
+
     # Validate response
-    valid_responses = ["university", "web search", "general"]
-    if result not in valid_responses:
+    if result not in VALID_ROUTES:
         return "general"  # Default to general if invalid response
-        
-    return result
\ No newline at end of file
+
+    return result
+
+def route_query(
+    query: str,
+    mode: Optional[str] = None,
+    margin: Optional[float] = None,
+    llm_classifier: Optional[Callable[[str], str]] = None,
+) -> RouteDecision:
+    """
+    Route a query using the local embedding router, the LLM classifier, or both.
+
+    Args:
+        query: The user's question
+        mode: "local", "llm" or "hybrid" (defaults to ROUTER_MODE)
+        margin: Minimum router margin to skip the LLM in hybrid mode (defaults to ROUTER_MARGIN)
+        llm_classifier: Fallback classifier (defaults to llm_decision)
+
+    Returns:
+        The chosen route and the path that decided it
+    """
+    mode = mode or ROUTER_MODE
+    margin = ROUTER_MARGIN if margin is None else margin
+    llm_classifier = llm_classifier or llm_decision
+    start = time.perf_counter()
+
+    confidence = None
+    if mode in ("local", "hybrid"):
+        # Imported lazily so "llm" mode never builds the router centroids
+        from app.core.router import get_router
+
+        route, confidence, _ = get_router().classify(query)
+        if mode == "local" or confidence >= margin:
+            return RouteDecision(route, "local", confidence, (time.perf_counter() - start) * 1000)
+
+    route = llm_classifier(query)
+    return RouteDecision(route, "llm", confidence, (time.perf_counter() - start) * 1000)
+
+def take_decision(query: str) -> str:
+    """
+    Decide which agent should handle the user's query.
+    Returns: "university", "web search", or "general"
+    """
+    return route_query(query).route
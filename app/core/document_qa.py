@@ -0,0 +1,188 @@
+import logging
+import re
+import time
+from typing import List, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.compression import estimate_tokens
+from app.core.scheduler import check_deadline
+from app.core.streaming import THINK_CLOSE, THINK_OPEN
+from app.utils.documents import DocumentCache, ParsedDocument
+
+logger = logging.getLogger(__name__)
+
+# Complete reasoning blocks in a model's output
+THINK_BLOCK = re.compile(re.escape(THINK_OPEN) + ".*?" + re.escape(THINK_CLOSE), re.DOTALL)
+
+# Requests about a whole document rather than something in it
+SUMMARY_PATTERN = re.compile(
+    r"\b(summar(y|ies|ise|ize|ising|izing)|overview|tl;?dr|outline|gist|"
+    r"(main|key) (points|ideas|takeaways|findings)|what (is|are) (this|these|the) (document|file)s?( all)? about)\b",
+    re.IGNORECASE,
+)
+
+
+def is_summary_request(query: str) -> bool:
+    """Whether a question asks about whole documents (a summary, outline, key points...)"""
+    return bool(SUMMARY_PATTERN.search(query))
+
+def source_label(chunk: Document) -> str:
+    """Where a chunk comes from, such as "notes.pdf, page 3" or "grades.csv, row 12" """
+    label = chunk.metadata.get("source", "document")
+    if "page" in chunk.metadata:
+        label += f", page {chunk.metadata['page'] + 1}"
+    elif "row" in chunk.metadata:
+        label += f", row {chunk.metadata['row'] + 1}"
+    return label
+
+def format_chunks(chunks: Sequence[Document]) -> str:
+    """Render chunks for the prompt, with a source line wherever the source changes"""
+    blocks, label = [], None
+    for chunk in chunks:
+        current = source_label(chunk)
+        if current != label:
+            blocks.append(f"[{current}]")
+            label = current
+        blocks.append(chunk.page_content)
+    return "\n\n".join(blocks)
+
+
+class DocumentIndex:
+    """
+    Ephemeral vector index over the chunks of the files a question is about.
+
+    Chunk embeddings come from the document cache, so the index costs one
+    embedding pass per distinct upload; building it for a follow-up
+    question only stacks the cached matrices.
+    """
+
+    def __init__(self, embedding_model: Embeddings, chunks: List[Document], vectors: np.ndarray):
+        self.embedding_model = embedding_model
+        self.chunks = chunks
+        self.vectors = vectors
+
+    @classmethod
+    def from_documents(
+        cls, documents: Sequence[ParsedDocument], cache: DocumentCache, embedding_model: Embeddings
+    ) -> "DocumentIndex":
+        chunks = [chunk for document in documents for chunk in document.chunks]
+        matrices = [cache.vectors(document, embedding_model) for document in documents if document.chunks]
+        vectors = np.vstack(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+        return cls(embedding_model, chunks, vectors)
+
+    def search(self, query: str, token_budget: int = 3000, k: int = 12) -> List[Document]:
+        """
+        The chunks most similar to a query, within a token budget.
+
+        Chunks are taken best first, up to k of them, skipping any that no
+        longer fit in token_budget, and returned in document order so the
+        model reads them as they were written.
+        """
+        if not self.chunks:
+            return []
+        query_vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        similarities = self.vectors @ query_vector
+
+        selected, used = [], 0
+        for i in np.argsort(-similarities, kind="stable"):
+            tokens = estimate_tokens(self.chunks[i].page_content)
+            if used + tokens > token_budget:
+                continue
+            selected.append(int(i))
+            used += tokens
+            if len(selected) == k:
+                break
+        return [self.chunks[i] for i in sorted(selected)]
+
+
+def strip_closed_think(text: str) -> str:
+    """
+    Remove complete <think> blocks from a model's output.
+
+    A block cut off by max_tokens is kept (without its opening tag), since
+    its reasoning is then all the model produced about the section.
+    """
+    return THINK_BLOCK.sub("", text).replace(THINK_OPEN, "").strip()
+
+def sample_sections(sections: List[List[Document]], max_sections: int) -> List[List[Document]]:
+    """Keep at most max_sections sections, evenly spaced through the documents"""
+    if len(sections) <= max_sections:
+        return sections
+    step = len(sections) / max_sections
+    return [sections[int(i * step)] for i in range(max_sections)]
+
+def group_sections(chunks: Sequence[Document], section_tokens: int) -> List[List[Document]]:
+    """Split chunks, in order, into runs of at most about section_tokens tokens"""
+    sections: List[List[Document]] = []
+    used = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.page_content)
+        if not sections or used + tokens > section_tokens:
+            sections.append([])
+            used = 0
+        sections[-1].append(chunk)
+        used += tokens
+    return sections
+
+def map_reduce_context(
+    query: str,
+    chunks: Sequence[Document],
+    map_chain,
+    section_tokens: int = 3000,
+    token_budget: int = 3000,
+    max_concurrency: int = 4,
+    max_sections: int = 12,
+) -> str:
+    """
+    Summarize the parts of long documents in parallel for a whole-document answer.
+
+    The chunks are grouped into sections of about section_tokens, and each
+    section is summarized with map_chain, max_concurrency LLM calls at a
+    time; the request's deadline is checked before each batch of calls. Only
+    max_sections sections are summarized per round, so very long documents
+    are sampled at evenly spaced sections rather than costing a call per
+    section. If the summaries together are still over token_budget they are
+    summarized again the same way. The result is the context the final
+    (reduce) answer is written from.
+
+    Args:
+        query: The user's request, so the summaries keep what it asks about
+        chunks: The documents' chunks in order
+        map_chain: Chain taking {"document_content", "question"} and returning a summary
+        section_tokens: Approximate tokens of document text per summary call
+        token_budget: Approximate token limit of the returned context
+        max_concurrency: Summary calls in flight at once
+        max_sections: Most summary calls per round
+
+    Returns:
+        The section summaries, each under a line naming its sources
+    """
+    sections = group_sections(chunks, section_tokens)
+    while True:
+        total = len(sections)
+        sections = sample_sections(sections, max_sections)
+        start = time.perf_counter()
+        inputs = [{"document_content": format_chunks(section), "question": query} for section in sections]
+        outputs = []
+        for batch_start in range(0, len(inputs), max_concurrency):
+            # Stop between batches once the request is abandoned, rather than after every call
+            check_deadline("section summaries")
+            outputs += map_chain.batch(inputs[batch_start:batch_start + max_concurrency])
+        summaries = []
+        for number, (section, output) in enumerate(zip(sections, outputs), start=1):
+            first, last = source_label(section[0]), source_label(section[-1])
+            label = f"Part {number} of {len(sections)}: " + (first if first == last else f"{first} to {last}")
+            summaries.append(Document(page_content=strip_closed_think(output), metadata={"source": label}))
+        logger.info("Summarized %d of %d sections in %.0f ms",
+                    len(sections), total, (time.perf_counter() - start) * 1000)
+
+        context = format_chunks(summaries)
+        regrouped = group_sections(summaries, section_tokens)
+        # Stop when the summaries fit, or when another round would not combine any of them
+        if estimate_tokens(context) <= token_budget or len(regrouped) >= len(sections):
+            return context
+        sections = regrouped
@@ -0,0 +1,63 @@
+import re
+from typing import List
+
+# Words that carry no retrieval signal on their own
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "can", "could", "do", "does", "for", "from",
+    "get", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "should",
+    "tell", "the", "there", "to", "what", "when", "where", "which", "who", "whom", "why",
+    "will", "with", "would", "you", "your", "about", "any", "much", "many",
+}
+
+# University-domain rewrites that match how the scraped pages phrase things
+SYNONYMS = {
+    "fee": ["tuition", "charges"],
+    "fees": ["tuition", "charges"],
+    "hostel": ["accommodation", "residence"],
+    "admission": ["enrollment", "admissions"],
+    "admissions": ["enrollment", "admission"],
+    "vc": ["vice chancellor"],
+    "scholarship": ["financial aid", "stipend"],
+    "scholarships": ["financial aid", "stipends"],
+    "exam": ["examination"],
+    "exams": ["examinations"],
+    "timetable": ["schedule"],
+    "dept": ["department"],
+    "program": ["programme", "degree"],
+    "programs": ["programmes", "degrees"],
+    "requirements": ["eligibility", "criteria"],
+    "contact": ["phone", "email"],
+    "apply": ["application"],
+    "deadline": ["last date"],
+    "head": ["chairman", "director"],
+    "result": ["merit list"],
+}
+
+def local_query_variants(query: str, max_variants: int = 4) -> List[str]:
+    """
+    Generate retrieval variants of a question without calling an LLM.
+
+    Produces a keyword-only version of the question followed by synonym
+    rewrites of individual keywords.
+
+    Args:
+        query: The user's question
+        max_variants: Maximum number of variants to return
+
+    Returns:
+        Up to max_variants distinct rewrites of the question
+    """
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    keywords = [word for word in words if word not in STOPWORDS]
+
+    candidates = [" ".join(keywords)] if keywords else []
+    for i, word in enumerate(keywords):
+        for synonym in SYNONYMS.get(word, []):
+            candidates.append(" ".join(keywords[:i] + [synonym] + keywords[i + 1:]))
+
+    variants, seen = [], {query.strip().lower()}
+    for candidate in candidates:
+        if candidate and candidate not in seen:
+            seen.add(candidate)
+            variants.append(candidate)
+    return variants[:max_variants]
@@ -0,0 +1,293 @@
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.vectorstores import VectorStore
+
+from app.core.config import RETRIEVAL_WORKERS
+from app.core.query_expansion import local_query_variants
+from app.core.scheduler import check_deadline
+from app.utils.clients import get_or_create
+from app.utils.keyword_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalResult(NamedTuple):
+    """Documents returned by a retrieval run, with the queries used and per-stage timings in ms"""
+    documents: List[Document]
+    scores: List[float]
+    queries: List[str]
+    timings: Dict[str, float]
+    strategy: str  # "first-pass", "llm" or "local"
+    best_relevance: float = 0.0  # Best dense relevance score of the original question
+
+
+def get_search_pool() -> ThreadPoolExecutor:
+    """Get the bounded thread pool shared by all vector searches"""
+    return get_or_create(
+        ("search_pool",),
+        lambda: ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="vector-search"),
+    )
+
+def parse_query_lines(text: str) -> List[str]:
+    """Split LLM output into one query per line, dropping any reasoning block"""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    return [line.strip() for line in text.strip().split("\n") if line.strip()]
+
+def unique_documents(scored_docs: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """Merge results from several searches, keeping the best score per chunk"""
+    best: Dict[str, Tuple[Document, float]] = {}
+    for doc, score in scored_docs:
+        if doc.page_content not in best or score > best[doc.page_content][1]:
+            best[doc.page_content] = (doc, score)
+    return sorted(best.values(), key=lambda pair: pair[1], reverse=True)
+
+def _stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") else token
+
+def section_filter(query: str, sections: Iterable[str]) -> Optional[dict]:
+    """
+    Build a metadata filter for the site sections a question names.
+
+    Args:
+        query: The user's question
+        sections: Section names recorded at ingest time (e.g. "admissions")
+
+    Returns:
+        A Pinecone-style filter on the "section" field, or None if the
+        question does not mention any section
+    """
+    terms = {_stem(token) for token in tokenize(query)}
+    matched = [
+        section for section in sections
+        if terms & {_stem(token) for token in tokenize(section.replace("-", " ").replace("_", " "))}
+    ]
+    return {"section": {"$in": sorted(matched)}} if matched else None
+
+def dedupe_pages(documents: List[Document], max_per_page: int = 2) -> List[Document]:
+    """
+    Keep at most max_per_page chunks from each source page, preserving rank order.
+
+    Chunks without a URL (such as the flat-text ingest mode) are kept as they are.
+    """
+    kept, per_page = [], {}
+    for doc in documents:
+        url = doc.metadata.get("url")
+        if url:
+            per_page[url] = per_page.get(url, 0) + 1
+            if per_page[url] > max_per_page:
+                continue
+        kept.append(doc)
+    return kept
+
+def format_context(documents: List[Document]) -> str:
+    """Render retrieved chunks for the prompt, grouping chunks of the same page under one source line"""
+    pages: Dict[str, List[Document]] = {}
+    for doc in documents:
+        pages.setdefault(doc.metadata.get("url") or doc.page_content, []).append(doc)
+
+    blocks = []
+    for chunks in pages.values():
+        metadata = chunks[0].metadata
+        text = "\n...\n".join(doc.page_content for doc in chunks)
+        if metadata.get("url"):
+            title = metadata.get("title") or metadata["url"]
+            blocks.append(f"Source: {title} ({metadata['url']})\n{text}")
+        else:
+            blocks.append(text)
+    return "\n\n".join(blocks)
+
+
+class MultiQueryRetrieval:
+    """
+    Multi-query retrieval with batched embedding and concurrent vector search.
+
+    The query variants are embedded in a single embed_documents call and their
+    searches run on a bounded shared pool, replacing the one-query-at-a-time
+    loop of LangChain's MultiQueryRetriever.
+
+    When a confidence bar is set, the original question is searched first and
+    expansion only happens if its best match scores below the bar.
+
+    With a keyword index, every query also runs a BM25 search and the dense and
+    keyword rankings are combined with reciprocal-rank fusion; only the
+    fused_k best fused chunks are kept.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        llm: Optional[BaseLanguageModel],
+        query_prompt: Optional[PromptTemplate],
+        k: int = 3,
+        score_threshold: Optional[float] = None,
+        include_original: bool = False,
+        confidence: Optional[float] = None,
+        expansion: str = "llm",
+        keyword_index: Optional[BM25Index] = None,
+        fused_k: Optional[int] = None,
+    ):
+        if expansion not in ("llm", "local"):
+            raise ValueError("Invalid expansion. Use 'llm' or 'local'.")
+        if expansion == "llm" and (llm is None or query_prompt is None):
+            raise ValueError("An LLM and query prompt are required for 'llm' expansion.")
+
+        self.vector_store = vector_store
+        self.query_chain = query_prompt | llm | StrOutputParser() if expansion == "llm" else None
+        self.k = k
+        self.score_threshold = score_threshold
+        self.include_original = include_original
+        self.confidence = confidence
+        self.expansion = expansion
+        self.keyword_index = keyword_index
+        self.fused_k = fused_k or k
+        self.relevance_score_fn = vector_store._select_relevance_score_fn()
+
+    def generate_queries(self, query: str) -> List[str]:
+        """Produce alternative phrasings of the question with the configured expansion"""
+        if self.expansion == "local":
+            queries = local_query_variants(query)
+        else:
+            queries = parse_query_lines(self.query_chain.invoke({"question": query}))
+        if self.include_original:
+            queries.insert(0, query)
+        return queries or [query]
+
+    def _search(self, vector: List[float], filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        """Run one vector search and apply the relevance score threshold"""
+        if filter:
+            results = self.vector_store.similarity_search_by_vector_with_score(vector, k=self.k, filter=filter)
+        else:
+            results = self.vector_store.similarity_search_by_vector_with_score(vector, k=self.k)
+        scored = [(doc, self.relevance_score_fn(score)) for doc, score in results]
+        if self.score_threshold is not None:
+            scored = [(doc, score) for doc, score in scored if score >= self.score_threshold]
+        return scored
+
+    def search(
+        self, queries: List[str], parallel: bool = True, filter: Optional[dict] = None
+    ) -> Tuple[List[Tuple[Document, float]], float, Dict[str, float]]:
+        """
+        Embed and search a list of queries, then merge and dedupe the results.
+
+        Args:
+            queries: The queries to search for
+            parallel: Batch the embeddings and search concurrently; False runs
+                one embed_query and one search at a time for comparison
+            filter: Optional metadata filter applied to dense and keyword search
+
+        Returns:
+            The merged (document, score) pairs, the best dense relevance score
+            and the embed/search/keyword/merge timings in ms. Scores are dense
+            relevance scores, or fused RRF scores (the fused_k best) when a
+            keyword index is set.
+        """
+        timings = {}
+        embedder = self.vector_store.embeddings
+
+        start = time.perf_counter()
+        if parallel:
+            vectors = embedder.embed_documents(queries)
+        else:
+            vectors = [embedder.embed_query(q) for q in queries]
+        timings["embed"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        if parallel and len(vectors) > 1:
+            result_lists = list(get_search_pool().map(lambda vector: self._search(vector, filter), vectors))
+        else:
+            result_lists = [self._search(vector, filter) for vector in vectors]
+        timings["search"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        keyword_lists = [self.keyword_index.search(q, k=self.k, filter=filter) for q in queries] if self.keyword_index else []
+        timings["keyword"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        dense = [pair for results in result_lists for pair in results]
+        best_relevance = max((score for _, score in dense), default=0.0)
+        if keyword_lists:
+            merged = reciprocal_rank_fusion(
+                [[doc for doc, _ in results] for results in result_lists + keyword_lists]
+            )[:self.fused_k]
+        else:
+            merged = unique_documents(dense)
+        timings["merge"] = (time.perf_counter() - start) * 1000
+        return merged, best_relevance, timings
+
+    def retrieve(
+        self, query: str, parallel: bool = True, filter: Optional[dict] = None, expand: bool = True
+    ) -> RetrievalResult:
+        """
+        Retrieve documents for a question, expanding it into variants when needed.
+
+        Args:
+            query: The user's question
+            parallel: Whether to batch embeddings and run searches concurrently
+            filter: Optional metadata filter restricting every search
+            expand: False to only search the question itself, however weak its matches
+
+        Returns:
+            The retrieved documents, the queries used and per-stage timings
+        """
+        timings = {"first_pass": 0.0, "expand": 0.0, "embed": 0.0, "search": 0.0, "keyword": 0.0, "merge": 0.0}
+        first_pass: List[Tuple[Document, float]] = []
+        best_relevance = 0.0
+
+        if self.confidence is not None or not expand:
+            start = time.perf_counter()
+            first_pass, best_relevance, _ = self.search([query], parallel=parallel, filter=filter)
+            timings["first_pass"] = (time.perf_counter() - start) * 1000
+
+            top_scores = [round(score, 3) for _, score in first_pass]
+            confident = not expand or best_relevance >= self.confidence
+            logger.info(
+                "Query expansion %s: best relevance %.3f, top scores %s, confidence bar %s, query %r",
+                ("skipped" if expand else "disabled") if confident else f"needed ({self.expansion})",
+                best_relevance, top_scores, self.confidence, query,
+            )
+            if confident:
+                timings["total"] = timings["first_pass"]
+                return RetrievalResult(
+                    documents=[doc for doc, _ in first_pass],
+                    scores=[score for _, score in first_pass],
+                    queries=[query],
+                    timings=timings,
+                    strategy="first-pass",
+                    best_relevance=best_relevance,
+                )
+
+        check_deadline("query expansion")
+        start = time.perf_counter()
+        queries = self.generate_queries(query)
+        timings["expand"] = (time.perf_counter() - start) * 1000
+
+        merged, _, search_timings = self.search(queries, parallel=parallel, filter=filter)
+        timings.update(search_timings)
+        if first_pass:
+            if self.keyword_index:
+                merged = reciprocal_rank_fusion(
+                    [[doc for doc, _ in first_pass], [doc for doc, _ in merged]]
+                )[:self.fused_k]
+            else:
+                merged = unique_documents(first_pass + merged)
+            queries = [query] + queries
+        timings["total"] = sum(timings.values())
+        logger.info("Retrieved %d documents for %d queries, timings (ms): %s",
+                    len(merged), len(queries), {k: round(v, 1) for k, v in timings.items()})
+
+        return RetrievalResult(
+            documents=[doc for doc, _ in merged],
+            scores=[score for _, score in merged],
+            queries=queries,
+            timings=timings,
+            strategy=self.expansion,
+            best_relevance=best_relevance,
+        )
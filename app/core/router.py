@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from app.utils.clients import get_or_create
+from app.utils.embeddings import get_embedding_model
+
+# Labelled seed queries used to build one centroid per route
+SEED_QUERIES: Dict[str, List[str]] = {
+    "university": [
+        "What are the admission requirements for Agriculture University Peshawar?",
+        "Who is the vice chancellor of AUP?",
+        "How do I apply for a hostel room on campus?",
+        "What is the fee structure for the BSc Hons Agriculture program?",
+        "When does the fall semester start at the university?",
+        "Which departments are in the Faculty of Crop Production Sciences?",
+        "How can I contact the university examination office?",
+        "What scholarships does the university offer to students?",
+        "Where is the university library and what are its timings?",
+        "How do I get my degree verified from the registrar?",
+        "What MPhil and PhD programs are offered by the institute?",
+        "Is there a merit list for undergraduate admissions this year?",
+    ],
+    "web search": [
+        "What is the weather in Peshawar today?",
+        "Latest news about the Pakistan cricket team",
+        "What is the current price of gold?",
+        "Who won the election yesterday?",
+        "What is the dollar to rupee exchange rate right now?",
+        "Upcoming tech conferences this month",
+        "What happened in the stock market today?",
+        "Current petrol price in Pakistan",
+        "Recent announcements by the Higher Education Commission",
+        "What are today's top headlines?",
+        "When is the next iPhone release date?",
+        "Score of the football match last night",
+    ],
+    "general": [
+        "Explain the process of photosynthesis.",
+        "What is the difference between mitosis and meiosis?",
+        "How does a neural network learn?",
+        "Can you explain Newton's laws of motion?",
+        "What is the law of supply and demand?",
+        "How should I prepare for my final exams?",
+        "Explain the concept of recursion in programming.",
+        "What are the main causes of soil erosion?",
+        "How do I write a good research paper introduction?",
+        "What is the Pythagorean theorem?",
+        "What career options are there after a degree in agronomy?",
+        "Summarize the theory of evolution by natural selection.",
+    ],
+}
+
+
+class EmbeddingRouter:
+    """
+    Nearest-centroid query classifier built on the shared embedding model.
+
+    Each route is represented by the normalized mean embedding of its seed
+    queries; a query is assigned to the route with the highest cosine similarity.
+    """
+
+    def __init__(self, embedding_model: Embeddings, seeds: Optional[Dict[str, List[str]]] = None):
+        self.embedding_model = embedding_model
+        seeds = seeds or SEED_QUERIES
+        self.labels = list(seeds.keys())
+
+        centroids = []
+        for label in self.labels:
+            vectors = np.asarray(embedding_model.embed_documents(seeds[label]), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+        self.centroids = np.vstack(centroids)
+
+    def classify(self, query: str) -> Tuple[str, float, Dict[str, float]]:
+        """
+        Classify a query against the route centroids.
+
+        Args:
+            query: The user's question
+
+        Returns:
+            The best route, its margin over the runner-up, and the score per route
+        """
+        vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-12
+        scores = self.centroids @ vector
+
+        order = np.argsort(scores)[::-1]
+        best = int(order[0])
+        margin = float(scores[best] - scores[order[1]]) if len(order) > 1 else 1.0
+        return self.labels[best], margin, {label: float(s) for label, s in zip(self.labels, scores)}
+
+
+def get_router() -> EmbeddingRouter:
+    """
+    Get the process-wide embedding router, building the centroids on first use.
+
+    Returns:
+        The router instance
+    """
+    return get_or_create(("embedding_router",), lambda: EmbeddingRouter(get_embedding_model()))
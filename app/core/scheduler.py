@@ -0,0 +1,276 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+import numpy as np
+
+from app.core.config import REQUEST_QUEUE_SIZE, REQUEST_TIMEOUT, REQUEST_WORKERS
+from app.utils.clients import get_or_create
+
+logger = logging.getLogger(__name__)
+
+
+class RequestAborted(Exception):
+    """A request stopped before its answer was complete"""
+
+
+class Busy(RequestAborted):
+    """The request queue is full, so the request was not admitted"""
+
+
+class DeadlineExceeded(RequestAborted, TimeoutError):
+    """The request ran past its deadline"""
+
+
+class RequestCancelled(RequestAborted):
+    """The caller abandoned the request"""
+
+
+class RequestHandle:
+    """Deadline, cancellation flag and output queue of one scheduled request"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.cancelled = threading.Event()
+        self.output: "queue.Queue[Any]" = queue.Queue()
+        self.future: Optional[Future] = None
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+# Handle of the request running on the current worker thread, if any
+_current_request: contextvars.ContextVar[Optional[RequestHandle]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+# End-of-stream marker put on a request's output queue by its worker
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _stop_reason(handle: RequestHandle) -> Optional[str]:
+    """Why a request should stop ("deadline_exceeded" or "cancelled"), or None to carry on"""
+    if handle.remaining() <= 0:
+        return "deadline_exceeded"
+    if handle.cancelled.is_set():
+        return "cancelled"
+    return None
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None outside a scheduled request"""
+    handle = _current_request.get()
+    return None if handle is None else handle.remaining()
+
+def check_deadline(stage: str = "") -> None:
+    """
+    Stop the current request if it was cancelled or ran out of time.
+
+    Agents call this before expensive stages (LLM calls, web searches) so
+    abandoned work does not keep spending quota. Does nothing outside a
+    scheduled request.
+
+    Raises:
+        RequestCancelled: If the caller abandoned the request
+        DeadlineExceeded: If the request's deadline has passed
+    """
+    handle = _current_request.get()
+    reason = _stop_reason(handle) if handle is not None else None
+    if reason == "deadline_exceeded":
+        raise DeadlineExceeded(f"Request deadline passed before {stage or 'the next stage'}")
+    if reason == "cancelled":
+        raise RequestCancelled(f"Request cancelled before {stage or 'the next stage'}")
+
+
+class RequestStream:
+    """
+    Iterator over the items of a scheduled request, as its worker produces them.
+
+    Iteration raises DeadlineExceeded once the request's deadline passes.
+    Closing the stream, explicitly, as a context manager or when it is
+    garbage collected, cancels the request.
+    """
+
+    def __init__(self, scheduler: "RequestScheduler", handle: RequestHandle):
+        self._scheduler = scheduler
+        self._handle = handle
+        self._closed = False
+
+    def __iter__(self) -> "RequestStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._closed:
+            raise StopIteration
+        try:
+            item = self._handle.output.get(timeout=max(self._handle.remaining(), 0))
+        except queue.Empty:
+            self.close()
+            raise DeadlineExceeded("No answer before the request deadline") from None
+        if item is _DONE:
+            self.close()
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self.close()
+            raise item.error
+        return item
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._scheduler._abandon(self._handle)
+
+    def __enter__(self) -> "RequestStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class RequestScheduler:
+    """
+    Process-wide scheduler running agent requests on a fixed worker pool.
+
+    At most max_queue requests wait for a worker; further requests are
+    rejected with Busy straight away instead of piling up. Each request has
+    a deadline: the caller stops waiting when it passes, queued requests
+    that are abandoned or expired never start, and a running request's
+    stream is closed between chunks, which also closes the LLM's HTTP
+    stream. Agents can check the deadline themselves with check_deadline().
+    """
+
+    def __init__(self, workers: int = 8, max_queue: int = 16, timeout: float = 60.0, window: int = 500):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-request")
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=window)
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.deadline_exceeded = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def stream(self, fn: Callable[..., Iterable[Any]], *args, timeout: Optional[float] = None) -> RequestStream:
+        """
+        Schedule a streaming request and return its items as they are produced.
+
+        Args:
+            fn: Function returning an iterable (usually a generator) of items
+            *args: Arguments for fn
+            timeout: Seconds until the request's deadline (defaults to the scheduler's)
+
+        Returns:
+            An iterator over the items; closing it cancels the request
+
+        Raises:
+            Busy: If the queue is full (raised here, before anything is scheduled)
+        """
+        with self._lock:
+            # Requests not yet picked up by a worker count as queued only beyond the idle workers
+            if self.queued + self.running >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise Busy(f"{self.queued} requests are already waiting")
+            self.queued += 1
+            self.submitted += 1
+
+        handle = RequestHandle(time.monotonic() + (self.timeout if timeout is None else timeout))
+        handle.future = self._pool.submit(self._run, handle, fn, args)
+        return RequestStream(self, handle)
+
+    def _run(self, handle: RequestHandle, fn: Callable[..., Iterable[Any]], args) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._waits.append((time.monotonic() - handle.submitted) * 1000)
+
+        token = _current_request.set(handle)
+        # Requests abandoned or expired while queued never start
+        outcome = _stop_reason(handle)
+        try:
+            if outcome is None:
+                outcome = "completed"
+                items = iter(fn(*args))
+                try:
+                    for item in items:
+                        reason = _stop_reason(handle)
+                        if reason:
+                            outcome = reason
+                            break
+                        handle.output.put(item)
+                finally:
+                    # Closing the generator closes the LLM stream, so no more tokens are generated
+                    close = getattr(items, "close", None)
+                    if close is not None:
+                        close()
+        except RequestCancelled as e:
+            outcome = "cancelled"
+            handle.output.put(_Failure(e))
+        except DeadlineExceeded as e:
+            outcome = "deadline_exceeded"
+            handle.output.put(_Failure(e))
+        except Exception as e:
+            outcome = "failed"
+            logger.exception("Scheduled request failed")
+            handle.output.put(_Failure(e))
+        finally:
+            _current_request.reset(token)
+            handle.output.put(_DONE)
+            with self._lock:
+                self.running -= 1
+                setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def _abandon(self, handle: RequestHandle) -> None:
+        """Stop a request whose caller no longer reads it"""
+        handle.cancelled.set()
+        if handle.future is not None and handle.future.cancel():
+            # Never started, so _run will not update the counters
+            with self._lock:
+                self.queued -= 1
+                if handle.remaining() <= 0:
+                    self.deadline_exceeded += 1
+                else:
+                    self.cancelled += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, running requests, outcome counters and queue wait percentiles in ms"""
+        with self._lock:
+            waits = np.array(self._waits, dtype=float)
+            return {
+                "workers": self.workers,
+                "queued": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "deadline_exceeded": self.deadline_exceeded,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "wait_p50_ms": float(np.percentile(waits, 50)) if waits.size else 0.0,
+                "wait_p95_ms": float(np.percentile(waits, 95)) if waits.size else 0.0,
+            }
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get the process-wide scheduler for agent requests"""
+    return get_or_create(("request_scheduler",), lambda: RequestScheduler(
+        workers=REQUEST_WORKERS,
+        max_queue=REQUEST_QUEUE_SIZE,
+        timeout=REQUEST_TIMEOUT,
+    ))
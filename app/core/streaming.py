@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from app.utils.clients import get_or_create
+
+logger = logging.getLogger(__name__)
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ErrorMessage(str):
+    """
+    Text an agent yields when it could not answer properly.
+
+    It is shown like any other chunk, but answers containing one are never
+    cached. An empty ErrorMessage marks an answer as degraded without
+    changing its text.
+    """
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+def strip_think(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Remove <think>...</think> blocks from a stream of text chunks.
+
+    Tags may be split across chunks, so a possible partial tag at the end of
+    a chunk is held back until the next one arrives. Whitespace at the start
+    of the answer (usually left after the reasoning block) is dropped.
+    """
+    buffer, inside, started = "", False, False
+    for chunk in chunks:
+        buffer += chunk
+        while buffer:
+            if inside:
+                end = buffer.find(THINK_CLOSE)
+                if end < 0:
+                    buffer = buffer[len(buffer) - _partial_tag(buffer, THINK_CLOSE):]
+                    break
+                buffer, inside = buffer[end + len(THINK_CLOSE):], False
+                continue
+
+            start = buffer.find(THINK_OPEN)
+            if start < 0:
+                keep = _partial_tag(buffer, THINK_OPEN)
+                text, buffer = buffer[:len(buffer) - keep], buffer[len(buffer) - keep:]
+            else:
+                text, buffer, inside = buffer[:start], buffer[start + len(THINK_OPEN):], True
+            if not started:
+                text = text.lstrip()
+                started = bool(text)
+            if text:
+                yield text
+            if start < 0:
+                break
+    if buffer and not inside:
+        text = buffer if started else buffer.lstrip()
+        if text:
+            yield text
+
+
+class StreamMetrics:
+    """
+    Rolling time-to-first-token and total latency per agent.
+
+    The last window samples of each agent are kept, so the summary follows
+    the current behaviour of the LLM provider rather than the whole uptime.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque] = {}
+
+    def record(self, agent: str, first_token_ms: Optional[float], total_ms: float, chars: int) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(agent, deque(maxlen=self.window))
+            samples.append((first_token_ms, total_ms, chars))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and p50/p95 time to first token and total time in ms, per agent"""
+        with self._lock:
+            snapshot = {agent: list(samples) for agent, samples in self._samples.items()}
+        summary = {}
+        for agent, samples in snapshot.items():
+            first = np.array([s[0] for s in samples if s[0] is not None], dtype=float)
+            total = np.array([s[1] for s in samples], dtype=float)
+            summary[agent] = {
+                "streams": len(samples),
+                "first_token_p50_ms": float(np.percentile(first, 50)) if first.size else 0.0,
+                "first_token_p95_ms": float(np.percentile(first, 95)) if first.size else 0.0,
+                "total_p50_ms": float(np.percentile(total, 50)),
+                "total_p95_ms": float(np.percentile(total, 95)),
+            }
+        return summary
+
+
+def get_stream_metrics() -> StreamMetrics:
+    """Get the process-wide streaming latency metrics"""
+    return get_or_create(("stream_metrics",), StreamMetrics)
+
+def timed_stream(agent: str, chunks: Iterable[str], started: Optional[float] = None) -> Iterator[str]:
+    """
+    Pass a stream of text chunks through, recording its time to first token.
+
+    The time is measured from started (a time.perf_counter() value, defaulting
+    to when the stream is first read) to the first non-empty chunk, and is
+    recorded in the shared StreamMetrics when the stream ends or is closed.
+    """
+    started = time.perf_counter() if started is None else started
+    first_token_ms = None
+    chars = 0
+    try:
+        for chunk in chunks:
+            if chunk and first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            chars += len(chunk)
+            yield chunk
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        get_stream_metrics().record(agent, first_token_ms, total_ms, chars)
+        logger.info("%s streamed %d chars, first token after %s ms, total %.0f ms", agent, chars,
+                    "n/a" if first_token_ms is None else f"{first_token_ms:.0f}", total_ms)
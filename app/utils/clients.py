@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+import httpx
+from langchain_groq import ChatGroq
+
+# Process-wide registry of long-lived clients, chains and agents
+_REGISTRY: Dict[Hashable, Any] = {}
+_REGISTRY_LOCK = threading.RLock()
+
+# Connection pool limits shared by every Groq client in the process
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=16,
+    keepalive_expiry=120,
+)
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Get a shared object from the registry, building it on first use.
+
+    The factory runs at most once per key, even when several Streamlit
+    sessions ask for the same object at the same time.
+
+    Args:
+        key: Registry key identifying the object
+        factory: Zero-argument callable that builds the object
+
+    Returns:
+        The shared object
+    """
+    try:
+        return _REGISTRY[key]
+    except KeyError:
+        pass
+    with _REGISTRY_LOCK:
+        if key not in _REGISTRY:
+            _REGISTRY[key] = factory()
+        return _REGISTRY[key]
+
+def get_or_create_versioned(key: Hashable, version: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Get a shared object that is rebuilt whenever the data it was built from changes.
+
+    Like get_or_create, but the object is stored with the version it was
+    built for; asking for another version builds a new object in its place.
+
+    Args:
+        key: Registry key identifying the object
+        version: Version of the data the object depends on
+        factory: Zero-argument callable that builds the object
+
+    Returns:
+        The shared object for the current version
+    """
+    entry = _REGISTRY.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    with _REGISTRY_LOCK:
+        entry = _REGISTRY.get(key)
+        if entry is None or entry[0] != version:
+            entry = _REGISTRY[key] = (version, factory())
+        return entry[1]
+
+def clear_registry() -> None:
+    """Drop every shared object so the next call rebuilds it"""
+    with _REGISTRY_LOCK:
+        _REGISTRY.clear()
+
+def get_http_client() -> httpx.Client:
+    """
+    Get the shared keep-alive HTTP client used by the LLM clients.
+
+    Returns:
+        The pooled httpx client
+    """
+    return get_or_create(
+        ("http_client",),
+        lambda: httpx.Client(limits=HTTP_POOL_LIMITS, timeout=httpx.Timeout(60.0, connect=10.0)),
+    )
+
+def get_llm(model_name: str, **kwargs) -> ChatGroq:
+    """
+    Get a shared ChatGroq client for the given model and settings.
+
+    Args:
+        model_name: The Groq model name
+        **kwargs: Extra ChatGroq settings such as temperature or max_tokens
+
+    Returns:
+        The ChatGroq client, reusing the pooled HTTP connections
+    """
+    key = ("llm", model_name, tuple(sorted(kwargs.items())))
+    return get_or_create(
+        key,
+        lambda: ChatGroq(model_name=model_name, http_client=get_http_client(), **kwargs),
+    )
+
+def get_pinecone_index(index_name: str):
+    """
+    Get a shared handle to a Pinecone index.
+
+    Args:
+        index_name: Name of the Pinecone index
+
+    Returns:
+        The Pinecone index client
+    """
+    import pinecone
+
+    api_key = os.getenv("PINECONE_API_KEY")
+    client = get_or_create(("pinecone", api_key), lambda: pinecone.Pinecone(api_key=api_key))
+    return get_or_create(("pinecone_index", api_key, index_name), lambda: client.Index(index_name))
@@ -0,0 +1,468 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import heapq
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "university-ai-assistant-crawler/1.0"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: up to burst requests at once, refilled at rate per second.
+
+    acquire() blocks the calling thread until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, waiting if necessary; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket.acquire()
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """
+    Build a requests session with a keep-alive connection pool sized for the crawl.
+
+    Args:
+        pool_size: Maximum pooled connections per host
+
+    Returns:
+        The session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class PageState(NamedTuple):
+    """What the crawler remembers about a URL between runs"""
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+    content_hash: str
+    content: str
+    links: List[str]
+
+
+class CrawlStateStore:
+    """
+    Per-URL crawl state in SQLite: validators, hashes, extracted content and links.
+
+    Keeping the content and links lets an unchanged page (a 304, or a 200 with
+    the same body) be reused without parsing it again.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "body_hash TEXT NOT NULL, content_hash TEXT NOT NULL, content TEXT NOT NULL, links TEXT NOT NULL)"
+        )
+
+    def get(self, url: str) -> Optional[PageState]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return PageState(*row[:6], json.loads(row[6]))
+
+    def put(self, state: PageState) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*state[:6], json.dumps(state.links)),
+            )
+
+    def delete(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Extensions of links that are never HTML pages
+ASSET_EXTENSIONS = frozenset((
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".zip", ".rar", ".7z", ".gz",
+    ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp", ".ico", ".tif", ".tiff",
+    ".mp3", ".mp4", ".avi", ".mov", ".wmv", ".webm", ".css", ".js", ".json", ".xml", ".txt",
+    ".woff", ".woff2", ".ttf", ".eot", ".exe", ".apk",
+))
+
+# Query parameters that only track visitors or sessions
+IGNORED_PARAMS = frozenset(("fbclid", "gclid", "msclkid", "phpsessid", "jsessionid", "sessionid", "sid", "ref"))
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so variants of the same page compare equal.
+
+    Lowercases the scheme and host, drops default ports, fragments, tracking
+    and session query parameters, resolves dot segments and duplicate slashes,
+    strips trailing slashes and index pages, and sorts the remaining query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+
+    segments = []
+    for segment in parts.path.split("/"):
+        if segment in ("", "."):
+            continue
+        if segment == "..":
+            if segments:
+                segments.pop()
+            continue
+        segments.append(segment)
+    if segments and segments[-1].lower() in ("index.html", "index.htm", "index.php", "default.aspx"):
+        segments.pop()
+    path = "/" + "/".join(segments)
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in IGNORED_PARAMS and not key.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def is_asset_url(url: str) -> bool:
+    """Whether a URL points at a file type that is never an HTML page"""
+    return os.path.splitext(urlsplit(url).path)[1].lower() in ASSET_EXTENSIONS
+
+
+class NotHTML(Exception):
+    """Raised for responses whose content type is not HTML"""
+
+
+class Frontier:
+    """
+    Priority queue of canonical URLs still to crawl.
+
+    URLs are ordered by depth (breadth-first), then URLs without a query string
+    before those with one, then discovery order. Each canonical URL is queued
+    at most once.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, int, str]] = []
+        self._seq = 0
+        self.seen = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, url: str, depth: int) -> bool:
+        """Queue a URL unless it was seen before; returns whether it was queued"""
+        url = canonicalize_url(url)
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        heapq.heappush(self._heap, (depth, "?" in url, self._seq, url))
+        self._seq += 1
+        return True
+
+    def requeue(self, url: str, depth: int) -> None:
+        """Put back a URL that was taken but not finished"""
+        heapq.heappush(self._heap, (depth, "?" in url, self._seq, url))
+        self._seq += 1
+
+    def pop(self) -> Tuple[str, int]:
+        """Take the next URL and its depth"""
+        depth, _, _, url = heapq.heappop(self._heap)
+        return url, depth
+
+    def to_dict(self) -> dict:
+        return {"queue": [[url, depth] for depth, _, _, url in sorted(self._heap)], "seen": sorted(self.seen)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Frontier":
+        frontier = cls()
+        frontier.seen = set(data["seen"])
+        for url, depth in data["queue"]:
+            frontier.requeue(url, depth)
+        return frontier
+
+
+class CrawledPage(NamedTuple):
+    """A page produced by a crawl"""
+    url: str
+    content: str
+    status: str  # "new", "changed" or "unchanged"
+    fetched_at: float  # Unix time the page was fetched or revalidated
+
+
+class CrawlStats(NamedTuple):
+    """Outcome of a crawl"""
+    pages: int
+    changed: int  # New or changed pages; the rest were unchanged
+    errors: int
+    skipped: int  # Responses that turned out not to be HTML
+    resumed: int  # Pages carried over from an interrupted crawl
+    seconds: float
+    pages_per_second: float  # Pages fetched by this run per second
+    rate_limit_wait: float  # Total seconds workers spent waiting for a token
+
+
+class Crawler:
+    """
+    Breadth-first concurrent crawler.
+
+    Pages are fetched on a bounded thread pool through one pooled session, with
+    a token-bucket rate limit per host instead of a fixed sleep between
+    requests. Each worker fetches and processes its page; results are yielded
+    on the calling thread, so output can be written without extra locking.
+
+    URLs are canonicalized and scheduled through a Frontier, links to assets
+    are skipped by extension and responses by content type, and the frontier
+    is checkpointed so an interrupted crawl can resume.
+    """
+
+    def __init__(
+        self,
+        is_valid: Callable[[str], bool],
+        concurrency: int = 8,
+        rate: float = 2.0,
+        burst: int = 1,
+        max_pages: int = 200,
+        timeout: float = 10,
+        session: Optional[requests.Session] = None,
+        state: Optional[CrawlStateStore] = None,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: int = 20,
+    ):
+        self.is_valid = is_valid
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(rate, burst)
+        self.session = session or get_session(concurrency)
+        self.state = state
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.stats: Optional[CrawlStats] = None
+        self._waited = 0.0
+        self._waited_lock = threading.Lock()
+
+    def fetch(self, url: str, previous: Optional[PageState] = None) -> requests.Response:
+        """GET a page once its host's rate limit allows, conditionally if it was seen before"""
+        headers = {}
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+
+        waited = self.limiter.acquire(url)
+        with self._waited_lock:
+            self._waited += waited
+        # Streamed, so the body of a non-HTML response is never downloaded
+        response = self.session.get(url, timeout=self.timeout, headers=headers, stream=True)
+        if response.status_code in (404, 410) and self.state is not None:
+            self.state.delete(url)
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "text/html").lower()
+        if response.status_code != 304 and "html" not in content_type:
+            response.close()
+            raise NotHTML(content_type)
+        return response
+
+    def _work(
+        self, url: str, process: Callable[[str, requests.Response], Tuple[str, Iterable[str]]]
+    ) -> Tuple[CrawledPage, List[str]]:
+        previous = self.state.get(url) if self.state is not None else None
+        response = self.fetch(url, previous)
+        # The response is streamed; closing it returns the connection to the pool on every path
+        with response:
+            if previous is not None and response.status_code == 304:
+                return CrawledPage(url, previous.content, "unchanged", time.time()), previous.links
+
+            body_hash = hashlib.sha256(response.content).hexdigest()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if previous is not None and previous.body_hash == body_hash:
+                # Server ignored the validators but the page is byte-identical
+                self.state.put(previous._replace(etag=etag, last_modified=last_modified))
+                return CrawledPage(url, previous.content, "unchanged", time.time()), previous.links
+
+            content, links = process(url, response)
+            links = list(links)
+            digest = content_hash(content)
+            if self.state is not None:
+                self.state.put(PageState(url, etag, last_modified, body_hash, digest, content, links))
+            if previous is None:
+                status = "new"
+            else:
+                status = "unchanged" if previous.content_hash == digest else "changed"
+            return CrawledPage(url, content, status, time.time()), links
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self, frontier: Frontier, in_flight: Iterable[Tuple[str, int]], done: Dict[str, str]) -> None:
+        """Atomically record the frontier (with unfinished URLs put back) and the finished pages"""
+        data = frontier.to_dict()
+        data["queue"] = [[url, depth] for url, depth in in_flight] + data["queue"]
+        data["done"] = done
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self) -> None:
+        """Forget a saved crawl so the next one starts from scratch"""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def crawl(
+        self,
+        start_urls: Iterable[str],
+        process: Callable[[str, requests.Response], Tuple[str, Iterable[str]]],
+    ) -> Iterator[CrawledPage]:
+        """
+        Crawl from the start URLs until the frontier is empty or max_pages are done.
+
+        With a state store, requests are conditional and unchanged pages are
+        served from the store without being parsed again. With a checkpoint
+        path, progress is saved every checkpoint_every pages and when the crawl
+        is interrupted; the next crawl resumes from it, first re-yielding the
+        pages already finished (from the state store), and the checkpoint is
+        removed once the crawl completes.
+
+        Args:
+            start_urls: Seed URLs
+            process: Called on a worker thread with each URL and response;
+                returns the extracted content and the links found on the page
+
+        Yields:
+            Every page fetched successfully, with whether it is new, changed or unchanged
+        """
+        checkpoint = self._load_checkpoint()
+        done: Dict[str, str] = {}
+        resumed = 0
+        if checkpoint is not None:
+            frontier = Frontier.from_dict(checkpoint)
+            done = checkpoint["done"]
+            print(f"Resuming crawl: {len(done)} pages done, {len(frontier)} queued")
+            for url, status in done.items():
+                previous = self.state.get(url) if self.state is not None else None
+                if previous is not None:
+                    resumed += 1
+                    yield CrawledPage(url, previous.content, status, time.time())
+        else:
+            frontier = Frontier()
+            for url in start_urls:
+                if self.is_valid(url):
+                    frontier.push(url, 0)
+
+        in_flight: Dict[Future, Tuple[str, int]] = {}
+        pages = errors = skipped = 0
+        self._waited = 0.0
+        started = time.perf_counter()
+        completed = False
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawl") as pool:
+                while frontier or in_flight:
+                    while frontier and len(in_flight) < self.concurrency and len(done) + len(in_flight) < self.max_pages:
+                        url, depth = frontier.pop()
+                        in_flight[pool.submit(self._work, url, process)] = (url, depth)
+                    if not in_flight:
+                        break
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        url, depth = in_flight.pop(future)
+                        try:
+                            page, links = future.result()
+                        except NotHTML:
+                            skipped += 1
+                            continue
+                        except Exception as e:
+                            errors += 1
+                            print(f"Error processing {url}: {e}")
+                            continue
+
+                        pages += 1
+                        done[url] = page.status
+                        for link in links:
+                            if self.is_valid(link) and not is_asset_url(link):
+                                frontier.push(link, depth + 1)
+                        if self.checkpoint_path and pages % self.checkpoint_every == 0:
+                            self._save_checkpoint(frontier, in_flight.values(), done)
+                        yield page
+            completed = True
+        finally:
+            if self.checkpoint_path:
+                if completed:
+                    self.clear_checkpoint()
+                else:
+                    self._save_checkpoint(frontier, in_flight.values(), done)
+            seconds = time.perf_counter() - started
+            changed = sum(status != "unchanged" for status in done.values())
+            self.stats = CrawlStats(pages + resumed, changed, errors, skipped, resumed, seconds,
+                                    pages / seconds if seconds else 0.0, self._waited)
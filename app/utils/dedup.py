@@ -0,0 +1,150 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+from app.utils.ingest import Page
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def line_key(line: str) -> bytes:
+    """Case- and whitespace-insensitive fingerprint of a line"""
+    return hashlib.blake2b(" ".join(line.lower().split()).encode("utf-8"), digest_size=8).digest()
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """
+    64-bit SimHash of a text over word shingles.
+
+    Texts that share most of their shingles get fingerprints that differ in
+    only a few bits.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle:
+        words = words + [""] * (shingle - len(words))
+    features = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features),
+        dtype=np.uint8,
+    ).reshape(-1, 8)
+    # One row of 64 bits per feature; each bit votes +1 or -1
+    votes = np.unpackbits(hashes, axis=1).astype(np.int32).sum(axis=0) * 2 - len(features)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+class SimHashIndex:
+    """
+    Finds fingerprints within max_distance bits of each other.
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints that
+    differ in at most max_distance bits must agree on at least one band, so
+    only fingerprints sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """A stored fingerprint near this one, or None"""
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for candidate in self._buckets[band].get(value, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint: int) -> None:
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._buckets[band].setdefault(value, []).append(fingerprint)
+
+
+class PageDeduplicator:
+    """
+    Removes boilerplate lines and near-duplicate pages from scraped pages.
+
+    fit() makes one pass over the pages counting in how many pages each line
+    occurs; lines found on at least min_fraction of the pages (and at least
+    min_pages of them), such as menus, headers and footers, are boilerplate.
+    transform() then strips those lines and drops any page whose remaining
+    text has a SimHash within max_distance bits of a page already kept.
+
+    Both passes stream, so only line fingerprints and page hashes stay in memory.
+    """
+
+    def __init__(self, min_fraction: float = 0.3, min_pages: int = 3, max_distance: int = 3, splitter=None):
+        self.min_fraction = min_fraction
+        self.min_pages = min_pages
+        self.max_distance = max_distance
+        # Counts the chunks of the original pages, so summary() can report how many were removed
+        self.splitter = splitter
+        self.boilerplate: Set[bytes] = set()
+        self.report: Dict[str, int] = {}
+
+    def fit(self, pages: Iterable[Page]) -> "PageDeduplicator":
+        counts: Counter = Counter()
+        n_pages = 0
+        for page in pages:
+            n_pages += 1
+            counts.update({line_key(line) for line in page.text.split("\n") if line.strip()})
+        cutoff = max(self.min_pages, self.min_fraction * n_pages)
+        self.boilerplate = {key for key, count in counts.items() if count >= cutoff}
+        return self
+
+    def transform(self, pages: Iterable[Page]) -> Iterator[Page]:
+        """Yield the pages that are not near-duplicates, with boilerplate lines removed"""
+        index = SimHashIndex(self.max_distance)
+        report = self.report = {
+            "pages_in": 0, "pages_out": 0, "duplicate_pages": 0, "boilerplate_lines": len(self.boilerplate),
+            "lines_removed": 0, "bytes_in": 0, "bytes_out": 0, "chunks_in": 0,
+        }
+        for page in pages:
+            report["pages_in"] += 1
+            report["bytes_in"] += len(page.text.encode("utf-8"))
+            if self.splitter is not None:
+                report["chunks_in"] += len(self.splitter.split_text(page.text))
+
+            lines = page.text.split("\n")
+            kept = [line for line in lines if line.strip() and line_key(line) not in self.boilerplate]
+            report["lines_removed"] += sum(1 for line in lines if line.strip()) - len(kept)
+            text = "\n".join(kept)
+            if not text:
+                report["duplicate_pages"] += 1
+                continue
+
+            fingerprint = simhash(text)
+            if index.find(fingerprint) is not None:
+                report["duplicate_pages"] += 1
+                continue
+            index.add(fingerprint)
+
+            report["pages_out"] += 1
+            report["bytes_out"] += len(text.encode("utf-8"))
+            yield page._replace(text=text)
+
+    def summary(self, chunks: Optional[int] = None) -> str:
+        """
+        One-line description of what the last transform() removed.
+
+        Args:
+            chunks: Number of chunks the kept pages were split into, counted
+                by the caller while chunking them; reported against the
+                chunks of the original pages when a splitter was given
+        """
+        r = self.report
+        saved = 1 - r["bytes_out"] / r["bytes_in"] if r.get("bytes_in") else 0.0
+        removed_chunks = ""
+        if chunks is not None and self.splitter is not None:
+            removed_chunks = f"{r['chunks_in'] - chunks} of {r['chunks_in']} chunks, "
+        return (
+            f"Dedup removed {r['bytes_in'] - r['bytes_out']} bytes ({saved:.1%}), {removed_chunks}"
+            f"{r['duplicate_pages']} near-duplicate pages and {r['lines_removed']} boilerplate lines "
+            f"({r['boilerplate_lines']} distinct)"
+        )
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.utils.parsing import ParsedPart, ParsePool
+from app.utils.response_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedDocument(NamedTuple):
+    """An uploaded file's extracted text and chunks, shared by every question about it"""
+    name: str
+    content_hash: str
+    pages: List[Document]
+    chunks: List[Document]
+    chars: int  # Characters held in pages and chunks, counted against the cache size
+    milliseconds: float
+    complete: bool = True  # False when parsing stopped before the end of the file
+
+
+class LoadedDocument(NamedTuple):
+    """Outcome of loading one file of a batch of uploads"""
+    name: str
+    document: Optional[ParsedDocument]  # None if the file could not be read
+    error: Optional[str]
+    cached: bool
+
+
+class DocumentCache:
+    """
+    In-memory LRU cache of parsed and chunked uploads, keyed by content hash.
+
+    Re-uploads and follow-up questions about the same file reuse its pages
+    and chunks instead of parsing and splitting it again, and the chunk
+    embeddings once they have been computed. Once the cached text exceeds
+    max_chars, the least recently used files are evicted together with their
+    embeddings.
+    """
+
+    def __init__(self, splitter, max_chars: int = 50_000_000):
+        self.splitter = splitter
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, ParsedDocument]" = OrderedDict()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[ParsedDocument]:
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+            return document
+
+    def put(self, document: ParsedDocument) -> None:
+        with self._lock:
+            previous = self._entries.pop(document.content_hash, None)
+            if previous is not None:
+                self._chars -= previous.chars
+            self._entries[document.content_hash] = document
+            self._chars += document.chars
+            # Always keep the newest file, even when it alone exceeds the cap
+            while self._chars > self.max_chars and len(self._entries) > 1:
+                key, evicted = self._entries.popitem(last=False)
+                self._vectors.pop(key, None)
+                self._chars -= evicted.chars
+                self.evictions += 1
+
+    def load(self, name: str, data: bytes) -> Tuple[ParsedDocument, bool]:
+        """
+        Get an upload's pages and chunks, parsing it only if it is not cached.
+
+        The same contents uploaded under another name reuse the cached entry,
+        which keeps the name it was first parsed under.
+
+        Args:
+            name: The file name, used to pick the parser and as the chunks' source
+            data: The file contents
+
+        Returns:
+            The parsed document, and whether it came from the cache
+
+        Raises:
+            ValueError: If the file cannot be parsed or its type is not supported
+        """
+        result = self.load_all([(name, data)])[0]
+        if result.error is not None:
+            raise ValueError(result.error)
+        return result.document, result.cached
+
+    def load_all(
+        self,
+        uploads: Sequence[Tuple[str, bytes]],
+        pool: Optional[ParsePool] = None,
+        max_chars: Optional[int] = None,
+    ) -> List[LoadedDocument]:
+        """
+        Get the pages and chunks of a batch of uploads, parsing the files not cached.
+
+        Files missing from the cache are parsed on pool (in this process if
+        there is none), their parts arriving as they finish. Once the text
+        read, cached files included, reaches max_chars, the remaining parts
+        are cancelled; files cut short are returned with complete=False and
+        are not cached. A file that cannot be parsed gets an error in its own
+        result, and the rest of the batch is unaffected.
+
+        Args:
+            uploads: (file name, file contents) of each upload
+            pool: Worker processes to parse on
+            max_chars: Stop parsing once this many characters of text have been read
+
+        Returns:
+            One LoadedDocument per upload, in upload order
+        """
+        start = time.perf_counter()
+        keys = [content_hash(data) for _, data in uploads]
+        results: List[Optional[LoadedDocument]] = [None] * len(uploads)
+        used = 0
+        # Content hash -> position of the first upload with that content
+        missing: Dict[str, int] = {}
+        for position, ((name, _), key) in enumerate(zip(uploads, keys)):
+            document = self.get(key)
+            if document is not None:
+                results[position] = LoadedDocument(name, document, None, True)
+                used += sum(len(page.page_content) for page in document.pages)
+            elif key not in missing:
+                missing[key] = position
+        with self._lock:
+            self.hits += len(uploads) - len(missing)
+            self.misses += len(missing)
+
+        order = list(missing.values())
+        received: Dict[int, List[ParsedPart]] = {position: [] for position in order}
+        errors: Dict[int, str] = {}
+        if order and (max_chars is None or used < max_chars):
+            parts = (pool or ParsePool(workers=1)).parts([uploads[position] for position in order])
+            try:
+                for part in parts:
+                    position = order[part.file]
+                    if part.error is not None:
+                        errors.setdefault(position, part.error)
+                        continue
+                    received[position].append(part)
+                    used += sum(len(text) for text, _ in part.pages)
+                    if max_chars is not None and used >= max_chars:
+                        break
+            finally:
+                # Cancels the parts not started yet
+                parts.close()
+
+        milliseconds = (time.perf_counter() - start) * 1000
+        for position in order:
+            name = uploads[position][0]
+            parts_read = sorted(received[position], key=lambda part: part.first_page)
+            if position in errors:
+                results[position] = LoadedDocument(name, None, errors[position], False)
+                continue
+            if not parts_read:
+                results[position] = LoadedDocument(
+                    name, None, "not read, the other files already fill the context budget", False
+                )
+                continue
+
+            pages = [Document(page_content=text, metadata=metadata) for part in parts_read for text, metadata in part.pages]
+            chunks = self.splitter.split_documents(pages)
+            chars = sum(len(doc.page_content) for doc in pages) + sum(len(doc.page_content) for doc in chunks)
+            complete = len(parts_read) == parts_read[0].parts
+            document = ParsedDocument(name, keys[position], pages, chunks, chars, milliseconds, complete)
+            if complete:
+                self.put(document)
+            results[position] = LoadedDocument(name, document, None, False)
+            logger.info("Parsed %s into %d chunks%s", name, len(chunks), "" if complete else " (stopped early)")
+
+        # Repeated uploads of the same contents within the batch share one parse
+        for position, key in enumerate(keys):
+            if results[position] is None:
+                results[position] = results[missing[key]]._replace(name=uploads[position][0])
+        logger.info("Loaded %d file(s), %d parsed, in %.0f ms", len(uploads), len(order), milliseconds)
+        return results
+
+    def vectors(self, document: ParsedDocument, embedding_model: Embeddings) -> np.ndarray:
+        """
+        Unit-length embeddings of a document's chunks, one row per chunk.
+
+        They are computed on first use and kept while the document is cached,
+        so only the first question about an upload pays for embedding it.
+        """
+        with self._lock:
+            vectors = self._vectors.get(document.content_hash)
+        if vectors is not None:
+            return vectors
+
+        start = time.perf_counter()
+        texts = [chunk.page_content for chunk in document.chunks]
+        if texts:
+            vectors = np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            if document.content_hash in self._entries:
+                self._vectors[document.content_hash] = vectors
+        logger.info("Embedded %d chunks of %s in %.0f ms", len(texts), document.name, (time.perf_counter() - start) * 1000)
+        return vectors
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
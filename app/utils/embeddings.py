@@ -1,9 +1,118 @@
 from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from langchain_core.embeddings import Embeddings
+from concurrent.futures import Future
 import functools
-from typing import Dict, Any, Optional
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_WAIT_MS,
+    EMBEDDING_BATCHING,
+    EMBEDDING_CACHE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_SIZE,
+)
+from app.utils.embedding_cache import CachedEmbeddings
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-base-en-v1.5"
 
 # Singleton instance
 _EMBEDDING_MODEL = None
+_EMBEDDING_LOCK = threading.Lock()
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Micro-batching front end for an embedding model shared by concurrent sessions.
+
+    Small embed requests from different threads are queued and a single worker
+    thread runs them together in one embed_documents call, flushing once the
+    batch holds max_batch_size texts or max_wait_ms has passed since its first
+    request. Results are fanned back out to the waiting callers. Queries are
+    batched through embed_documents, which for the bge model produces the same
+    vectors as embed_query.
+    """
+
+    def __init__(self, model: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.batched_texts = 0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.model.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.batched_texts += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _submit(self, texts: List[str]) -> List[List[float]]:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        # Large requests such as ingestion are already batched
+        if len(texts) >= self.max_batch_size:
+            return self.model.embed_documents(texts)
+        return self._submit(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit([text])[0]
+
+    def stats(self) -> Dict[str, float]:
+        """Batch counters, merged with the wrapped model's statistics if it has any"""
+        with self._stats_lock:
+            stats = {
+                "batches": self.batches,
+                "mean_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+            }
+        if hasattr(self.model, "stats"):
+            stats.update(self.model.stats())
+        return stats
+
 
 def set_embeddings():
     """
@@ -13,13 +122,34 @@ def set_embeddings():
         The embedding model instance
     """
     global _EMBEDDING_MODEL
-    if _EMBEDDING_MODEL is None:
-        _EMBEDDING_MODEL = FastEmbedEmbeddings(
-            model_name="BAAI/bge-base-en-v1.5",
-            cache_dir="./embedding_cache"  # Cache embeddings locally
-        )
+    with _EMBEDDING_LOCK:
+        if _EMBEDDING_MODEL is None:
+            _EMBEDDING_MODEL = _build_embedding_model()
     return _EMBEDDING_MODEL
 
+def _build_embedding_model() -> Embeddings:
+    """Create the FastEmbed model with the configured caching and batching layers"""
+    model = FastEmbedEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        cache_dir="./embedding_cache"  # Cache model weights locally
+    )
+    if EMBEDDING_CACHE:
+        # Cache computed vectors by text hash in memory and on disk
+        model = CachedEmbeddings(
+            model,
+            model_name=EMBEDDING_MODEL_NAME,
+            path=EMBEDDING_CACHE_PATH,
+            max_memory_entries=EMBEDDING_CACHE_SIZE,
+        )
+    if EMBEDDING_BATCHING:
+        # Coalesce concurrent requests from different sessions
+        model = BatchingEmbeddings(
+            model,
+            max_batch_size=EMBEDDING_BATCH_SIZE,
+            max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+        )
+    return model
+
 def get_embedding_model():
     """
     Get the existing embedding model or create a new one.
@@ -44,4 +174,4 @@ def embed_text(text: str) -> list:
     """
     model = get_embedding_model()
     result = model.embed_query(text)
-    return result
\ No newline at end of file
+    return result
\ No newline at end of file
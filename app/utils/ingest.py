@@ -0,0 +1,389 @@
+import gzip
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import VECTOR_BACKEND
+from app.utils.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+# Delimiters written by dataScraper.py around each page of the master file
+PAGE_SEPARATOR = "=" * 80
+URL_HEADER = re.compile(r"^=== URL: (.*) ===$")
+TITLE_HEADER = "=== Page Title ==="
+
+
+class Page(NamedTuple):
+    """One scraped page of the corpus"""
+    url: str
+    title: str
+    section: str
+    text: str
+
+
+def iter_windows(path: str, window_chars: int = 1 << 20) -> Iterator[str]:
+    """
+    Read a text file lazily in windows of roughly window_chars characters.
+
+    Windows end on line boundaries, so only a bounded amount of text is held
+    in memory (a single line longer than window_chars is still read whole).
+    """
+    buffer: List[str] = []
+    size = 0
+    with open_corpus(path) as f:
+        for line in f:
+            buffer.append(line)
+            size += len(line)
+            if size >= window_chars:
+                yield "".join(buffer)
+                buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def is_jsonl(path: str) -> bool:
+    """Whether a corpus file is in the JSONL page-record format (optionally gzipped)"""
+    return path.endswith((".jsonl", ".jsonl.gz"))
+
+def open_corpus(path: str, mode: str = "r"):
+    """Open a corpus file as text, transparently (de)compressing .gz files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Lazily read the page records of a JSONL corpus, one line at a time"""
+    with open_corpus(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_chunks(path: str, splitter, window_chars: int = 1 << 20) -> Iterator[Document]:
+    """
+    Lazily split a text file into chunk documents.
+
+    Args:
+        path: The corpus file
+        splitter: A LangChain text splitter
+        window_chars: Approximate amount of text split at a time
+
+    Yields:
+        One document per chunk, with the file as its source
+    """
+    if is_jsonl(path):
+        for record in iter_records(path):
+            for text in splitter.split_text(record["text"]):
+                yield Document(page_content=text, metadata={"source": path})
+        return
+    for window in iter_windows(path, window_chars):
+        for text in splitter.split_text(window):
+            yield Document(page_content=text, metadata={"source": path})
+
+def page_section(url: str) -> str:
+    """Site section of a page: the first path segment of its URL without extension"""
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    if not segments:
+        return "home"
+    section = os.path.splitext(segments[0])[0].lower()
+    return section if section and section != "index" else "home"
+
+def iter_pages(path: str) -> Iterator[Page]:
+    """
+    Lazily parse the scraper's output into pages.
+
+    JSONL corpora hold one page record per line. In the text format, pages
+    start at a "=== URL: ... ===" header, optionally followed by a
+    "=== Page Title ===" header whose next line is the title, and end at the
+    next separator line or URL header; text outside any page is skipped.
+    """
+    if is_jsonl(path):
+        for record in iter_records(path):
+            if record.get("text"):
+                yield Page(record["url"], record.get("title", ""), page_section(record["url"]), record["text"])
+        return
+
+    url, title, lines = None, "", []
+    expect_title = False
+
+    def page() -> Optional[Page]:
+        text = "\n".join(lines).strip()
+        return Page(url, title, page_section(url), text) if url and text else None
+
+    with open_corpus(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            header = URL_HEADER.match(line)
+            if header or line == PAGE_SEPARATOR:
+                finished = page()
+                if finished:
+                    yield finished
+                url, title, lines = (header.group(1).strip() if header else None), "", []
+                expect_title = False
+            elif line == TITLE_HEADER:
+                expect_title = True
+            elif expect_title and line.strip():
+                title, expect_title = line.strip(), False
+            elif url:
+                lines.append(line)
+    finished = page()
+    if finished:
+        yield finished
+
+def iter_page_chunks(path: str, splitter) -> Iterator[Document]:
+    """
+    Lazily split the scraper's master file into chunks that never cross pages.
+
+    Args:
+        path: The corpus file
+        splitter: A LangChain text splitter
+
+    Yields:
+        One document per chunk with url, title, section and source metadata
+    """
+    return chunk_pages(iter_pages(path), splitter)
+
+def chunk_pages(pages: Iterable[Page], splitter) -> Iterator[Document]:
+    """Split pages into chunk documents carrying the page's url, title and section"""
+    for page in pages:
+        for text in splitter.split_text(page.text):
+            yield Document(
+                page_content=text,
+                metadata={"source": page.url, "url": page.url, "title": page.title, "section": page.section},
+            )
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def with_retry(fn: Callable, *args, retries: int = 5, backoff: float = 0.5, **kwargs):
+    """
+    Call fn, retrying failures with exponential backoff and jitter.
+
+    Args:
+        fn: The function to call
+        retries: Attempts after the first before giving up
+        backoff: Delay before the first retry in seconds (doubled each time)
+
+    Returns:
+        The result of fn
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            logger.warning("%s failed (%s), retrying in %.2fs", getattr(fn, "__name__", "call"), e, delay)
+            time.sleep(delay)
+
+
+class PineconeSink:
+    """Writes precomputed vectors straight to a Pinecone index"""
+
+    def __init__(self, index, text_key: str = "text", namespace: Optional[str] = None):
+        self.index = index
+        self.text_key = text_key
+        self.namespace = namespace
+
+    def upsert(self, ids: List[str], texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> None:
+        self.index.upsert(
+            vectors=[
+                {"id": id_, "values": vector, "metadata": {**metadata, self.text_key: text}}
+                for id_, text, vector, metadata in zip(ids, texts, vectors, metadatas)
+            ],
+            namespace=self.namespace,
+        )
+
+    def delete(self, ids: List[str]) -> None:
+        for batch in batched(ids, 1000):
+            self.index.delete(ids=batch, namespace=self.namespace)
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class LocalSink:
+    """
+    Streams vectors into a LocalVectorStore and applies them in one go on close.
+
+    Each batch is appended to disk as it arrives (see LocalIndexWriter), so
+    memory use does not grow with the corpus, and the index files are
+    rewritten once per run rather than on every batch.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def upsert(self, ids: List[str], texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = self.store.writer()
+            writer = self._writer
+        writer.add(ids, texts, vectors, metadatas)
+
+    def delete(self, ids: List[str]) -> None:
+        self.store.delete(ids=ids)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                self._writer.commit()
+                self._writer.close()
+                self._writer = None
+
+    def abort(self) -> None:
+        """Discard the batches written since the last close"""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.abort()
+                self._writer = None
+
+
+class IngestionPipeline:
+    """
+    Streams chunks through batched embedding and concurrent, retried upserts.
+
+    Embedding runs on the calling thread while previous batches are upserted on
+    a bounded pool; at most max_in_flight batches wait for upload at any time,
+    so memory use does not grow with the size of the corpus. If any stage
+    fails, the sink is aborted so buffered writes are discarded, and the error
+    is raised.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        sink,
+        batch_size: int = 64,
+        max_workers: int = 4,
+        max_in_flight: Optional[int] = None,
+        retries: int = 5,
+        backoff: float = 0.5,
+        progress_every: int = 20,
+    ):
+        self.embedding_model = embedding_model
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight or max_workers * 2
+        self.retries = retries
+        self.backoff = backoff
+        self.progress_every = progress_every
+        self._timing_lock = threading.Lock()
+
+    def run(self, chunks: Iterable[Document], ids: Callable[[Document], str]) -> Dict[str, float]:
+        """
+        Embed and upsert a stream of chunks.
+
+        Args:
+            chunks: Chunk documents, produced lazily
+            ids: Function giving the id of a chunk
+
+        Returns:
+            Chunk count, per-stage busy seconds and chunks per second for the
+            chunk, embed and upsert stages, and the overall rate
+        """
+        stats = {"chunks": 0, "batches": 0, "chunk_seconds": 0.0, "embed_seconds": 0.0, "upsert_seconds": 0.0}
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        futures: List[Future] = []
+        started = time.perf_counter()
+
+        def upsert(batch_ids, texts, vectors, metadatas):
+            try:
+                start = time.perf_counter()
+                with_retry(self.sink.upsert, batch_ids, texts, vectors, metadatas,
+                           retries=self.retries, backoff=self.backoff)
+                with self._timing_lock:
+                    stats["upsert_seconds"] += time.perf_counter() - start
+            finally:
+                slots.release()
+
+        stream = iter(batched(chunks, self.batch_size))
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upsert") as pool:
+                while True:
+                    start = time.perf_counter()
+                    batch = next(stream, None)
+                    stats["chunk_seconds"] += time.perf_counter() - start
+                    if batch is None:
+                        break
+
+                    texts = [doc.page_content for doc in batch]
+                    start = time.perf_counter()
+                    vectors = with_retry(self.embedding_model.embed_documents, texts,
+                                         retries=self.retries, backoff=self.backoff)
+                    stats["embed_seconds"] += time.perf_counter() - start
+
+                    slots.acquire()
+                    futures.append(pool.submit(upsert, [ids(doc) for doc in batch], texts, vectors,
+                                               [doc.metadata for doc in batch]))
+                    # Surface upload failures early and drop finished futures
+                    for future in [f for f in futures if f.done()]:
+                        future.result()
+                        futures.remove(future)
+
+                    stats["chunks"] += len(batch)
+                    stats["batches"] += 1
+                    if stats["batches"] % self.progress_every == 0:
+                        elapsed = time.perf_counter() - started
+                        print(f"  {stats['chunks']} chunks ingested ({stats['chunks'] / elapsed:.1f} chunks/s)")
+
+                for future in futures:
+                    future.result()
+
+            # Sinks that buffer writes flush them here, so this counts as upsert time
+            start = time.perf_counter()
+            with_retry(self.sink.close, retries=self.retries, backoff=self.backoff)
+            stats["upsert_seconds"] += time.perf_counter() - start
+        except BaseException:
+            # Discard what the sink buffered, such as the local index writer's temporary files
+            self.sink.abort()
+            raise
+        stats["wall_seconds"] = time.perf_counter() - started
+        for stage in ("chunk", "embed", "upsert", "wall"):
+            seconds = stats[f"{stage}_seconds"]
+            stats[f"{stage}_chunks_per_second"] = stats["chunks"] / seconds if seconds else 0.0
+        return stats
+
+
+def get_vector_sink(embedding_model: Embeddings, index_name: str, backend: Optional[str] = None):
+    """
+    Get an upsert sink for the vector store selected by configuration.
+
+    Args:
+        embedding_model: The embedding model of the index
+        index_name: Pinecone index name (also the sub-directory of the local index)
+        backend: "pinecone" or "local" (defaults to VECTOR_BACKEND)
+
+    Returns:
+        A PineconeSink or LocalSink
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "pinecone":
+        from app.utils.clients import get_pinecone_index
+
+        return PineconeSink(get_pinecone_index(index_name))
+    return LocalSink(get_vector_store(embedding_model, index_name, backend=backend))
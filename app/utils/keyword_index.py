@@ -0,0 +1,314 @@
+import json
+import os
+import re
+import shutil
+import zipfile
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import LOCAL_INDEX_DIR
+from app.core.query_expansion import STOPWORDS
+from app.utils.vector_store import COPY_BYTES, metadata_matches
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    Postings are stored as flat NumPy arrays (document numbers and term
+    frequencies) sliced per term, so a query only touches the postings of
+    its own terms. The whole index round-trips through a single .npz file.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        term_offsets: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        records: List[dict],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_lengths = doc_lengths
+        self.records = records
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        doc_freqs = np.diff(term_offsets)
+        self.idf = np.log(1.0 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        # Per-document length normalization term of the BM25 denominator
+        self.length_norm = (k1 * (1 - b + b * doc_lengths / max(self.avg_length, 1e-9))).astype(np.float32)
+        self._filter_masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _filter_mask(self, filter: dict) -> np.ndarray:
+        """Boolean mask of the documents whose metadata matches a filter"""
+        key = json.dumps(filter, sort_keys=True)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((metadata_matches(record["metadata"], filter) for record in self.records),
+                               dtype=bool, count=len(self.records))
+            if len(self._filter_masks) >= 64:
+                self._filter_masks.pop(next(iter(self._filter_masks)))
+            self._filter_masks[key] = mask
+        return mask
+
+    @classmethod
+    def build(cls, texts: List[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> "BM25Index":
+        """
+        Build an index over a list of texts.
+
+        Args:
+            texts: Chunk texts to index
+            metadatas: Optional metadata for each text
+            ids: Optional ids for each text
+
+        Returns:
+            The BM25 index
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(i) for i in range(len(texts))]
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_no, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_no] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_no, tf))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        postings_docs = np.empty(term_offsets[-1], dtype=np.int32)
+        postings_tfs = np.empty(term_offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            docs, tfs = zip(*postings[term])
+            postings_docs[term_offsets[i]:term_offsets[i + 1]] = docs
+            postings_tfs[term_offsets[i]:term_offsets[i + 1]] = tfs
+
+        records = [{"id": id_, "text": text, "metadata": metadata} for id_, text, metadata in zip(ids, texts, metadatas)]
+        vocabulary = {term: i for i, term in enumerate(terms)}
+        return cls(vocabulary, term_offsets, postings_docs, postings_tfs, doc_lengths, records)
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], ids: Optional[List[str]] = None) -> "BM25Index":
+        return cls.build([doc.page_content for doc in documents], [doc.metadata for doc in documents], ids)
+
+    def search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        """
+        Return the k best matching documents for a keyword query.
+
+        Args:
+            query: The query text
+            k: Number of documents to return
+            filter: Optional Pinecone-style metadata filter
+
+        Returns:
+            List of (document, BM25 score) pairs, best first
+        """
+        n_docs = len(self.records)
+        if n_docs == 0:
+            return []
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end]
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs])
+        if filter:
+            scores[~self._filter_mask(filter)] = 0.0
+
+        k = min(k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n_docs else np.arange(n_docs)
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for doc_no in top:
+            if scores[doc_no] <= 0:
+                break
+            record = self.records[doc_no]
+            results.append((Document(page_content=record["text"], metadata=record["metadata"], id=record["id"]),
+                            float(scores[doc_no])))
+        return results
+
+    def save(self, path: str) -> None:
+        """Write the index to a compressed .npz file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            vocabulary=np.frombuffer("\n".join(vocabulary).encode("utf-8"), dtype=np.uint8),
+            term_offsets=self.term_offsets,
+            postings_docs=self.postings_docs,
+            postings_tfs=self.postings_tfs.astype(np.uint16),
+            doc_lengths=self.doc_lengths,
+            records=np.frombuffer(json.dumps(self.records, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+            params=np.array([self.k1, self.b], dtype=np.float32),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index written by save()"""
+        with np.load(path) as data:
+            terms = data["vocabulary"].tobytes().decode("utf-8")
+            vocabulary = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+            k1, b = (float(x) for x in data["params"])
+            return cls(
+                vocabulary,
+                data["term_offsets"],
+                data["postings_docs"],
+                data["postings_tfs"].astype(np.float32),
+                data["doc_lengths"],
+                json.loads(data["records"].tobytes().decode("utf-8")),
+                k1=k1,
+                b=b,
+            )
+
+
+class BM25IndexWriter:
+    """
+    Builds a BM25 index file from a stream of chunks without keeping their text.
+
+    add() tokenizes each chunk and appends its postings (term number, document
+    number and term frequency) to compact arrays, while its record of id, text
+    and metadata goes to a temporary file next to the index. save() sorts the
+    postings by term and writes the same .npz file as BM25Index.save(),
+    copying the records in from the temporary file.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._records_path = f"{path}.{uuid4().hex}.records"
+        self._records_file = open(self._records_path, "wb")
+        # The records are written as a JSON list, as BM25Index.save() stores them
+        self._records_file.write(b"[")
+        self._vocabulary: Dict[str, int] = {}
+        self._terms = array("i")
+        self._docs = array("i")
+        self._tfs = array("H")
+        self._doc_lengths = array("i")
+
+    def __enter__(self) -> "BM25IndexWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, id_: str, text: str, metadata: Optional[dict] = None) -> None:
+        """Index one chunk"""
+        doc_no = len(self._doc_lengths)
+        tokens = tokenize(text)
+        self._doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self._terms.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+            self._docs.append(doc_no)
+            self._tfs.append(min(tf, 0xFFFF))
+        record = {"id": id_, "text": text, "metadata": metadata or {}}
+        self._records_file.write((b"," if doc_no else b"") + json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def save(self) -> int:
+        """
+        Write the index file; the writer cannot be used afterwards.
+
+        Returns:
+            The number of chunks indexed
+        """
+        n_terms = len(self._vocabulary)
+        terms = np.frombuffer(self._terms, dtype=np.int32)
+        # A stable sort keeps each term's postings in document order
+        order = np.argsort(terms, kind="stable")
+        term_offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum(np.bincount(terms, minlength=n_terms))
+        arrays = {
+            "vocabulary": np.frombuffer("\n".join(self._vocabulary).encode("utf-8"), dtype=np.uint8),
+            "term_offsets": term_offsets,
+            "postings_docs": np.frombuffer(self._docs, dtype=np.int32)[order],
+            "postings_tfs": np.frombuffer(self._tfs, dtype=np.uint16)[order],
+            "doc_lengths": np.frombuffer(self._doc_lengths, dtype=np.int32),
+            "params": np.array([self.k1, self.b], dtype=np.float32),
+        }
+        del terms, order
+
+        self._records_file.write(b"]")
+        self._records_file.close()
+        tmp_path = self.path + ".tmp.npz"
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for name, value in arrays.items():
+                with archive.open(name + ".npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, value, allow_pickle=False)
+            del arrays
+            with archive.open("records.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array_header_1_0(f, {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+                    "fortran_order": False,
+                    "shape": (os.path.getsize(self._records_path),),
+                })
+                with open(self._records_path, "rb") as records:
+                    shutil.copyfileobj(records, f, COPY_BYTES)
+        os.replace(tmp_path, self.path)
+        return len(self)
+
+    def close(self) -> None:
+        """Remove the temporary records file"""
+        self._records_file.close()
+        if os.path.exists(self._records_path):
+            os.remove(self._records_path)
+
+
+def keyword_index_path(index_name: str) -> str:
+    """Location of the BM25 index written at ingest time for a vector index"""
+    return os.path.join(LOCAL_INDEX_DIR, index_name, "bm25.npz")
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int = 60) -> List[Tuple[Document, float]]:
+    """
+    Fuse several rankings with reciprocal-rank fusion.
+
+    Args:
+        ranked_lists: Document rankings, best first
+        k: RRF damping constant
+
+    Returns:
+        Unique documents ordered by fused score, with the score
+    """
+    fused: Dict[str, Tuple[Document, float]] = {}
+    for ranking in ranked_lists:
+        for rank, doc in enumerate(ranking):
+            previous = fused.get(doc.page_content)
+            score = 1.0 / (k + rank + 1)
+            fused[doc.page_content] = (previous[0] if previous else doc, (previous[1] if previous else 0.0) + score)
+    return sorted(fused.values(), key=lambda pair: pair[1], reverse=True)
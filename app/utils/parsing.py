@@ -0,0 +1,194 @@
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (text, metadata) of one PDF page, CSV row, or whole text/Word file. Plain
+# tuples keep worker processes free of heavier imports such as LangChain.
+Page = Tuple[str, Dict[str, Any]]
+
+
+class ParsedPart(NamedTuple):
+    """Pages parsed from one upload, or from a range of pages of a large PDF"""
+    file: int  # Position of the upload in the batch
+    first_page: int
+    parts: int  # Number of parts the file was split into
+    pages: List[Page]
+    error: Optional[str]
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+def _parse_pdf(name: str, data: bytes, first: int = 0, last: Optional[int] = None) -> List[Page]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    last = len(reader.pages) if last is None else min(last, len(reader.pages))
+    return [
+        (reader.pages[number].extract_text() or "", {"source": name, "page": number})
+        for number in range(first, last)
+    ]
+
+def _parse_docx(name: str, data: bytes, first: int = 0, last: Optional[int] = None) -> List[Page]:
+    import docx2txt
+
+    return [(docx2txt.process(io.BytesIO(data)), {"source": name})]
+
+def _parse_csv(name: str, data: bytes, first: int = 0, last: Optional[int] = None) -> List[Page]:
+    # One page per row, formatted as "column: value" lines like LangChain's CSVLoader
+    rows = csv.DictReader(io.StringIO(_decode(data)))
+    return [
+        ("\n".join(f"{(key or '').strip()}: {(value or '').strip()}" for key, value in row.items()),
+         {"source": name, "row": number})
+        for number, row in enumerate(rows)
+    ]
+
+def _parse_text(name: str, data: bytes, first: int = 0, last: Optional[int] = None) -> List[Page]:
+    return [(_decode(data), {"source": name})]
+
+PARSERS: Dict[str, Callable[..., List[Page]]] = {
+    ".pdf": _parse_pdf,
+    ".txt": _parse_text,
+    ".csv": _parse_csv,
+    ".docx": _parse_docx,
+    ".doc": _parse_docx,
+}
+
+def parse_pages(name: str, data: bytes, first: int = 0, last: Optional[int] = None) -> List[Page]:
+    """
+    Extract the text of an uploaded file from its contents in memory.
+
+    Args:
+        name: The file name, whose extension selects the parser
+        data: The file contents
+        first: First PDF page to extract (other formats are read whole)
+        last: PDF page to stop before, or None for the last page
+
+    Returns:
+        (text, metadata) per PDF page, CSV row, or whole text/Word file
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in PARSERS:
+        raise ValueError(f"Unsupported file type: {extension}")
+    return PARSERS[extension](name, data, first, last)
+
+def count_pdf_pages(data: bytes) -> int:
+    """Number of pages of a PDF (reads the page tree only, not the page contents)"""
+    from pypdf import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+def _parse_part(file: int, name: str, data: bytes, first: int, last: Optional[int], parts: int) -> ParsedPart:
+    # Runs in a worker process; errors are returned as text so any exception type crosses back
+    try:
+        return ParsedPart(file, first, parts, parse_pages(name, data, first, last), None)
+    except Exception as e:
+        return ParsedPart(file, first, parts, [], str(e) or type(e).__name__)
+
+
+class ParsePool:
+    """
+    Parses batches of uploads on a pool of worker processes.
+
+    Text extraction (pypdf especially) is CPU-bound, so files, and ranges of
+    pages_per_part pages of large PDFs, are spread across processes. Parts
+    are yielded as they finish; closing the iterator early (for example once
+    enough text has been read) cancels the parts not yet started. A file that
+    fails to parse only fails its own parts. If a worker process dies, the
+    parts still in flight are reported as failed and the next batch starts a
+    fresh pool. With one worker, or a single part to parse, everything runs
+    in the calling process.
+    """
+
+    def __init__(self, workers: Optional[int] = None, pages_per_part: int = 8):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_part = pages_per_part
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked workers: the app process runs many threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a pool whose worker died, so the next batch starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def plan(self, uploads: Sequence[Tuple[str, bytes]]) -> Tuple[List[tuple], List[ParsedPart]]:
+        """Split a batch into parse tasks, and failed parts for PDFs that cannot even be opened"""
+        tasks, failures = [], []
+        for file, (name, data) in enumerate(uploads):
+            if os.path.splitext(name)[1].lower() != ".pdf":
+                tasks.append((file, name, data, 0, None, 1))
+                continue
+            try:
+                pages = count_pdf_pages(data)
+            except Exception as e:
+                failures.append(ParsedPart(file, 0, 1, [], str(e) or type(e).__name__))
+                continue
+            # At most one part per worker for each file, since every part carries the whole PDF
+            size = max(self.pages_per_part, -(-pages // self.workers))
+            starts = range(0, max(pages, 1), size)
+            for first in starts:
+                tasks.append((file, name, data, first, first + size, len(starts)))
+        return tasks, failures
+
+    def parts(self, uploads: Sequence[Tuple[str, bytes]]) -> Iterator[ParsedPart]:
+        """
+        Parse a batch of uploads, yielding parts in the order they finish.
+
+        Args:
+            uploads: (file name, file contents) of each upload
+
+        Yields:
+            ParsedPart for every file, or page range of a PDF
+        """
+        tasks, failures = self.plan(uploads)
+        yield from failures
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield _parse_part(*task)
+            return
+
+        executor = self._pool()
+        futures: Dict[Future, tuple] = {executor.submit(_parse_part, *task): task for task in tasks}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except BrokenProcessPool as e:
+                    file, name, _, first, _, parts = futures[future]
+                    logger.warning("Parser process died on %s (from page %d): %s", name, first, e)
+                    self._reset(executor)
+                    yield ParsedPart(file, first, parts, [], "the parser crashed on this file")
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
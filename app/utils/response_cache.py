@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from app.core.streaming import ErrorMessage
+from app.utils.search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest of a file's contents"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of complete answers, shared by every app process.
+
+    Answers are keyed by the route that produced them, the normalized query
+    and the content hashes of any uploaded files, so re-uploading the same
+    file or rephrasing only the case and spacing of a question still hits.
+    Each route has its own TTL (web answers go stale sooner than tutoring
+    ones). When the cache holds more than max_entries answers, the least
+    recently used are evicted. SQLite in WAL mode lets several Streamlit
+    processes share one file; hit and miss counters are stored alongside,
+    so stats() covers all of them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 3600,
+        max_entries: int = 2000,
+    ):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Other processes may hold the write lock briefly, so wait for it rather than fail
+        self._db = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, route TEXT NOT NULL, "
+            "answer TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def ttl(self, route: str) -> float:
+        """Seconds an answer from a route is served"""
+        return self.ttls.get(route, self.default_ttl)
+
+    def key(self, route: str, query: str, file_hashes: Sequence[str] = (), version: Optional[str] = None) -> str:
+        """
+        Cache key of a question.
+
+        Args:
+            route: The agent route answering it ("university", "files", ...)
+            query: The user's question
+            file_hashes: Content hashes of the uploaded files, in any order
+            version: Version of the data behind the route, such as the index version
+
+        Returns:
+            A SHA-256 hex digest
+        """
+        payload = json.dumps([route, normalize_query(query), sorted(file_hashes), version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, *names: str) -> None:
+        for name in names:
+            self._db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+                (name,),
+            )
+
+    def get(self, key: str, route: str) -> Optional[str]:
+        """Return the cached answer for a key, or None if there is none or it expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl(route))
+            ).fetchone()
+            if row is None:
+                self._count("misses", f"misses:{route}")
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count("hits", f"hits:{route}")
+        return row[0]
+
+    def put(self, key: str, route: str, answer: str) -> None:
+        """Store an answer, evicting expired and then least recently used answers as needed"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, route, answer, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, route, answer, now, now),
+            )
+            for expired_route in {route, *self.ttls}:
+                self._db.execute(
+                    "DELETE FROM responses WHERE route = ? AND created < ?",
+                    (expired_route, now - self.ttl(expired_route)),
+                )
+            excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._db.execute(
+                    "INSERT INTO counters (name, value) VALUES ('evictions', ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (excess,),
+                )
+
+    def cache_stream(self, key: str, route: str, chunks: Iterable[Any]) -> Iterator[Any]:
+        """
+        Pass an answer stream through, caching the answer once it is complete.
+
+        Only text chunks make up the cached answer; other items (such as
+        progress steps) are passed through as they are. Answers are not
+        cached when the stream is closed early (for example when the request
+        is cancelled), raises, or contains an ErrorMessage.
+        """
+        parts = []
+        failed = False
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                failed = failed or isinstance(chunk, ErrorMessage)
+                parts.append(chunk)
+            yield chunk
+        if failed:
+            logger.info("Not caching a %s answer that reported an error", route)
+        else:
+            self.put(key, route, "".join(parts))
+
+    def clear(self) -> None:
+        """Remove every cached answer and reset the counters"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM counters")
+
+    def stats(self) -> Dict[str, float]:
+        """Size, hit and miss counters (overall and per route) and hit rate, across all processes"""
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(answer)), 0) FROM responses").fetchone()
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        stats = {
+            "entries": entries,
+            "chars": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": counters.get("evictions", 0),
+        }
+        for name, value in sorted(counters.items()):
+            if ":" in name:
+                stats[name] = value
+        return stats
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query, collapse its whitespace and drop trailing punctuation"""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+class SearchCache:
+    """
+    Persistent cache of web search results with stale-while-revalidate.
+
+    Results are stored as JSON in SQLite, keyed by the normalized query and
+    the search parameters. A result younger than ttl_seconds is served as is.
+    Up to stale_seconds after that it is still served, but a background
+    refresh replaces it; older results are searched again on the calling
+    thread. Failed searches are never cached, and a failed refresh keeps the
+    stale result.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = 3600,
+        stale_seconds: float = 86400,
+        max_workers: int = 2,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._refresh_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-refresh")
+        self._refreshing: Set[str] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def key(self, query: str, params: Dict[str, Any]) -> str:
+        """Cache key of a query and its search parameters"""
+        payload = json.dumps([normalize_query(query), params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT result, created FROM results WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _put(self, key: str, result: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, result, created) VALUES (?, ?, ?)",
+                (key, json.dumps(result), now),
+            )
+            # Results too old to be served even as stale are dead weight
+            self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds - self.stale_seconds,))
+
+    def _refresh(self, key: str, search: Callable[[], Any]) -> None:
+        try:
+            self._put(key, search())
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            logger.warning("Background search refresh failed, keeping the stale result: %s", e)
+            with self._lock:
+                self.refresh_failures += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_search(self, query: str, params: Dict[str, Any], search: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for a query, searching only when needed.
+
+        Args:
+            query: The search query
+            params: Search parameters that change the result (part of the key)
+            search: Zero-argument callable running the search; its result must
+                be JSON-serializable
+
+        Returns:
+            The cached or freshly searched result
+        """
+        key = self.key(query, params)
+        cached = self._get(key)
+        if cached is not None:
+            result, created = cached
+            age = time.time() - created
+            if age <= self.ttl_seconds:
+                with self._lock:
+                    self.hits += 1
+                return result
+            if age <= self.ttl_seconds + self.stale_seconds:
+                with self._lock:
+                    self.stale_hits += 1
+                    # One refresh per key at a time, however many requests see it stale
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    self._refresh_pool.submit(self._refresh, key, search)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        result = search()
+        self._put(key, result)
+        return result
+
+    def clear(self) -> None:
+        """Remove every cached result"""
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, stale-hit and miss counters and current size"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+            }
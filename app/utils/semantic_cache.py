@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query meaning rather than exact text.
+
+    Query embeddings live in a preallocated float32 matrix, one row per slot,
+    so a lookup is a single matrix-vector product. Entries expire after a TTL,
+    the least recently used entry is evicted when the cache is full, and the
+    whole cache is dropped when the version reported by version_fn changes
+    (for example after the corpus is re-indexed).
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl_seconds: float = 86400,
+        version_fn: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn or (lambda: None)
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # Creation time of each slot, so expired entries can be masked out in one step
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._free = list(range(max_entries - 1, -1, -1))
+        # slot -> (query, answer); insertion order doubles as LRU order
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._version = self.version_fn()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        """Normalized query embedding used for lookups"""
+        vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _release(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._valid[slot] = False
+        self._free.append(slot)
+
+    def _expire(self) -> None:
+        """Release the entries older than the TTL"""
+        expired = self._valid & (self._created < time.time() - self.ttl_seconds)
+        for slot in np.flatnonzero(expired):
+            self._release(int(slot))
+
+    def _check_version(self) -> None:
+        """Drop every entry if the underlying index changed since they were stored"""
+        version = self.version_fn()
+        if version != self._version:
+            logger.info("Index version changed (%s -> %s), clearing %d cached answers",
+                        self._version, version, len(self._entries))
+            self._version = version
+            for slot in list(self._entries):
+                self._release(slot)
+            self.invalidations += 1
+
+    def lookup(self, query: str, vector: Optional[np.ndarray] = None) -> Optional[Tuple[str, float]]:
+        """
+        Find a cached answer for a semantically equivalent query.
+
+        Args:
+            query: The user's question
+            vector: The normalized query embedding, if already computed
+
+        Returns:
+            The cached answer and its similarity, or None on a miss
+        """
+        vector = self.embed(query) if vector is None else vector
+        with self._lock:
+            self._check_version()
+            # Expired entries are dropped first so they cannot shadow a live match
+            self._expire()
+            if self._matrix is None or not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ vector
+            similarities[~self._valid] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            _, answer = self._entries[slot]
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return answer, similarity
+
+    def store(self, query: str, answer: str, vector: Optional[np.ndarray] = None) -> None:
+        """
+        Cache an answer for a query, evicting the least recently used entry if full.
+
+        Args:
+            query: The user's question
+            answer: The generated answer
+            vector: The normalized query embedding, if already computed
+        """
+        vector = self.embed(query) if vector is None else vector
+        with self._lock:
+            self._check_version()
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._release(oldest)
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._created[slot] = time.time()
+            self._entries[slot] = (query, answer)
+
+    def clear(self) -> None:
+        """Remove every cached answer"""
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,477 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.core.config import LOCAL_INDEX_DIR, VECTOR_BACKEND
+
+VECTORS_FILE = "vectors.npy"
+OFFSETS_FILE = "offsets.npy"
+RECORDS_FILE = "records.bin"
+VERSION_FILE = "index_version"
+SECTIONS_FILE = "sections.json"
+
+# Bytes of vectors copied at a time when an index is rewritten
+COPY_BYTES = 8 << 20
+
+
+def metadata_matches(metadata: dict, filter: Optional[dict]) -> bool:
+    """
+    Check metadata against a Pinecone-style filter.
+
+    Supports plain equality, $eq, $ne, $in and $nin per field, and $and / $or
+    lists of sub-filters.
+    """
+    if not filter:
+        return True
+    for field, condition in filter.items():
+        if field == "$and":
+            if not all(metadata_matches(metadata, sub) for sub in condition):
+                return False
+        elif field == "$or":
+            if not any(metadata_matches(metadata, sub) for sub in condition):
+                return False
+        else:
+            value = metadata.get(field)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store backed by a contiguous float32 matrix.
+
+    Vectors are stored L2-normalized so cosine similarity is a single
+    matrix-vector product. On disk the index is three files:
+
+    - vectors.npy: the (n, dim) float32 matrix, memory-mapped on load
+    - offsets.npy: int64 byte offsets of each record in records.bin
+    - records.bin: concatenated UTF-8 JSON records holding id, text and metadata
+
+    Opening an index only maps the arrays; records are decoded lazily for the
+    documents a search actually returns. Changes go through a LocalIndexWriter,
+    which streams them to disk, so writing never holds the matrix in memory.
+    Searches and commits hold the store's lock, so a search never reads an
+    index that is being swapped out.
+    """
+
+    def __init__(self, embedding: Embeddings, path: Optional[str] = None):
+        self.embedding = embedding
+        self.path = path or LOCAL_INDEX_DIR
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._records = b""
+        self._records_file = None
+        # Row masks of recent metadata filters, dropped whenever the index is re-mapped
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self._vectors.shape[0]
+
+    def _load(self) -> None:
+        """Memory-map an existing index from disk, if there is one"""
+        self._filter_masks = {}
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            return
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+        self._offsets = np.load(os.path.join(self.path, OFFSETS_FILE), mmap_mode="r")
+        self._records_file = open(os.path.join(self.path, RECORDS_FILE), "rb")
+        if os.fstat(self._records_file.fileno()).st_size:
+            self._records = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._records = b""
+
+    def _unload(self) -> None:
+        """Release the memory maps so the files can be replaced"""
+        self._vectors = np.zeros((0, self._vectors.shape[-1]), dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._records = b""
+        if self._records_file is not None:
+            self._records_file.close()
+            self._records_file = None
+
+    def _record(self, row: int) -> dict:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._records[start:end].decode("utf-8"))
+
+    def _filter_mask(self, filter: dict) -> np.ndarray:
+        """Boolean mask of the rows whose metadata matches a filter"""
+        key = json.dumps(filter, sort_keys=True)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (metadata_matches(self._record(row)["metadata"], filter) for row in range(len(self))),
+                dtype=bool, count=len(self),
+            )
+            if len(self._filter_masks) >= 64:
+                self._filter_masks.pop(next(iter(self._filter_masks)))
+            self._filter_masks[key] = mask
+        return mask
+
+    def writer(self) -> "LocalIndexWriter":
+        """Start a batch of changes that is applied to the index in one rewrite"""
+        return LocalIndexWriter(self)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed texts and add them to the index, replacing entries with the same id.
+
+        Args:
+            texts: Texts to add
+            metadatas: Optional metadata for each text
+            ids: Optional ids for each text (generated when missing)
+
+        Returns:
+            The ids of the added texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Add texts with precomputed embeddings, replacing entries with the same id.
+
+        Args:
+            texts: Texts to add
+            embeddings: One embedding per text
+            metadatas: Optional metadata for each text
+            ids: Optional ids for each text (generated when missing)
+
+        Returns:
+            The ids of the added texts
+        """
+        if not texts:
+            return []
+        if ids is None:
+            ids = [str(uuid4()) for _ in texts]
+        with self.writer() as writer:
+            writer.add(ids, texts, embeddings, metadatas)
+            writer.commit()
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete entries by id"""
+        if not ids:
+            return False
+        with self.writer() as writer:
+            writer.delete(ids)
+            return writer.commit() > 0
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], *, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return the k most similar documents to an embedding with their cosine similarity.
+
+        Args:
+            embedding: Query embedding
+            k: Number of documents to return
+            filter: Optional Pinecone-style metadata filter
+
+        Returns:
+            List of (document, cosine similarity) pairs, best first
+        """
+        query = self._normalize(embedding)
+        # A commit re-maps the index files, so the arrays are only read under the lock
+        with self._lock:
+            n = len(self)
+            if n == 0:
+                return []
+            if filter:
+                # Only the rows matching the filter are scored
+                rows = np.flatnonzero(self._filter_mask(filter))
+                scores = np.asarray(self._vectors[rows]) @ query
+            else:
+                rows = np.arange(n)
+                scores = self._vectors @ query
+
+            n = len(scores)
+            if n == 0:
+                return []
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.argsort(-scores[top])]
+            records = [self._record(int(rows[i])) for i in top]
+
+        return [
+            (Document(page_content=record["text"], metadata=record["metadata"], id=record["id"]), float(scores[i]))
+            for record, i in zip(records, top)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Same mapping as PineconeVectorStore so score_threshold values carry over
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+class LocalIndexWriter:
+    """
+    Streams additions and deletions to a LocalVectorStore through temporary files.
+
+    add() appends normalized vectors and encoded records to files next to the
+    index as they arrive, so a batch may be far larger than memory; only the
+    ids and record lengths are kept. commit() writes new index files, copying
+    the existing rows that were neither replaced nor deleted chunk by chunk,
+    swaps them in atomically and re-maps the store. Entries added with an id
+    already in the index replace it.
+    """
+
+    def __init__(self, store: LocalVectorStore):
+        self.store = store
+        os.makedirs(store.path, exist_ok=True)
+        self._lock = threading.Lock()
+        suffix = f".{uuid4().hex}.append"
+        self._vectors_path = os.path.join(store.path, VECTORS_FILE + suffix)
+        self._records_path = os.path.join(store.path, RECORDS_FILE + suffix)
+        self._vectors_file = open(self._vectors_path, "wb")
+        self._records_file = open(self._records_path, "wb")
+        self._lengths = array("q")
+        self._ids: Set[str] = set()
+        self._deleted: Set[str] = set()
+        with store._lock:
+            self._dim = store._vectors.shape[-1] if len(store) else 0
+
+    def __enter__(self) -> "LocalIndexWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+    ) -> None:
+        """Append entries with precomputed embeddings"""
+        if not texts:
+            return
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = LocalVectorStore._normalize(embeddings)
+        encoded = [
+            json.dumps({"id": id_, "text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+            for id_, text, metadata in zip(ids, texts, metadatas)
+        ]
+        with self._lock:
+            if self._dim and vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self._dim})")
+            self._dim = vectors.shape[1]
+            self._vectors_file.write(vectors.tobytes())
+            self._records_file.write(b"".join(encoded))
+            self._lengths.extend(len(blob) for blob in encoded)
+            self._ids.update(ids)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove entries from the index on commit"""
+        with self._lock:
+            self._deleted.update(ids)
+
+    def commit(self) -> int:
+        """
+        Apply the changes to the index.
+
+        Returns:
+            The number of rows added, replaced or deleted
+        """
+        store = self.store
+        with self._lock, store._lock:
+            self._vectors_file.flush()
+            self._records_file.flush()
+            dropped = self._ids | self._deleted
+            keep = np.fromiter(
+                (row for row in range(len(store)) if store._record(row)["id"] not in dropped), dtype=np.int64
+            )
+            added = len(self._lengths)
+            changes = added + len(store) - len(keep)
+            if not changes:
+                return 0
+
+            total = len(keep) + added
+            rows_per_copy = max(1, COPY_BYTES // max(self._dim * 4, 1))
+            tmp = {name: os.path.join(store.path, name + ".tmp") for name in (VECTORS_FILE, OFFSETS_FILE, RECORDS_FILE)}
+
+            with open(tmp[VECTORS_FILE], "wb") as f:
+                np.lib.format.write_array_header_1_0(f, {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                    "fortran_order": False,
+                    "shape": (total, self._dim),
+                })
+                for start in range(0, len(keep), rows_per_copy):
+                    f.write(np.ascontiguousarray(store._vectors[keep[start:start + rows_per_copy]]).tobytes())
+                with open(self._vectors_path, "rb") as new_vectors:
+                    shutil.copyfileobj(new_vectors, f, COPY_BYTES)
+
+            offsets = np.zeros(total + 1, dtype=np.int64)
+            with open(tmp[RECORDS_FILE], "wb") as f:
+                for i, row in enumerate(keep):
+                    start, end = int(store._offsets[row]), int(store._offsets[row + 1])
+                    f.write(store._records[start:end])
+                    offsets[i + 1] = offsets[i] + end - start
+                if added:
+                    offsets[len(keep) + 1:] = offsets[len(keep)] + np.cumsum(np.frombuffer(self._lengths, dtype=np.int64))
+                with open(self._records_path, "rb") as new_records:
+                    shutil.copyfileobj(new_records, f, COPY_BYTES)
+            with open(tmp[OFFSETS_FILE], "wb") as f:
+                np.save(f, offsets)
+
+            store._unload()
+            for name, tmp_path in tmp.items():
+                os.replace(tmp_path, os.path.join(store.path, name))
+            store._load()
+        self._reset()
+        return changes
+
+    def _reset(self) -> None:
+        for f in (self._vectors_file, self._records_file):
+            f.seek(0)
+            f.truncate()
+        self._lengths = array("q")
+        self._ids, self._deleted = set(), set()
+
+    def abort(self) -> None:
+        """Discard uncommitted changes and remove the temporary files"""
+        for f, path in ((self._vectors_file, self._vectors_path), (self._records_file, self._records_path)):
+            f.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self) -> None:
+        """Remove the temporary files; changes that were not committed are discarded"""
+        self.abort()
+
+
+def get_vector_store(embedding_model: Embeddings, index_name: str, backend: Optional[str] = None) -> VectorStore:
+    """
+    Get the vector store selected by configuration.
+
+    Args:
+        embedding_model: The embedding model for vector search
+        index_name: Pinecone index name (also the sub-directory of the local index)
+        backend: "pinecone" or "local" (defaults to VECTOR_BACKEND)
+
+    Returns:
+        The vector store instance
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "local":
+        return LocalVectorStore(embedding_model, path=os.path.join(LOCAL_INDEX_DIR, index_name))
+    if backend == "pinecone":
+        from langchain_pinecone import PineconeVectorStore
+        from app.utils.clients import get_pinecone_index
+
+        return PineconeVectorStore(index=get_pinecone_index(index_name), embedding=embedding_model)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+def mark_index_updated(index_name: str) -> str:
+    """
+    Record that an index was (re)built so caches built on top of it can invalidate.
+
+    Args:
+        index_name: Name of the index that was written
+
+    Returns:
+        The new version string
+    """
+    version = str(time.time_ns())
+    path = os.path.join(LOCAL_INDEX_DIR, index_name, VERSION_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(version)
+    return version
+
+def write_sections(index_name: str, sections: Dict[str, int]) -> None:
+    """Record the page sections of an index and their chunk counts"""
+    path = os.path.join(LOCAL_INDEX_DIR, index_name, SECTIONS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sections, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def read_sections(index_name: str) -> Dict[str, int]:
+    """Get the sections written by write_sections, or an empty dict if there are none"""
+    try:
+        with open(os.path.join(LOCAL_INDEX_DIR, index_name, SECTIONS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def read_index_version(index_name: str) -> Optional[str]:
+    """Get the version written by mark_index_updated, or None if there is none"""
+    try:
+        with open(os.path.join(LOCAL_INDEX_DIR, index_name, VERSION_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
@@ -0,0 +1,73 @@
+"""
+Benchmark per-request setup cost of the university agent against stub backends.
+
+Compares rebuilding the Pinecone client, vector store, LLM client and chains on
+every question (the previous behaviour) with reusing the process-wide agent.
+
+Usage:
+    python -m benchmarks.bench_agent_setup --requests 50 --connect-ms 20
+"""
+import argparse
+import statistics
+import time
+
+import pinecone
+
+import app.agents.uni_agent as uni_agent_module
+import app.utils.clients as clients
+from benchmarks.stubs import StubEmbeddings, StubVectorStore, stub_llm
+
+
+def install_stubs(connect_ms: float) -> None:
+    """Replace network backends with local stand-ins that simulate connection setup"""
+    class StubPinecone:
+        def __init__(self, api_key=None, **kwargs):
+            time.sleep(connect_ms / 1000)  # TLS handshake and control-plane lookup
+
+        def Index(self, name):
+            time.sleep(connect_ms / 1000)  # Index host resolution
+            return object()
+
+    def stub_chat_groq(model_name, http_client=None, **kwargs):
+        time.sleep(connect_ms / 1000)  # Fresh HTTP connection pool
+        return stub_llm("Variant one\nVariant two", "Stub answer")
+
+    def stub_get_vector_store(embedding_model, index_name, backend=None):
+        return StubVectorStore(clients.get_pinecone_index(index_name), embedding_model)
+
+    pinecone.Pinecone = StubPinecone
+    clients.ChatGroq = stub_chat_groq
+    uni_agent_module.get_vector_store = stub_get_vector_store
+
+
+def run(requests: int, connect_ms: float) -> None:
+    install_stubs(connect_ms)
+    embeddings = StubEmbeddings()
+    query = "What are the admission requirements?"
+
+    cold, warm = [], []
+    for _ in range(requests):
+        clients.clear_registry()
+        start = time.perf_counter()
+        uni_agent_module.get_uni_agent(embeddings).invoke(query)
+        cold.append((time.perf_counter() - start) * 1000)
+
+    clients.clear_registry()
+    uni_agent_module.get_uni_agent(embeddings)
+    for _ in range(requests):
+        start = time.perf_counter()
+        uni_agent_module.get_uni_agent(embeddings).invoke(query)
+        warm.append((time.perf_counter() - start) * 1000)
+
+    print(f"Requests: {requests}, simulated connect latency: {connect_ms} ms")
+    print(f"Rebuild per request: mean {statistics.mean(cold):.2f} ms, median {statistics.median(cold):.2f} ms")
+    print(f"Shared agent:        mean {statistics.mean(warm):.2f} ms, median {statistics.median(warm):.2f} ms")
+    print(f"Setup time saved per request: {statistics.mean(cold) - statistics.mean(warm):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--connect-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    run(args.requests, args.connect_ms)
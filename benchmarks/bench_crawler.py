@@ -0,0 +1,59 @@
+"""
+Benchmark for the concurrent crawler used by dataScraper.py.
+
+A local HTTP server serves a fixture site with a simulated response time, and
+the scraper crawls it once with a single worker and once with several, under
+the same per-host rate limit. A recrawl with a few pages changed then shows
+the effect of conditional requests. The run reports pages per second for each.
+
+Usage:
+    python -m benchmarks.bench_crawler --pages 120 --latency-ms 150 --concurrency 8 --rate 20
+"""
+import argparse
+import tempfile
+
+from dataScraper import scrape_aup_website
+from benchmarks.stubs import FixtureSite
+
+
+def run(pages: int, latency_ms: float, concurrency: int, rate: float, changed: int) -> None:
+    with FixtureSite(pages=pages, latency_ms=latency_ms) as site:
+        results = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            for workers in sorted({1, concurrency}):
+                results[f"{workers} workers"] = scrape_aup_website(
+                    base_url=site.url(),
+                    allowed_domains=[site.host],
+                    output_dir=output_dir,
+                    max_pages=pages,
+                    concurrency=workers,
+                    rate=rate,
+                    full=True,
+                )
+
+            site.update(*range(1, changed + 1))
+            results[f"recrawl, {changed} changed"] = scrape_aup_website(
+                base_url=site.url(),
+                allowed_domains=[site.host],
+                output_dir=output_dir,
+                max_pages=pages,
+                concurrency=concurrency,
+                rate=rate,
+            )
+
+    print()
+    for label, stats in results.items():
+        print(f"{label:>20}: {stats.pages} pages ({stats.changed} new or changed) in {stats.seconds:.2f}s, "
+              f"{stats.pages_per_second:.1f} pages/s, {stats.rate_limit_wait:.2f}s waiting on the rate limit")
+    print(f"{'':>20}  server answered {site.not_modified} of {site.requests} requests with 304")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--changed", type=int, default=5, help="pages modified before the recrawl")
+    args = parser.parse_args()
+    run(args.pages, args.latency_ms, args.concurrency, args.rate, args.changed)
@@ -0,0 +1,90 @@
+"""
+Benchmark for answering questions about long uploaded documents.
+
+A generated text file has the answer to a question buried late in it. The
+old approach (every chunk joined, cut at 32,000 characters) is compared with
+top-k retrieval over the file's chunks: prompt size and whether the answer
+is sent at all. A summary request then runs the map-reduce path with a stub
+LLM, one section at a time and in parallel.
+
+Usage:
+    python -m benchmarks.bench_document_qa --chapters 120 --llm-ms 300
+"""
+import argparse
+import random
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from app.core.compression import estimate_tokens
+from app.core.document_qa import DocumentIndex, format_chunks, map_reduce_context
+from app.utils.documents import DocumentCache
+from benchmarks.stubs import StubEmbeddings
+
+FILLER = ["lecture", "theorem", "proof", "example", "exercise", "definition", "lemma", "course", "chapter",
+          "notes", "reading", "assignment", "seminar", "figure", "table", "method", "result"]
+QUESTION = "When is the final project on graph colouring due?"
+ANSWER = "The final project on graph colouring is due on 12 December."
+LEGACY_MAX_CHARS = 32000
+
+
+def make_book(chapters: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    parts = []
+    for chapter in range(chapters):
+        sentences = [" ".join(rng.choices(FILLER, k=rng.randint(8, 16))).capitalize() + "." for _ in range(20)]
+        if chapter == chapters * 3 // 4:
+            sentences.insert(10, ANSWER)
+        parts.append(f"Chapter {chapter + 1}\n\n" + " ".join(sentences))
+    return "\n\n".join(parts).encode("utf-8")
+
+
+def run(chapters: int, budget: int, top_k: int, llm_ms: float, concurrency: int) -> None:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100, length_function=len)
+    cache = DocumentCache(splitter)
+    document, _ = cache.load("course.txt", make_book(chapters))
+    print(f"{len(document.chunks)} chunks, ~{sum(estimate_tokens(c.page_content) for c in document.chunks)} tokens\n")
+
+    legacy = "\n\n".join(chunk.page_content for chunk in document.chunks)[:LEGACY_MAX_CHARS]
+    print(f"{'truncated to 32K chars':>24}: ~{estimate_tokens(legacy):6d} prompt tokens, answer sent: {ANSWER in legacy}")
+
+    embeddings = StubEmbeddings(dim=768)
+    for label in ("top-k (first question)", "top-k (follow-up)"):
+        start = time.perf_counter()
+        index = DocumentIndex.from_documents([document], cache, embeddings)
+        context = format_chunks(index.search(QUESTION, token_budget=budget, k=top_k))
+        print(f"{label:>24}: ~{estimate_tokens(context):6d} prompt tokens, answer sent: {ANSWER in context} "
+              f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    print()
+
+    def summarize(prompt) -> str:
+        # FakeListChatModel batches sequentially; ChatGroq, like this stub, runs batch calls in parallel
+        time.sleep(llm_ms / 1000)
+        return "Summary of this section."
+
+    chain = (
+        ChatPromptTemplate.from_template("{document_content}\n\n{question}")
+        | RunnableLambda(summarize)
+        | StrOutputParser()
+    )
+    for workers in (1, concurrency):
+        start = time.perf_counter()
+        context = map_reduce_context("Summarize the course notes", document.chunks, chain,
+                                     token_budget=budget, max_concurrency=workers)
+        print(f"{f'map-reduce, {workers} at once':>24}: {time.perf_counter() - start:6.2f} s, "
+              f"~{estimate_tokens(context)} token reduce context")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chapters", type=int, default=120)
+    parser.add_argument("--budget", type=int, default=3000, help="token budget of the prompt context")
+    parser.add_argument("--top-k", type=int, default=12)
+    parser.add_argument("--llm-ms", type=float, default=300, help="latency of one stub section summary")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    run(args.chapters, args.budget, args.top_k, args.llm_ms, args.concurrency)
@@ -0,0 +1,86 @@
+"""
+Benchmark for the cache of parsed and chunked uploads.
+
+A generated multi-page PDF and a CSV stand in for uploaded course files.
+The first question about them parses and splits them in memory; follow-up
+questions, and the same files uploaded again under other names, are served
+from the content-hash cache.
+
+Usage:
+    python -m benchmarks.bench_documents --pages 200
+"""
+import argparse
+import csv
+import io
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.utils.documents import DocumentCache
+
+LINE = "Week {page}: lecture notes on thermodynamics, entropy and the second law, line {line}."
+
+
+def make_pdf(pages: int, lines: int = 40) -> bytes:
+    """A minimal PDF with a few dozen lines of text on each page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = " ".join(
+            f"BT /F1 10 Tf 50 {780 - 18 * line} Td ({LINE.format(page=page, line=line)}) Tj ET" for line in range(lines)
+        ).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_csv(rows: int) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["student", "course", "grade", "comment"])
+    for row in range(rows):
+        writer.writerow([f"student {row}", f"PHYS {100 + row % 50}", "A-", "steady progress over the term"])
+    return out.getvalue().encode("utf-8")
+
+
+def timed(label: str, cache: DocumentCache, uploads) -> None:
+    start = time.perf_counter()
+    cached = [cache.load(name, data)[1] for name, data in uploads]
+    print(f"{label:>28}: {(time.perf_counter() - start) * 1000:9.2f} ms  (cached: {cached})")
+
+
+def run(pages: int, rows: int) -> None:
+    uploads = [("notes.pdf", make_pdf(pages)), ("grades.csv", make_csv(rows))]
+    print(f"{pages}-page PDF ({len(uploads[0][1]) / 1e6:.1f} MB) and {rows}-row CSV\n")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100, length_function=len)
+    cache = DocumentCache(splitter)
+
+    timed("first question", cache, uploads)
+    timed("follow-up question", cache, uploads)
+    timed("same files, other names", cache, [("copy.pdf", uploads[0][1]), ("copy.csv", uploads[1][1])])
+    print(f"\nstats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.pages, args.rows)
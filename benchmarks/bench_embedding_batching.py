@@ -0,0 +1,71 @@
+"""
+Load benchmark for the micro-batching embedding front end.
+
+Several threads issue embed_query calls concurrently, as Streamlit sessions do,
+and the run reports throughput and latency percentiles with and without
+batching. By default the model is a stub whose calls are serialized and cost a
+fixed overhead plus a per-text amount; pass --fastembed to use the real bge model.
+
+Usage:
+    python -m benchmarks.bench_embedding_batching --threads 16 --requests 50
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app.utils.embeddings import EMBEDDING_MODEL_NAME, BatchingEmbeddings
+from benchmarks.stubs import StubEmbeddings
+
+
+def load_test(model, threads: int, requests: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def session(session_id: int):
+        for i in range(requests):
+            start = time.perf_counter()
+            model.embed_query(f"session {session_id} question {i} about hostel admission fees")
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    workers = [threading.Thread(target=session, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / duration, statistics.median(latencies), p99
+
+
+def run(threads: int, requests: int, batch_size: int, wait_ms: float, fastembed: bool) -> None:
+    if fastembed:
+        from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+        base = FastEmbedEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    else:
+        base = StubEmbeddings(call_ms=4.0, item_ms=0.5, serialize=True)
+
+    for label, model in (
+        ("unbatched", base),
+        ("batched", BatchingEmbeddings(base, max_batch_size=batch_size, max_wait_ms=wait_ms)),
+    ):
+        throughput, p50, p99 = load_test(model, threads, requests)
+        print(f"{label:>10}: {throughput:8.1f} req/s, p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+        if hasattr(model, "stats"):
+            print(f"{'':>10}  {model.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    parser.add_argument("--fastembed", action="store_true")
+    args = parser.parse_args()
+    run(args.threads, args.requests, args.batch_size, args.wait_ms, args.fastembed)
@@ -0,0 +1,75 @@
+"""
+Benchmark for the streaming ingestion pipeline.
+
+A synthetic corpus in the scraper's output format is written to a temporary
+file, then chunked, embedded with a stub model and upserted into a stub sink
+that adds network latency and fails a fraction of requests. The run reports
+chunks per second per stage for one upsert worker against several.
+
+Usage:
+    python -m benchmarks.bench_ingest --pages 2000 --latency-ms 40 --workers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.utils.ingest import IngestionPipeline, iter_chunks
+from benchmarks.stubs import StubEmbeddings, StubSink
+
+WORDS = ("admission tuition hostel semester faculty course credit scholarship library "
+         "registrar exam campus department degree lecture transcript deadline fee").split()
+
+
+def write_corpus(path: str, pages: int, words_per_page: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    sections = ("admissions", "academics", "hostels", "news", "faculty")
+    with open(path, "w", encoding="utf-8") as f:
+        for page in range(pages):
+            section = sections[page % len(sections)]
+            body = " ".join(rng.choice(WORDS) for _ in range(words_per_page))
+            f.write(f"\n{'=' * 80}\n")
+            f.write(f"=== URL: https://example.edu/{section}/page-{page} ===\n\n")
+            f.write(f"=== Page Title ===\n{section.title()} page {page}\n\n{body}")
+            f.write(f"\n{'=' * 80}\n")
+
+
+def run(pages: int, words: int, batch_size: int, workers: int, latency_ms: float, failure_rate: float) -> None:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        write_corpus(path, pages, words)
+        print(f"Corpus: {pages} pages, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        for n_workers in sorted({1, workers}):
+            sink = StubSink(latency_ms=latency_ms, failure_rate=failure_rate)
+            pipeline = IngestionPipeline(
+                StubEmbeddings(dim=384, call_ms=2.0, item_ms=0.05),
+                sink,
+                batch_size=batch_size,
+                max_workers=n_workers,
+                backoff=0.01,
+                progress_every=10 ** 9,
+            )
+            counter = iter(range(10 ** 12))
+            stats = pipeline.run(iter_chunks(path, splitter), ids=lambda doc: str(next(counter)))
+            print(
+                f"{n_workers:>2} workers: {stats['chunks']} chunks in {stats['wall_seconds']:.2f}s "
+                f"({stats['wall_chunks_per_second']:.0f} chunks/s) | chunk {stats['chunk_chunks_per_second']:.0f}, "
+                f"embed {stats['embed_chunks_per_second']:.0f}, upsert {stats['upsert_chunks_per_second']:.0f} chunks/s "
+                f"| {sink.failures} failed upserts retried, {len(sink.vectors)} stored"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.pages, args.words, args.batch_size, args.workers, args.latency_ms, args.failure_rate)
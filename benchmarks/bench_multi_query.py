@@ -0,0 +1,69 @@
+"""
+Benchmark multi-query retrieval strategies against stub backends.
+
+Compares the sequential embed/search loop, batched and concurrent search, and
+adaptive expansion that skips the LLM when the first pass is confident. The
+embedding model charges a fixed cost per call plus a cost per text, the vector
+store answers each search after a simulated round trip and the LLM takes a
+fixed time to produce variants.
+
+Usage:
+    python -m benchmarks.bench_multi_query --runs 20 --search-ms 40 --llm-ms 800
+"""
+import argparse
+import statistics
+
+from langchain_core.prompts import PromptTemplate
+
+from app.core.retrieval import MultiQueryRetrieval
+from benchmarks.stubs import StubEmbeddings, StubVectorStore, stub_llm
+
+VARIANTS = "\n".join([
+    "What are the admission requirements for undergraduates?",
+    "Which documents are needed to apply for a BSc program?",
+    "What is the eligibility criteria for admission?",
+    "How do I qualify for undergraduate admission?",
+    "What marks are required to get admission?",
+])
+
+
+def run(runs: int, search_ms: float, embed_call_ms: float, embed_item_ms: float, llm_ms: float) -> None:
+    embeddings = StubEmbeddings(call_ms=embed_call_ms, item_ms=embed_item_ms)
+    store = StubVectorStore(embedding=embeddings, latency_ms=search_ms)
+
+    # The stub store's best match scores 0.8, so a 0.75 bar is "well covered"
+    # and a 0.95 bar forces expansion
+    scenarios = [
+        ("sequential", False, dict(confidence=None)),
+        ("batched+parallel", True, dict(confidence=None)),
+        ("adaptive, covered", True, dict(confidence=0.75)),
+        ("adaptive, weak+llm", True, dict(confidence=0.95)),
+        ("adaptive, weak+local", True, dict(confidence=0.95, expansion="local")),
+    ]
+    for label, parallel, options in scenarios:
+        retrieval = MultiQueryRetrieval(
+            vector_store=store,
+            llm=stub_llm(VARIANTS, latency_ms=llm_ms),
+            query_prompt=PromptTemplate.from_template("{question}"),
+            k=3,
+            score_threshold=0.4,
+            **options,
+        )
+        timings = [retrieval.retrieve("What are the admission requirements?", parallel=parallel).timings
+                   for _ in range(runs)]
+        summary = ", ".join(
+            f"{stage} {statistics.mean(t[stage] for t in timings):.1f}"
+            for stage in ("first_pass", "expand", "embed", "search", "merge", "total")
+        )
+        print(f"{label:>20}: mean ms -> {summary}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--search-ms", type=float, default=40.0)
+    parser.add_argument("--embed-call-ms", type=float, default=8.0)
+    parser.add_argument("--embed-item-ms", type=float, default=2.0)
+    parser.add_argument("--llm-ms", type=float, default=800.0)
+    args = parser.parse_args()
+    run(args.runs, args.search_ms, args.embed_call_ms, args.embed_item_ms, args.llm_ms)
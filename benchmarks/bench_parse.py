@@ -0,0 +1,48 @@
+"""
+Pages per second of parallel upload parsing against the number of worker processes.
+
+A batch of generated multi-page PDFs, like a set of lecture notes uploaded
+together, is parsed with ParsePool at each worker count. One worker parses
+in the calling process, as the app did before. Each pool is warmed up
+first, so process start-up is not counted.
+
+Usage:
+    python -m benchmarks.bench_parse --files 10 --pages 40 --workers 1 2 4
+"""
+import argparse
+import os
+import time
+
+from app.utils.parsing import ParsePool
+from benchmarks.bench_documents import make_pdf
+
+
+def run(files: int, pages: int, workers_list, pages_per_part: int) -> None:
+    uploads = [(f"lecture-{i}.pdf", make_pdf(pages)) for i in range(files)]
+    print(f"{files} PDFs x {pages} pages, {os.cpu_count()} CPU core(s)\n")
+
+    baseline = None
+    for workers in workers_list:
+        pool = ParsePool(workers=workers, pages_per_part=pages_per_part)
+        try:
+            list(pool.parts(uploads[:1]))  # start the worker processes
+            start = time.perf_counter()
+            parsed = sum(len(part.pages) for part in pool.parts(uploads))
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.shutdown()
+        rate = parsed / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>3} worker(s): {rate:8.1f} pages/s  ({elapsed:.2f} s, {rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1])
+    parser.add_argument("--pages-per-part", type=int, default=8)
+    args = parser.parse_args()
+    run(args.files, args.pages, args.workers, args.pages_per_part)
@@ -0,0 +1,82 @@
+"""
+Hit rate of the response cache against per-process exact-text caching.
+
+A stream of questions, drawn with a skewed popularity from a fixed pool
+and typed with random case, spacing and trailing punctuation, is spread
+over several app processes. Some questions come with an uploaded file that
+each user uploads again. The old cache (exact query text and file object,
+private to each process) is compared with the shared response cache keyed
+by route, normalized query and file content hash.
+
+Usage:
+    python -m benchmarks.bench_response_cache --requests 2000 --processes 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.utils.response_cache import ResponseCache, content_hash
+
+QUESTIONS = [f"What is the deadline for program {i} applications" for i in range(200)]
+FILES = [f"syllabus {i}\n".encode("utf-8") * 200 for i in range(20)]
+
+
+def typed(question: str, rng: random.Random) -> str:
+    """The question as a user might type it"""
+    if rng.random() < 0.5:
+        question = question.lower()
+    if rng.random() < 0.3:
+        question = question.replace(" ", "  ", 1)
+    return question + rng.choice(["?", "", " ?", "."])
+
+
+def workload(requests: int, seed: int):
+    """(question text, uploaded file contents or None) pairs"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    for _ in range(requests):
+        question = typed(rng.choices(QUESTIONS, weights)[0], rng)
+        data = rng.choice(FILES) if rng.random() < 0.2 else None
+        yield question, data
+
+
+def run(requests: int, processes: int, seed: int) -> None:
+    items = list(workload(requests, seed))
+
+    # Old: one dict per process, keyed by the raw text and the uploaded file object
+    local = [dict() for _ in range(processes)]
+    hits = 0
+    for i, (question, data) in enumerate(items):
+        uploaded = object() if data is not None else None  # every upload is a new object
+        key = (question, id(uploaded) if uploaded is not None else None)
+        cache = local[i % processes]
+        if key in cache:
+            hits += 1
+        cache[key] = "answer"
+    print(f"{'per-process exact text':>24}: {hits / requests:6.1%} hit rate, {requests - hits} LLM answers")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "responses.sqlite3")
+        shared = [ResponseCache(path, max_entries=1000) for _ in range(processes)]
+        start = time.perf_counter()
+        for i, (question, data) in enumerate(items):
+            cache = shared[i % processes]
+            route = "files" if data is not None else "university"
+            key = cache.key(route, question, [content_hash(data)] if data is not None else [])
+            if cache.get(key, route) is None:
+                cache.put(key, route, "answer " * 300)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats = shared[0].stats()
+        print(f"{'shared response cache':>24}: {stats['hit_rate']:6.1%} hit rate, {stats['misses']} LLM answers, "
+              f"{elapsed_ms / requests:.2f} ms per lookup")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=4, help="app processes the requests are spread over")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.requests, args.processes, args.seed)
@@ -0,0 +1,134 @@
+"""
+Overload benchmark for the shared request scheduler.
+
+Many clients ask at once for answers that stream from a stub LLM, and each
+client gives up after a timeout. The old approach (a new thread pool per
+message, result(timeout=...)) is compared with the shared scheduler: how many
+requests were answered or turned away, the queue wait, and how many tokens
+were generated for clients that had already given up.
+
+Usage:
+    python -m benchmarks.bench_scheduler --clients 40 --workers 8 --queue 8
+"""
+import argparse
+import concurrent.futures
+import threading
+import time
+
+from app.core.scheduler import Busy, DeadlineExceeded, RequestScheduler
+
+
+class StubStream:
+    """
+    Provider serving a limited number of concurrent streams at a fixed token rate.
+
+    Counts the tokens generated after the client gave up, which are paid for
+    but never shown.
+    """
+
+    def __init__(self, tokens: int, token_ms: float, slots: int):
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.slots = threading.Semaphore(slots)
+        self.lock = threading.Lock()
+        self.wasted = 0
+
+    def answer(self, abandoned: threading.Event):
+        with self.slots:
+            for i in range(self.tokens):
+                time.sleep(self.token_ms / 1000)
+                if abandoned.is_set():
+                    with self.lock:
+                        self.wasted += 1
+                yield f"t{i} "
+
+
+def per_message_pools(clients: int, timeout: float, stub: StubStream) -> dict:
+    answered = timed_out = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal answered, timed_out
+        abandoned = threading.Event()
+        future = concurrent.futures.ThreadPoolExecutor().submit(lambda: "".join(stub.answer(abandoned)))
+        try:
+            future.result(timeout=timeout)
+            with lock:
+                answered += 1
+        except concurrent.futures.TimeoutError:
+            abandoned.set()
+            with lock:
+                timed_out += 1
+
+    run_clients(clients, client)
+    return {"answered": answered, "timed_out": timed_out, "busy": 0}
+
+
+def shared_scheduler(clients: int, timeout: float, stub: StubStream, workers: int, queue: int) -> dict:
+    scheduler = RequestScheduler(workers=workers, max_queue=queue, timeout=timeout)
+    answered = timed_out = busy = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal answered, timed_out, busy
+        abandoned = threading.Event()
+        try:
+            with scheduler.stream(stub.answer, abandoned) as items:
+                "".join(items)
+            with lock:
+                answered += 1
+        except Busy:
+            with lock:
+                busy += 1
+        except DeadlineExceeded:
+            abandoned.set()
+            with lock:
+                timed_out += 1
+
+    run_clients(clients, client)
+    stats = scheduler.stats()
+    return {"answered": answered, "timed_out": timed_out, "busy": busy,
+            "wait_p95_ms": stats["wait_p95_ms"], "cancelled": stats["cancelled"]}
+
+
+def run_clients(clients: int, client) -> None:
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run(clients: int, workers: int, queue: int, tokens: int, token_ms: float, timeout: float, slots: int) -> None:
+    print(f"{clients} clients, {tokens} tokens per answer at {token_ms:.0f} ms/token, "
+          f"{slots} concurrent provider streams, {timeout:.1f}s client timeout\n")
+    drain = clients * tokens * token_ms / 1000 / slots + 0.2
+
+    stub = StubStream(tokens, token_ms, slots)
+    start = time.perf_counter()
+    result = per_message_pools(clients, timeout, stub)
+    # Timed-out work keeps generating in the background; wait for it to count the waste
+    time.sleep(drain)
+    print(f"{'per-message pools':>20}: {result['answered']} answered, {result['timed_out']} timed out, "
+          f"{stub.wasted} tokens generated after clients gave up ({time.perf_counter() - start:.1f}s)")
+
+    stub = StubStream(tokens, token_ms, slots)
+    start = time.perf_counter()
+    result = shared_scheduler(clients, timeout, stub, workers, queue)
+    time.sleep(drain)
+    print(f"{'shared scheduler':>20}: {result['answered']} answered, {result['timed_out']} timed out, "
+          f"{result['busy']} turned away as busy, {stub.wasted} tokens generated after clients gave up, "
+          f"queue wait p95 {result['wait_p95_ms']:.0f} ms ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=1.5)
+    parser.add_argument("--provider-slots", type=int, default=8, help="streams the stub LLM serves at once")
+    args = parser.parse_args()
+    run(args.clients, args.workers, args.queue, args.tokens, args.token_ms, args.timeout, args.provider_slots)
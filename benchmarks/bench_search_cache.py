@@ -0,0 +1,58 @@
+"""
+Benchmark for the persistent web search cache.
+
+A stub search with a fixed latency stands in for an advanced Tavily search.
+The run times a cold search, a repeat of the same question worded slightly
+differently, a stale result served while it is refreshed in the background,
+and a lookup after the cache file is reopened, as after an app restart.
+
+Usage:
+    python -m benchmarks.bench_search_cache --latency-ms 1500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.utils.search_cache import SearchCache
+
+PARAMS = {"max_results": 1, "search_depth": "advanced", "include_raw_content": True, "time_range": "year"}
+
+
+def stub_search(query: str, latency_ms: float, calls: list):
+    def search():
+        calls.append(query)
+        time.sleep(latency_ms / 1000)
+        return {"query": query, "results": [{"url": "https://example.com", "content": "x" * 2000}]}
+    return search
+
+
+def timed(label: str, cache: SearchCache, query: str, latency_ms: float, calls: list) -> None:
+    start = time.perf_counter()
+    cache.get_or_search(query, PARAMS, stub_search(query, latency_ms, calls))
+    print(f"{label:>26}: {(time.perf_counter() - start) * 1000:9.2f} ms  ({len(calls)} searches so far)")
+
+
+def run(latency_ms: float) -> None:
+    calls = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.sqlite3")
+        cache = SearchCache(path, ttl_seconds=0.5, stale_seconds=60)
+
+        timed("cold search", cache, "Latest HEC scholarship news?", latency_ms, calls)
+        timed("repeat, reworded case", cache, "latest  hec scholarship news", latency_ms, calls)
+        time.sleep(0.6)
+        timed("stale, refresh started", cache, "Latest HEC scholarship news", latency_ms, calls)
+        time.sleep(latency_ms / 1000 + 0.1)
+        timed("after the refresh", cache, "Latest HEC scholarship news", latency_ms, calls)
+
+        reopened = SearchCache(path, ttl_seconds=3600, stale_seconds=60)
+        timed("after reopening the file", reopened, "Latest HEC scholarship news", latency_ms, calls)
+        print(f"\nstats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=1500, help="latency of the stub search")
+    args = parser.parse_args()
+    run(args.latency_ms)
@@ -0,0 +1,70 @@
+"""
+Benchmark for extractive compression of raw web content.
+
+A synthetic Tavily response with long raw pages is compressed for a question
+whose answer is a single sentence on one of the pages. The run reports the
+prompt size before and after, the time compression took, and whether the
+answer and its source URL survived.
+
+Usage:
+    python -m benchmarks.bench_web_compression --results 5 --page-chars 40000 --budget 1500
+"""
+import argparse
+import random
+
+from app.core.compression import compress_web_results
+from benchmarks.stubs import StubEmbeddings
+
+FILLER = ["university", "campus", "department", "research", "students", "faculty", "programme", "office",
+          "library", "semester", "notice", "session", "board", "committee", "budget", "policy", "event"]
+QUESTION = "When is the last date to apply for the HEC need-based scholarship this year?"
+ANSWER = "The last date to apply for the HEC need-based scholarship this year is 15 March."
+
+
+def raw_page(rng: random.Random, chars: int) -> str:
+    sentences, size = [], 0
+    while size < chars:
+        sentence = " ".join(rng.choices(FILLER, k=rng.randint(8, 20))).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def tavily_response(results: int, page_chars: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    response = {"query": QUESTION, "results": []}
+    for i in range(results):
+        content = raw_page(rng, page_chars)
+        if i == results // 2:
+            middle = len(content) // 2
+            content = content[:middle] + " " + ANSWER + " " + content[middle:]
+        response["results"].append({
+            "url": f"https://news.example.com/article-{i}",
+            "title": f"Article {i}",
+            "content": content[:300],
+            "raw_content": content,
+        })
+    return response
+
+
+def run(results: int, page_chars: int, budget: int, embed_ms: float) -> None:
+    response = tavily_response(results, page_chars)
+    embeddings = StubEmbeddings(dim=768, item_ms=embed_ms)
+    compressed = compress_web_results(QUESTION, response, embeddings, token_budget=budget)
+    answer_url = response["results"][results // 2]["url"]
+
+    print(f"prompt context: ~{compressed.tokens_before} tokens -> ~{compressed.tokens_after} tokens "
+          f"({compressed.tokens_after / compressed.tokens_before:.1%})")
+    print(f"passages kept : {compressed.passages_kept} of {compressed.passages}")
+    print(f"compression   : {compressed.milliseconds:.1f} ms")
+    print(f"answer kept   : {ANSWER in compressed.text}, cited as {answer_url}: {answer_url in compressed.text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--page-chars", type=int, default=40000)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--embed-ms", type=float, default=0.5, help="simulated embedding cost per passage")
+    args = parser.parse_args()
+    run(args.results, args.page_chars, args.budget, args.embed_ms)
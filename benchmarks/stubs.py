@@ -0,0 +1,211 @@
+"""Local stand-ins for the embedding model, vector store and LLM used by the benchmarks."""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import FakeListChatModel
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic hashed bag-of-words embeddings with a simulated model cost.
+
+    With serialize=True only one call runs at a time, like concurrent ONNX runs
+    competing for the same cores.
+    """
+
+    def __init__(self, dim: int = 768, call_ms: float = 0.0, item_ms: float = 0.0, serialize: bool = False):
+        self.dim = dim
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self._lock = threading.Lock() if serialize else None
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._lock is not None:
+            with self._lock:
+                time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000)
+        else:
+            time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class StubVectorStore:
+    """Vector store that answers every search after a fixed network latency"""
+
+    def __init__(self, index=None, embedding: Embeddings = None, latency_ms: float = 0.0):
+        self.index = index
+        self.embeddings = embedding
+        self.latency_ms = latency_ms
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], *, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        time.sleep(self.latency_ms / 1000)
+        seed = int(abs(sum(embedding)) * 1000)
+        return [(Document(page_content=f"Stub chunk {(seed + i) % 50}"), 0.8 - 0.1 * i) for i in range(k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+
+class StubSink:
+    """Upsert sink that records vectors after a network latency and fails a fraction of calls"""
+
+    def __init__(self, latency_ms: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.vectors = {}
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upsert(self, ids: List[str], texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> None:
+        time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.failure_rate:
+                self.failures += 1
+                raise ConnectionError("stub upsert failed")
+            self.vectors.update(zip(ids, vectors))
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for id_ in ids:
+                self.vectors.pop(id_, None)
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+def stub_llm(*responses: str, latency_ms: float = 0.0) -> FakeListChatModel:
+    """Chat model that cycles through canned responses after a simulated generation time"""
+    return FakeListChatModel(
+        responses=list(responses) or ["Stub answer"],
+        sleep=latency_ms / 1000 if latency_ms else None,
+    )
+
+
+class FixtureSite:
+    """
+    Local HTTP server serving a synthetic university site with a simulated response time.
+
+    /page/0 is the home page; each page links to its children in a tree with the
+    given fan-out, plus back to the home page. Links also come in fragment,
+    trailing-slash and tracking-parameter variants, and point at a PDF
+    brochure and an extensionless download that is not HTML. Responses carry an ETag and
+    answer If-None-Match with 304; update() changes a page's content. Use as a
+    context manager:
+
+        with FixtureSite(pages=100, latency_ms=50) as site:
+            crawl(site.url("/page/0"))
+    """
+
+    def __init__(self, pages: int = 100, fanout: int = 4, latency_ms: float = 0.0, words: int = 300):
+        self.pages = pages
+        self.fanout = fanout
+        self.latency_ms = latency_ms
+        self.words = words
+        self.requests = 0
+        self.not_modified = 0
+        self.revisions = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def render(self, page: int) -> str:
+        """HTML of one fixture page"""
+        rng = random.Random(page)
+        words = "admission tuition hostel semester faculty course credit scholarship library exam campus".split()
+        body = " ".join(rng.choice(words) for _ in range(self.words))
+        body += f" Revision {self.revisions.get(page, 0)}."
+        children = range(page * self.fanout + 1, min(self.pages, page * self.fanout + self.fanout + 1))
+        links = "".join(
+            f'<li><a href="/page/{child}">Page {child}</a> <a href="/page/{child}/#details">details</a> '
+            f'<a href="/page/{child}?utm_source=nav">more</a></li>'
+            for child in children
+        )
+        if page % 10 == 0:
+            links += f'<a href="/files/brochure-{page}.pdf">Brochure</a> <a href="/download/{page}">Prospectus</a>'
+        return (f"<html><head><title>Fixture page {page}</title></head><body>"
+                f'<nav><a href="/page/0">Home</a></nav><h1>Page {page}</h1><p>{body}</p><ul>{links}</ul></body></html>')
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                time.sleep(site.latency_ms / 1000)
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) == 2 and parts[0] == "download":
+                    body = b"%PDF-1.4 fixture"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if len(parts) != 2 or parts[0] != "page" or not parts[1].isdigit() or int(parts[1]) >= site.pages:
+                    self.send_error(404)
+                    return
+                body = site.render(int(parts[1])).encode("utf-8")
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with site._lock:
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def update(self, *pages: int) -> None:
+        """Change the content (and so the ETag) of some pages"""
+        for page in pages:
+            self.revisions[page] = self.revisions.get(page, 0) + 1
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self._server.server_address[1]}"
+
+    def url(self, path: str = "/page/0") -> str:
+        return f"http://{self.host}{path}"
+
+    def __enter__(self) -> "FixtureSite":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,24 +1,46 @@
-import requests
-from bs4 import BeautifulSoup
-import time
+import argparse
+import json
+from bs4 import BeautifulSoup, Tag
+from bs4.element import PreformattedString
 import os
+from datetime import datetime, timezone
 from urllib.parse import urlparse, urljoin
 import re
 
+from app.core.config import SCRAPER_CONCURRENCY, SCRAPER_RATE_LIMIT
+from app.utils.crawler import Crawler, CrawlStateStore, content_hash
+from app.utils.ingest import open_corpus
+
 # Configuration for Agricultural University Peshawar
 BASE_URL = "https://www.aup.edu.pk"
 ALLOWED_DOMAINS = ["www.aup.edu.pk", "aup.edu.pk"]
 OUTPUT_DIR = "aup_data_txt"
+MAX_PAGES = 200
+STATE_FILE = "crawl_state.sqlite3"
+CHECKPOINT_FILE = "crawl_checkpoint.json"
+
+# Text cleanup patterns, compiled once.
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Phone numbers in various formats, e.g. +1 123-456-7890, (123) 456-7890, 1234567890.
+# A match may start at the spaces or dashes before the digits, which it removes too.
+PHONE_PATTERN = re.compile(r'(?:\+?\d{1,3}[\s\-]?)?(?:\(?\d{2,4}\)?[\s\-]?)?[\d\s\-]{7,}\d')
+# Labels like "Phone:", "Tel:" or "Office:", removed after the numbers so that
+# labels left without a number go too.
+LABEL_PATTERN = re.compile(r'\b(?:Phone|Tel|Office):\s*', re.IGNORECASE)
+
+# Elements whose text is never page content
+NON_CONTENT_TAGS = {"script", "style", "noscript", "template", "svg"}
+# Elements that start a new line of text
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset",
+              "figcaption", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+              "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul"}
 
 def clean_text_content(text):
     """Cleans up text content."""
     if not text:
         return ""
-    text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with single space
-    text = text.replace('\xa0', ' ')   # Replace non-breaking spaces
-    text = text.replace('\n', ' ')     # Replace newlines with spaces
-    text = re.sub(r'\s+', ' ', text)   # Clean up any resulting multiple spaces
-    return text.strip()
+    # \s also matches non-breaking spaces and newlines, so one substitution collapses them all
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
 
 def remove_contact_info(text):
     """Removes phone numbers and office numbers from the text.
@@ -26,44 +48,71 @@ def remove_contact_info(text):
     This function uses regex patterns to remove sequences that match common
     phone number or office number formats.
     """
-    # Pattern to match phone numbers in various formats:
-    # e.g., +1 123-456-7890, (123) 456-7890, 1234567890, 123 456 7890, etc.
-    phone_pattern = re.compile(
-        r'(\+?\d{1,3}[\s\-]?)?(\(?\d{2,4}\)?[\s\-]?)?[\d\s\-]{7,}\d'
-    )
-    cleaned_text = re.sub(phone_pattern, '', text)
+    return LABEL_PATTERN.sub('', PHONE_PATTERN.sub('', text))
 
-    # Remove lingering labels like "Phone:", "Tel:" or "Office:" if they appear without a number.
-    label_pattern = re.compile(r'\b(?:Phone|Tel|Office):\s*', re.IGNORECASE)
-    cleaned_text = re.sub(label_pattern, '', cleaned_text)
+def clean_line(text):
+    """Collapses whitespace, then removes contact details."""
+    return remove_contact_info(clean_text_content(text)).strip()
 
-    return cleaned_text
-
-def extract_page_content(soup, url):
-    """Extracts nearly all text content from a page for RAG-based chatbot ingestion."""
-    content = []
+def iter_text(body):
+    """Yields the text of an element in document order, with a newline around block elements.
 
-    # Add URL and page title as headers
-    content.append(f"=== URL: {url} ===\n")
+    A single walk over the tree; scripts, styles, comments and other non-content
+    nodes are skipped without modifying the tree.
+    """
+    stack = [iter(body.children)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        if isinstance(node, Tag):
+            if node.name in NON_CONTENT_TAGS:
+                continue
+            if node.name in BLOCK_TAGS:
+                yield '\n'
+                # Closes the block once its children are done
+                stack.append(iter(['\n']))
+            stack.append(iter(node.children))
+        elif isinstance(node, str) and not isinstance(node, PreformattedString):
+            yield node
+            yield ' '
+
+def extract_page(soup):
+    """Extracts the page title and body text, one line per block element.
+
+    Scripts and styles are dropped, and phone/office numbers are removed.
+    """
     title = soup.find('title')
-    if title:
-        content.append(f"=== Page Title ===\n{clean_text_content(title.text)}\n")
+    title = clean_text_content(title.text) if title else ""
 
-    # Extract text from the entire body.
     body = soup.find('body')
-    if body:
-        full_text = clean_text_content(body.get_text(separator=" "))
-        # Remove phone/office numbers from the text.
-        full_text = remove_contact_info(full_text)
-        content.append(full_text)
+    if not body:
+        return title, ""
+    # Block elements start a new line so repeated navigation, header and footer
+    # lines can be removed before indexing.
+    lines = (clean_line(line) for line in ''.join(iter_text(body)).split('\n'))
+    return title, "\n".join(line for line in lines if line)
 
+def extract_page_content(soup, url):
+    """Extracts nearly all text content from a page for RAG-based chatbot ingestion."""
+    title, text = extract_page(soup)
+    return format_text_page({"url": url, "title": title, "text": text})
+
+def format_text_page(record):
+    """Render a page record in the legacy text format with URL and title headers."""
+    content = [f"=== URL: {record['url']} ===\n"]
+    if record['title']:
+        content.append(f"=== Page Title ===\n{record['title']}\n")
+    if record['text']:
+        content.append(record['text'])
     return "\n".join(content)
 
-def is_valid_url(url):
+def is_valid_url(url, allowed_domains=ALLOWED_DOMAINS):
     """Check if URL belongs to AUP domain. (Specific filtering removed.)"""
     try:
         parsed = urlparse(url)
-        return parsed.netloc in ALLOWED_DOMAINS
+        return parsed.netloc in allowed_domains
     except Exception:
         return False
 
@@ -75,63 +124,127 @@ def save_content(content, filename):
         f.write(content)
     print(f"Saved content to: {filepath}")
 
-def scrape_aup_website():
-    """Main function to scrape the entire AUP website for data ingestion."""
-    print(f"Starting to scrape {BASE_URL}")
-
-    visited_urls = set()
-    urls_to_visit = {BASE_URL}
+def process_page(url, response):
+    """Extract the page record and its links (runs on a crawler worker thread)."""
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    # Extract content and remove contact info
+    title, text = extract_page(soup)
+    links = [urljoin(url, link['href']) for link in soup.find_all('a', href=True)]
+    return json.dumps({"title": title, "text": text}, ensure_ascii=False), links
+
+def page_record(page):
+    """Build the output record of a crawled page."""
+    extracted = json.loads(page.content)
+    return {
+        "url": page.url,
+        "title": extracted["title"],
+        "fetched_at": datetime.fromtimestamp(page.fetched_at, timezone.utc).isoformat(timespec="seconds"),
+        "hash": content_hash(extracted["text"]),
+        "text": extracted["text"],
+    }
+
+def write_page(f, record, output_format="jsonl"):
+    """Write one page record as a JSON line, or between separator lines in the text format."""
+    if output_format == "jsonl":
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write("\n")
+    else:
+        f.write(f"\n{'='*80}\n")
+        f.write(format_text_page(record))
+        f.write(f"\n{'='*80}\n")
+
+def scrape_aup_website(base_url=BASE_URL, allowed_domains=ALLOWED_DOMAINS, output_dir=OUTPUT_DIR,
+                       max_pages=MAX_PAGES, concurrency=SCRAPER_CONCURRENCY, rate=SCRAPER_RATE_LIMIT,
+                       full=False, output_format="jsonl", compress=False):
+    """Main function to scrape the entire AUP website for data ingestion.
+
+    Pages are fetched concurrently with a per-host rate limit instead of a
+    fixed delay between requests. Each URL's ETag, Last-Modified, body hash and
+    extracted content are kept in a state store, so a recrawl sends conditional
+    requests and only parses pages that changed. The master file is rewritten
+    with every page of this crawl (no duplicates across runs), and the new or
+    changed pages alone go to a separate changes file.
+
+    Output is streamed as one JSON record per line (url, title, fetched_at,
+    hash, text), gzip-compressed with compress=True; output_format="text"
+    writes the legacy "=== URL ===" separated file instead.
+
+    URLs are canonicalized and crawled breadth-first, links to non-HTML assets
+    are skipped, and progress is checkpointed so an interrupted crawl resumes
+    where it stopped on the next run. Returns the crawl statistics.
+    """
+    print(f"Starting to scrape {base_url} ({concurrency} workers, {rate} requests/s per host)")
 
     # Create directory for output
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
 
     # Create a master file for all content
-    master_file = os.path.join(OUTPUT_DIR, 'aup_website_data.txt')
-
-    while urls_to_visit and len(visited_urls) < 200:  # Limit to 200 pages
-        try:
-            current_url = urls_to_visit.pop()
-            if current_url in visited_urls:
-                continue
-
-            print(f"Processing: {current_url}")
-
-            # Fetch page content
-            response = requests.get(current_url, timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract content and remove contact info
-            content = extract_page_content(soup, current_url)
-
-            # Save to master file
-            with open(master_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*80}\n")
-                f.write(content)
-                f.write(f"\n{'='*80}\n")
-
-            # Find new links and add them if they belong to the allowed domain.
-            for link in soup.find_all('a', href=True):
-                url = urljoin(current_url, link['href'])
-                if is_valid_url(url) and url not in visited_urls:
-                    urls_to_visit.add(url)
-
-            visited_urls.add(current_url)
-
-            # Polite delay to avoid overloading the server
-            time.sleep(2)
-
-        except Exception as e:
-            print(f"Error processing {current_url}: {str(e)}")
-            continue
-
-    print(f"\nScraping completed. Processed {len(visited_urls)} pages.")
+    extension = '.jsonl' if output_format == 'jsonl' else '.txt'
+    if compress:
+        extension += '.gz'
+    master_file = os.path.join(output_dir, 'aup_website_data' + extension)
+    changes_file = os.path.join(output_dir, 'aup_website_changes' + extension)
+
+    state_path = os.path.join(output_dir, STATE_FILE)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if full:
+        for path in (state_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    state = CrawlStateStore(state_path)
+
+    crawler = Crawler(
+        lambda url: is_valid_url(url, allowed_domains),
+        concurrency=concurrency,
+        rate=rate,
+        max_pages=max_pages,
+        state=state,
+        checkpoint_path=checkpoint_path,
+    )
+    pages = crawler.crawl([base_url], process_page)
+    # Results arrive on this thread, so the output files have a single writer
+    try:
+        # The temporary names keep the .gz suffix so open_corpus compresses them
+        master_tmp = os.path.join(output_dir, '.tmp-' + os.path.basename(master_file))
+        changes_tmp = os.path.join(output_dir, '.tmp-' + os.path.basename(changes_file))
+        with open_corpus(master_tmp, 'w') as master, open_corpus(changes_tmp, 'w') as changes:
+            for page in pages:
+                print(f"Processed ({page.status}): {page.url}")
+                record = page_record(page)
+                write_page(master, record, output_format)
+                if page.status != "unchanged":
+                    write_page(changes, record, output_format)
+        os.replace(master_tmp, master_file)
+        os.replace(changes_tmp, changes_file)
+    finally:
+        # Saves the checkpoint if the crawl did not finish
+        pages.close()
+        state.close()
+
+    stats = crawler.stats
+    print(f"\nScraping completed. Processed {stats.pages} pages ({stats.changed} new or changed, "
+          f"{stats.resumed} from the previous run, {stats.skipped} non-HTML skipped, {stats.errors} errors) "
+          f"in {stats.seconds:.1f}s: {stats.pages_per_second:.2f} pages/s.")
     print(f"Content saved to: {master_file}")
+    print(f"Changed pages saved to: {changes_file}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the AUP website into a corpus for indexing.")
+    parser.add_argument("--concurrency", type=int, default=SCRAPER_CONCURRENCY, help="pages fetched in parallel")
+    parser.add_argument("--rate", type=float, default=SCRAPER_RATE_LIMIT, help="requests per second per host")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--full", action="store_true",
+                        help="discard the crawl state and any interrupted crawl, and refetch every page")
+    parser.add_argument("--format", choices=("jsonl", "text"), default="jsonl",
+                        help="one JSON record per page, or the legacy separator-delimited text file")
+    parser.add_argument("--compress", action="store_true", help="gzip the output files")
+    args = parser.parse_args()
 
-if _name_ == "_main_":
     try:
-        scrape_aup_website()
+        scrape_aup_website(max_pages=args.max_pages, concurrency=args.concurrency, rate=args.rate, full=args.full,
+                           output_format=args.format, compress=args.compress)
     except KeyboardInterrupt:
         print("\nScraping interrupted by user.")
     except Exception as e:
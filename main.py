@@ -1,17 +1,31 @@
 import streamlit as st
 import os
-import re
-from typing import Optional, List, Dict, Any
-import tempfile
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, List, Dict, Any, Sequence, Union
 import time
-import threading
-import concurrent.futures
 
-from app.core.decision_maker import take_decision
-from app.agents.uni_agent import uni_agent
-from app.agents.web_agent import web_agent
-from app.agents.university_tutor import university_tutor, summarize_file
+from app.core.config import (
+    RESPONSE_CACHE,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_FILES,
+    RESPONSE_CACHE_TTL_GENERAL,
+    RESPONSE_CACHE_TTL_UNIVERSITY,
+    RESPONSE_CACHE_TTL_WEB,
+)
+from app.core.decision_maker import route_query
+from app.core.scheduler import Busy, DeadlineExceeded, get_request_scheduler
+from app.core.streaming import ErrorMessage, get_stream_metrics, strip_think, timed_stream
+from app.agents.uni_agent import INDEX_NAME, uni_agent_stream
+from app.agents.web_agent import web_agent_stream
+from app.agents.university_tutor import university_tutor_stream, summarize_uploads_stream
+from app.utils.clients import get_or_create
 from app.utils.embeddings import set_embeddings, get_embedding_model
+from app.utils.response_cache import ResponseCache, content_hash
+from app.utils.vector_store import read_index_version
+
+# Minimum seconds between re-renders of a streaming answer; rendering the
+# markdown again for every token gets slow on long answers
+RENDER_INTERVAL = 0.05
 
 # Set page configuration with custom theme
 st.set_page_config(
@@ -88,13 +102,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=600)
-def remove_think_tags(text: str) -> str:
-    """
-    Removes all content between <think> and </think> tags, including the tags themselves.
-    """
-    return re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-
 def load_environment_variables():
     """Load environment variables with fallback to empty strings"""
     os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
@@ -148,66 +155,145 @@ def display_sidebar():
             st.session_state.show_thinking = True
         else:
             st.session_state.show_thinking = False
+
+        # Rolling time to first token per agent, and the shared request queue
+        metrics = get_stream_metrics().summary()
+        if metrics:
+            with st.expander("⏱️ Response times", expanded=False):
+                for agent, stats in metrics.items():
+                    st.caption(
+                        f"{agent}: first token p50 {stats['first_token_p50_ms']:.0f} ms, "
+                        f"p95 {stats['first_token_p95_ms']:.0f} ms ({stats['streams']} answers)"
+                    )
+                queue = get_request_scheduler().stats()
+                st.caption(
+                    f"Queue: {queue['queued']} waiting, {queue['running']} of {queue['workers']} workers busy, "
+                    f"wait p95 {queue['wait_p95_ms']:.0f} ms; {queue['rejected']} turned away, "
+                    f"{queue['deadline_exceeded']} timed out, {queue['cancelled']} cancelled"
+                )
+                if RESPONSE_CACHE:
+                    cache = get_response_cache().stats()
+                    st.caption(
+                        f"Response cache: {cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, "
+                        f"{cache['misses']} misses), {cache['entries']} answers stored"
+                    )
             
         st.markdown("---")
         #   st.markdown("<div style='text-align: center'>Powered by Raz - 2025</div>", unsafe_allow_html=True)
         
         return uploaded_files
 
-def save_uploaded_file(uploaded_file) -> str:
-    """Save uploaded file to a temporary location and return the path"""
-    try:
-        # Create a unique filename to avoid collisions
-        file_extension = f".{uploaded_file.name.split('.')[-1]}"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            return temp_file.name
-    except Exception as e:
-        st.error(f"Error saving file: {e}")
-        return ""
+class Step(NamedTuple):
+    """An intermediate step of process_response, shown in the UI as it happens"""
+    text: str
 
-@st.cache_data(ttl=300)
-def process_response(query: str, uploaded_files, file_paths=[]) -> str:
-    """Process the query and get the appropriate response"""
-    # Store intermediate thinking steps for UI
-    thinking_steps = []
-    
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide cache of complete answers"""
+    return get_or_create(("response_cache",), lambda: ResponseCache(
+        path=RESPONSE_CACHE_PATH,
+        ttls={
+            "university": RESPONSE_CACHE_TTL_UNIVERSITY,
+            "web search": RESPONSE_CACHE_TTL_WEB,
+            "general": RESPONSE_CACHE_TTL_GENERAL,
+            "files": RESPONSE_CACHE_TTL_FILES,
+        },
+        max_entries=RESPONSE_CACHE_SIZE,
+    ))
+
+def cached_answer(route: str, query: str, answer: Callable[[], Iterable[Union[Step, str]]],
+                  file_hashes: Sequence[str] = (), version: Optional[str] = None) -> Iterator[Union[Step, str]]:
+    """
+    Stream an answer from the response cache, or from answer() and cache it.
+
+    Args:
+        route: The route answering the query
+        query: The user's question
+        answer: Zero-argument callable streaming the steps and answer on a miss
+        file_hashes: Content hashes of the uploaded files
+        version: Version of the data behind the route, if it can change
+
+    Yields:
+        A Step noting a cache hit, then the answer as text chunks
+    """
+    if not RESPONSE_CACHE:
+        yield from answer()
+        return
+
+    cache = get_response_cache()
+    key = cache.key(route, query, file_hashes, version)
+    cached = cache.get(key, route)
+    if cached is not None:
+        yield Step("Found a cached answer to this question")
+        yield cached
+        return
+    yield from cache.cache_stream(key, route, answer())
+
+def process_response(query: str, uploaded_files) -> Iterator[Union[Step, str]]:
+    """
+    Route the query and stream the appropriate agent's answer.
+
+    Runs on a request scheduler worker, so progress is reported in the
+    stream rather than drawn on the page directly.
+
+    Args:
+        query: The user's question
+        uploaded_files: Files uploaded in the sidebar, if any
+
+    Yields:
+        Step items for intermediate steps, then the answer as text chunks
+    """
     # If file is uploaded, prioritize file summarization
     if uploaded_files:
-        file_paths = []
-        for uploaded_file in uploaded_files:
-            file_path = save_uploaded_file(uploaded_file)
-            if file_path:
-                file_paths.append(file_path)
-                thinking_steps.append(f"Processing file: {uploaded_file.name}")
-                
-        if file_paths:
-            thinking_steps.append("Analyzing documents...")
-            result = summarize_file(query, file_paths)
-            return remove_think_tags(result), thinking_steps
+        # Files are parsed from memory, so nothing is written to disk
+        uploads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+
+        def answer_files() -> Iterator[Union[Step, str]]:
+            for name, _ in uploads:
+                yield Step(f"Processing file: {name}")
+            yield Step("Analyzing documents...")
+            yield from summarize_uploads_stream(query, uploads)
+
+        # Answers about files are keyed by the file contents, not their names
+        file_hashes = [content_hash(data) for _, data in uploads]
+        yield from cached_answer("files", query, answer_files, file_hashes)
+        return
     
     # Get the agent type classification
-    thinking_steps.append("Determining the best agent for your question...")
-    llm_output = take_decision(query)
-    thinking_steps.append(f"Selected agent: {llm_output}")
+    yield Step("Determining the best agent for your question...")
+    decision = route_query(query)
+    llm_output = decision.route
+    yield Step(f"Selected agent: {llm_output} (decided by {decision.source} router in {decision.elapsed_ms:.0f} ms)")
     
     # Get response from the appropriate agent
     if llm_output == "university":
-        thinking_steps.append("Searching university knowledge base...")
-        embeddings = get_embedding_model()
-        result = uni_agent(query, embeddings)
+        def answer_university() -> Iterator[Union[Step, str]]:
+            yield Step("Searching university knowledge base...")
+            yield from uni_agent_stream(query, get_embedding_model())
+
+        # Answers from an older version of the index are not served
+        yield from cached_answer("university", query, answer_university, version=read_index_version(INDEX_NAME))
     elif llm_output == "web search":
-        thinking_steps.append("Searching the web for current information...")
-        result = web_agent(query)
+        def answer_web() -> Iterator[Union[Step, str]]:
+            yield Step("Searching the web for current information...")
+            yield from web_agent_stream(query)
+
+        yield from cached_answer("web search", query, answer_web)
     elif llm_output == "general":
-        thinking_steps.append("Analyzing your academic question...")
-        result = university_tutor(query)
+        def answer_general() -> Iterator[Union[Step, str]]:
+            yield Step("Analyzing your academic question...")
+            yield from university_tutor_stream(query)
+
+        yield from cached_answer("general", query, answer_general)
     else:
-        result = f"I'm sorry, I couldn't process your request. Please try rephrasing your question."
-    
-    # Clean up the response
-    result = remove_think_tags(result)
-    return result, thinking_steps
+        yield ErrorMessage("I'm sorry, I couldn't process your request. Please try rephrasing your question.")
+
+def answer_chunks(items: Iterable[Union[Step, str]], on_step: Callable[[str], None]) -> Iterator[str]:
+    """Pass the answer text of a process_response stream through, handing its steps to on_step"""
+    for item in items:
+        if isinstance(item, Step):
+            on_step(item.text)
+        else:
+            yield item
 
 def display_chat_message(message, is_user=False):
     """Display a chat message with improved styling"""
@@ -226,25 +312,18 @@ def display_chat_message(message, is_user=False):
             <strong>Assistant:</strong><br>{message["content"]}
         </div>""", unsafe_allow_html=True)
 
-def stream_response(placeholder, response, thinking_steps=None):
-    """Simulate streaming for better UX"""
-    full_response = response
-    displayed_response = ""
-    
-    # First show thinking steps if available
-    if thinking_steps and st.session_state.show_thinking:
-        for step in thinking_steps:
-            placeholder.markdown(f"🤔 {step}")
-            time.sleep(0.5)
-    
-    # Then stream the actual response
-    for i in range(len(full_response) // 10 + 1):
-        chunk_end = min((i + 1) * 10, len(full_response))
-        displayed_response = full_response[:chunk_end]
-        placeholder.markdown(displayed_response)
-        time.sleep(0.01)
-    
-    return displayed_response
+def stream_response(placeholder, chunks: Iterable[str]) -> str:
+    """Render the answer as the model streams it"""
+    response = ""
+    last_render = 0.0
+    for chunk in chunks:
+        response += chunk
+        now = time.perf_counter()
+        if now - last_render >= RENDER_INTERVAL:
+            placeholder.markdown(response + "▌")
+            last_render = now
+    placeholder.markdown(response)
+    return response
 
 def main():
     # Initialize session state variables
@@ -357,27 +436,38 @@ def main():
             """
             message_placeholder.markdown(loading_html, unsafe_allow_html=True)
             
-            # Process in background to not block UI
-            response_future = concurrent.futures.ThreadPoolExecutor().submit(
-                process_response, prompt, uploaded_files
-            )
-            
-            # Wait for response
+            thinking_steps = []
+
+            def on_step(step: str) -> None:
+                thinking_steps.append(step)
+                if st.session_state.show_thinking:
+                    message_placeholder.markdown(f"🤔 {step}")
+
+            # Agent work runs on the shared request scheduler; closing the stream
+            # (also when Streamlit stops this run) cancels the request
+            submitted = time.perf_counter()
             try:
-                response, thinking_steps = response_future.result(timeout=60)
-                
-                # Stream the response for better UX
-                final_response = stream_response(message_placeholder, response, thinking_steps)
-                
-                # Add to session state
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": final_response
-                })
-                st.session_state.thinking_steps = thinking_steps
-                
-            except concurrent.futures.TimeoutError:
-                message_placeholder.error("The request took too long to process. Please try a simpler question or try again later.")
+                items = get_request_scheduler().stream(process_response, prompt, uploaded_files)
+            except Busy:
+                message_placeholder.warning("The assistant is handling many questions right now. Please try again in a moment.")
+                return
+
+            with items:
+                try:
+                    # The reasoning block is not shown, so the time to first token is measured
+                    # to the first visible token, routing and retrieval included
+                    chunks = strip_think(answer_chunks(items, on_step))
+                    final_response = stream_response(message_placeholder, timed_stream("end to end", chunks, submitted))
+                except DeadlineExceeded:
+                    message_placeholder.error("The request took too long to process. Please try a simpler question or try again later.")
+                    return
+
+            # Add to session state
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": final_response
+            })
+            st.session_state.thinking_steps = thinking_steps
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,26 +1,195 @@
 import os
-from langchain.document_loaders import TextLoader
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+import argparse
+import hashlib
+import json
+from typing import Dict, Iterator, List, Optional, Set
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
-from uuid import uuid4
-
-file_path = "aup_website_data.txt"
-loader = TextLoader(file_path)
-documents = loader.load()
-
-# Split documents into smaller chunks using RecursiveCharacterTextSplitter
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-split_docs = text_splitter.split_documents(documents)
-print(f"Documents split into {len(split_docs)} chunks.")
-embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-base-en-v1.5")
-
-pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-pc = Pinecone(api_key=pinecone_api_key)
+from langchain_core.documents import Document
+
+from app.core.config import (
+    BOILERPLATE_FRACTION,
+    INGEST_BATCH_SIZE,
+    INGEST_WORKERS,
+    LOCAL_INDEX_DIR,
+    NEAR_DUPLICATE_DISTANCE,
+    VECTOR_BACKEND,
+)
+from app.utils.dedup import PageDeduplicator
+from app.utils.embeddings import set_embeddings
+from app.utils.ingest import IngestionPipeline, chunk_pages, get_vector_sink, iter_chunks, iter_pages
+from app.utils.keyword_index import BM25IndexWriter, keyword_index_path
+from app.utils.vector_store import mark_index_updated, write_sections
+
+# The scraper's JSONL output is preferred; the legacy text file is still supported.
+# file_path is only the default corpus; sync_index() takes the one to index.
+CORPUS_CANDIDATES = ["aup_website_data.jsonl.gz", "aup_website_data.jsonl", "aup_website_data.txt"]
+file_path = next((path for path in CORPUS_CANDIDATES if os.path.exists(path)), CORPUS_CANDIDATES[-1])
 index_name = "aup-website-data"
-index = pc.Index(index_name)
 
-vector_store = PineconeVectorStore(index=index, embedding=embeddings)
-uuids = [str(uuid4()) for _ in range(len(split_docs))]
-vector_store.add_documents(documents=split_docs, ids=uuids)
\ No newline at end of file
+
+def chunk_id(text: str, url: str = "") -> str:
+    """Deterministic chunk id derived from the chunk content and its page URL"""
+    key = f"{url}\0{text}" if url else text
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def manifest_path(name: str) -> str:
+    """Location of the manifest listing the chunk ids already indexed"""
+    return os.path.join(LOCAL_INDEX_DIR, name, "manifest.json")
+
+def load_manifest(path: str) -> Set[str]:
+    """Read the ids of the chunks that are already in the index"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return set(json.load(f)["ids"])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+def save_manifest(path: str, ids: Set[str]) -> None:
+    """Atomically write the ids of the chunks now in the index"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"ids": sorted(ids)}, f)
+    os.replace(tmp_path, path)
+
+def iter_unique_chunks(
+    corpus: str, splitter, chunking: str = "page", dedup: Optional[PageDeduplicator] = None
+) -> Iterator[Document]:
+    """
+    Stream the corpus chunks once each, with their content-hash id set.
+
+    "page" chunking splits within each scraped page and attaches its URL, title
+    and section, after removing boilerplate lines and near-duplicate pages with
+    a fitted deduplicator; "text" splits the file as flat text.
+    """
+    if chunking == "page":
+        pages = iter_pages(corpus)
+        if dedup is not None:
+            pages = dedup.transform(pages)
+        chunks = chunk_pages(pages, splitter)
+    else:
+        chunks = iter_chunks(corpus, splitter)
+    seen: Set[str] = set()
+    for doc in chunks:
+        id_ = chunk_id(doc.page_content, doc.metadata.get("url", ""))
+        # Identical chunks share an id, so keep the first occurrence only
+        if id_ not in seen:
+            seen.add(id_)
+            doc.id = id_
+            yield doc
+
+def sync_index(
+    corpus: str = file_path,
+    full: bool = False,
+    batch_size: int = INGEST_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+    keyword_index: bool = True,
+    chunking: str = "page",
+    dedupe: bool = True,
+) -> Dict[str, int]:
+    """
+    Bring the vector index in line with the corpus file.
+
+    The corpus is streamed and chunked lazily; only chunks whose content is not
+    in the manifest are embedded and upserted, in batches with bounded
+    concurrency, and chunks that disappeared from the corpus are deleted.
+
+    Args:
+        corpus: The scraper output to index (.jsonl, .jsonl.gz or the legacy .txt format)
+        full: Ignore the manifest and upsert every chunk again
+        batch_size: Chunks embedded and upserted per batch
+        workers: Concurrent upsert requests
+        keyword_index: Rebuild the BM25 keyword index when the corpus changed
+        chunking: "page" to chunk within scraped pages, "text" for flat text
+        dedupe: Strip boilerplate lines and near-duplicate pages ("page" chunking only)
+
+    Returns:
+        Counts of added, unchanged and removed chunks
+    """
+    print(f"Indexing {corpus} ({chunking} chunking).")
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+
+    dedup = None
+    if dedupe and chunking == "page":
+        dedup = PageDeduplicator(
+            min_fraction=BOILERPLATE_FRACTION, max_distance=NEAR_DUPLICATE_DISTANCE, splitter=text_splitter
+        ).fit(iter_pages(corpus))
+
+    path = manifest_path(index_name)
+    previous = load_manifest(path)
+    indexed = set() if full else previous
+    current: Set[str] = set()
+    sections: Dict[str, int] = {}
+    # Every chunk goes into the keyword index from the same pass, without keeping its text in memory
+    keyword_writer = BM25IndexWriter(keyword_index_path(index_name)) if keyword_index else None
+
+    def new_chunks() -> Iterator[Document]:
+        for doc in iter_unique_chunks(corpus, text_splitter, chunking, dedup):
+            current.add(doc.id)
+            if keyword_writer is not None:
+                keyword_writer.add(doc.id, doc.page_content, doc.metadata)
+            if "section" in doc.metadata:
+                sections[doc.metadata["section"]] = sections.get(doc.metadata["section"], 0) + 1
+            if doc.id not in indexed:
+                yield doc
+
+    try:
+        # Shared embedding model; unchanged chunks are served from the embedding cache
+        embeddings = set_embeddings()
+
+        # VECTOR_BACKEND selects the hosted Pinecone index or the local memory-mapped index
+        print(f"Writing to the {VECTOR_BACKEND} vector store.")
+        sink = get_vector_sink(embeddings, index_name)
+        pipeline = IngestionPipeline(embeddings, sink, batch_size=batch_size, max_workers=workers)
+        stats = pipeline.run(new_chunks(), ids=lambda doc: doc.id)
+        print(
+            f"Ingested {stats['chunks']} chunks in {stats['wall_seconds']:.1f}s "
+            f"({stats['wall_chunks_per_second']:.1f} chunks/s; chunk {stats['chunk_chunks_per_second']:.1f}, "
+            f"embed {stats['embed_chunks_per_second']:.1f}, upsert {stats['upsert_chunks_per_second']:.1f} chunks/s)"
+        )
+
+        if dedup is not None:
+            print(dedup.summary(chunks=len(current)))
+
+        removed: List[str] = sorted(previous - current)
+        if removed:
+            sink.delete(removed)
+        save_manifest(path, current)
+        # Sections let the university agent narrow searches to part of the site
+        write_sections(index_name, sections)
+        if hasattr(embeddings, "stats"):
+            print(f"Embedding cache: {embeddings.stats()}")
+
+        if stats["chunks"] or removed or full:
+            if keyword_writer is not None:
+                # The BM25 keyword index over the same chunks for hybrid retrieval
+                print(f"Keyword index built over {keyword_writer.save()} chunks: {keyword_index_path(index_name)}")
+
+            # Invalidate answers cached against the previous version of the index
+            mark_index_updated(index_name)
+
+        return {"added": stats["chunks"], "unchanged": len(current) - stats["chunks"], "removed": len(removed)}
+    finally:
+        # Remove the keyword writer's temporary file however the run ends
+        if keyword_writer is not None:
+            keyword_writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the scraped AUP corpus for retrieval.")
+    parser.add_argument("--corpus", default=file_path,
+                        help="scraper output to index (.jsonl, .jsonl.gz or the legacy .txt format)")
+    parser.add_argument("--full", action="store_true", help="re-upsert every chunk, ignoring the manifest")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="chunks embedded and upserted per batch")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="concurrent upsert requests")
+    parser.add_argument("--chunking", choices=("page", "text"), default="page",
+                        help="chunk within the scraper's pages (with URL/title/section metadata) or as flat text")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="keep boilerplate lines and near-duplicate pages")
+    parser.add_argument("--no-keyword-index", action="store_true", help="skip rebuilding the BM25 keyword index")
+    args = parser.parse_args()
+
+    counts = sync_index(corpus=args.corpus, full=args.full, batch_size=args.batch_size, workers=args.workers,
+                        keyword_index=not args.no_keyword_index, chunking=args.chunking,
+                        dedupe=not args.no_dedup)
+    print(f"Chunks added: {counts['added']}, unchanged: {counts['unchanged']}, removed: {counts['removed']}")
@@ -0,0 +1,157 @@
+import json
+import re
+import threading
+import time
+from urllib.parse import urljoin
+
+import pytest
+
+from app.utils.crawler import (
+    Crawler, CrawlStateStore, Frontier, HostRateLimiter, TokenBucket, canonicalize_url, is_asset_url,
+)
+from benchmarks.stubs import FixtureSite
+
+HREF = re.compile(r'href="([^"]+)"')
+
+
+@pytest.fixture
+def site():
+    with FixtureSite(pages=15, fanout=4) as site:
+        yield site
+
+def make_crawler(site: FixtureSite, tmp_path, **kwargs) -> Crawler:
+    prefix = site.url("/")
+    return Crawler(lambda url: url.startswith(prefix), concurrency=4, rate=1000, burst=10,
+                   state=CrawlStateStore(str(tmp_path / "state.sqlite3")), **kwargs)
+
+def extract(url, response):
+    """Page text and absolute links, standing in for dataScraper's extraction"""
+    html = response.text
+    return html, [urljoin(url, href) for href in HREF.findall(html)]
+
+def page_url(site: FixtureSite, page: int) -> str:
+    return canonicalize_url(site.url(f"/page/{page}"))
+
+
+
+def test_token_bucket_allows_a_burst_then_paces_at_the_rate():
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+    elapsed = time.monotonic() - start
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    # The four tokens beyond the burst refill at 20 per second
+    assert 0.18 <= elapsed < 0.5
+
+def test_token_bucket_is_shared_by_threads():
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(3)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 12 tokens: one from the burst, the other 11 at 50 per second
+    assert time.monotonic() - start >= 0.2
+
+def test_host_rate_limiter_limits_each_host_separately():
+    limiter = HostRateLimiter(rate=5, burst=1)
+    assert limiter.acquire("http://a.example/one") == 0.0
+    assert limiter.acquire("http://b.example/one") == 0.0
+    start = time.monotonic()
+    waited = limiter.acquire("http://a.example/two")
+    assert 0.15 <= waited < 0.4
+    assert time.monotonic() - start >= 0.15
+
+def test_recrawl_revalidates_pages_with_conditional_requests(site, tmp_path):
+    first = {page.url: page.status for page in make_crawler(site, tmp_path).crawl([site.url()], extract)}
+    assert len(first) == site.pages
+    assert set(first.values()) == {"new"}
+
+    site.update(3)
+    requests, not_modified = site.requests, site.not_modified
+    processed = []
+
+    def tracking_extract(url, response):
+        processed.append(url)
+        return extract(url, response)
+
+    second = {page.url: page.status for page in make_crawler(site, tmp_path).crawl([site.url()], tracking_extract)}
+    assert second.keys() == first.keys()
+    assert second.pop(page_url(site, 3)) == "changed"
+    assert set(second.values()) == {"unchanged"}
+    # Every page but the changed one came back 304 and was not parsed again
+    assert site.not_modified - not_modified == site.pages - 1
+    assert processed == [page_url(site, 3)]
+    # One request per URL, as in the first crawl
+    assert site.requests - requests == requests
+
+@pytest.mark.parametrize("url, canonical", [
+    ("HTTP://Example.EDU:80/a/b/", "http://example.edu/a/b"),
+    ("https://example.edu:443/index.html#top", "https://example.edu/"),
+    ("https://example.edu:8443/x", "https://example.edu:8443/x"),
+    ("https://example.edu//a/./b/../c", "https://example.edu/a/c"),
+    ("https://example.edu/p?utm_source=nav&b=2&fbclid=x&a=1", "https://example.edu/p?a=1&b=2"),
+    ("https://example.edu/p?PHPSESSID=1&q=", "https://example.edu/p?q="),
+    ("  https://example.edu/dept/default.aspx ", "https://example.edu/dept"),
+])
+def test_canonicalize_url(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+def test_is_asset_url():
+    assert is_asset_url("https://example.edu/files/Brochure.PDF?v=2")
+    assert not is_asset_url("https://example.edu/admissions")
+
+def test_frontier_orders_by_depth_then_query_then_discovery():
+    frontier = Frontier()
+    assert frontier.push("https://example.edu/b?page=2", 1)
+    assert frontier.push("https://example.edu/c", 1)
+    assert frontier.push("https://example.edu/a/", 0)
+    assert not frontier.push("https://example.edu/a#top", 2)
+    assert [frontier.pop() for _ in range(len(frontier))] == [
+        ("https://example.edu/a", 0), ("https://example.edu/c", 1), ("https://example.edu/b?page=2", 1),
+    ]
+
+def test_frontier_checkpoint_round_trip():
+    frontier = Frontier()
+    for i, depth in enumerate([2, 0, 1, 1]):
+        frontier.push(f"https://example.edu/{i}", depth)
+    frontier.pop()
+    restored = Frontier.from_dict(json.loads(json.dumps(frontier.to_dict())))
+    assert restored.seen == frontier.seen
+    assert not restored.push("https://example.edu/1", 0)
+    assert [restored.pop() for _ in range(len(restored))] == [frontier.pop() for _ in range(len(frontier))]
+
+def test_interrupted_crawl_resumes_from_its_checkpoint(site, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    crawler = make_crawler(site, tmp_path, checkpoint_path=str(checkpoint), checkpoint_every=2)
+    pages = crawler.crawl([site.url()], extract)
+    first = [next(pages).url for _ in range(5)]
+    pages.close()
+    assert json.loads(checkpoint.read_text())["done"].keys() >= set(first)
+
+    requests = site.requests
+    resumed = make_crawler(site, tmp_path, checkpoint_path=str(checkpoint))
+    urls = [page.url for page in resumed.crawl([site.url()], extract)]
+    assert len(urls) == len(set(urls)) == site.pages
+    assert resumed.stats.resumed >= 5
+    # Finished pages come from the state store instead of being fetched again
+    assert site.requests - requests < site.pages
+    assert not checkpoint.exists()
+
+def test_unchanged_responses_are_closed(site, tmp_path):
+    list(make_crawler(site, tmp_path).crawl([site.url()], extract))
+    crawler = make_crawler(site, tmp_path)
+    responses = []
+    fetch = crawler.fetch
+
+    def recording_fetch(url, previous=None):
+        response = fetch(url, previous)
+        responses.append(response)
+        return response
+
+    crawler.fetch = recording_fetch
+    list(crawler.crawl([site.url()], extract))
+    assert {response.status_code for response in responses} == {304}
+    assert all(response.raw.closed for response in responses)
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from app.utils import ingest
+from app.utils.ingest import IngestionPipeline, LocalSink, with_retry
+from app.utils.vector_store import LocalVectorStore
+from benchmarks.stubs import StubEmbeddings, StubSink
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ingest.time, "sleep", delays.append)
+    return delays
+
+def flaky(failures: int):
+    calls = []
+
+    def fn(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise ConnectionError("flaky")
+        return value * 2
+
+    return fn, calls
+
+def test_with_retry_backs_off_exponentially_until_success(sleeps):
+    fn, calls = flaky(3)
+    assert with_retry(fn, 21, retries=5, backoff=0.1) == 42
+    assert len(calls) == 4
+    # Each delay is the doubled backoff with +/-50% jitter
+    for attempt, delay in enumerate(sleeps):
+        assert 0.05 * 2 ** attempt <= delay < 0.15 * 2 ** attempt
+
+def test_with_retry_raises_the_last_error(sleeps):
+    fn, calls = flaky(10)
+    with pytest.raises(ConnectionError):
+        with_retry(fn, 1, retries=2, backoff=0.1)
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def chunks(n: int, fail_at: int = -1):
+    for i in range(n):
+        if i == fail_at:
+            raise RuntimeError("corpus read failed")
+        yield Document(page_content=f"chunk {i} about tuition", id=str(i))
+
+class FailingSink(LocalSink):
+    """LocalSink whose upserts fail after the first few batches"""
+
+    def __init__(self, store, succeed: int):
+        super().__init__(store)
+        self.succeed = succeed
+
+    def upsert(self, *args):
+        with self._lock:
+            self.succeed -= 1
+            failing = self.succeed < 0
+        if failing:
+            raise ConnectionError("upsert failed")
+        super().upsert(*args)
+
+class FailingEmbeddings(StubEmbeddings):
+    def embed_documents(self, texts):
+        raise ConnectionError("embedding failed")
+
+def test_pipeline_upserts_every_chunk_with_retries(sleeps):
+    sink = StubSink(failure_rate=0.3)
+    stats = IngestionPipeline(StubEmbeddings(dim=8), sink, batch_size=7, max_workers=3).run(
+        chunks(100), ids=lambda doc: doc.id
+    )
+    assert stats["chunks"] == 100
+    assert stats["batches"] == 15
+    assert sorted(sink.vectors, key=int) == [str(i) for i in range(100)]
+    assert sink.failures > 0
+
+@pytest.mark.parametrize("embeddings, make_sink, stream", [
+    (StubEmbeddings(dim=8), LocalSink, chunks(50, fail_at=23)),
+    (FailingEmbeddings(dim=8), LocalSink, chunks(50)),
+    (StubEmbeddings(dim=8), lambda store: FailingSink(store, succeed=2), chunks(50)),
+], ids=["chunk iterator", "embedding", "upsert"])
+def test_failed_run_discards_its_writes(tmp_path, sleeps, embeddings, make_sink, stream):
+    store = LocalVectorStore(StubEmbeddings(dim=8), path=str(tmp_path))
+    store.add_texts(["existing"], ids=["existing"])
+    pipeline = IngestionPipeline(embeddings, make_sink(store), batch_size=5, max_workers=2, retries=1)
+    with pytest.raises(Exception):
+        pipeline.run(stream, ids=lambda doc: doc.id)
+    # No temporary files are left and the index is unchanged
+    assert sorted(os.listdir(tmp_path)) == ["offsets.npy", "records.bin", "vectors.npy"]
+    reopened = LocalVectorStore(StubEmbeddings(dim=8), path=str(tmp_path))
+    assert len(reopened) == 1
+
+def test_local_sink_writes_every_batch_on_close(tmp_path):
+    store = LocalVectorStore(StubEmbeddings(dim=8), path=str(tmp_path))
+    IngestionPipeline(StubEmbeddings(dim=8), LocalSink(store), batch_size=8).run(chunks(40), ids=lambda doc: doc.id)
+    reopened = LocalVectorStore(StubEmbeddings(dim=8), path=str(tmp_path))
+    assert len(reopened) == 40
+    assert {doc.id for doc in reopened.similarity_search("tuition", k=50)} == {str(i) for i in range(40)}
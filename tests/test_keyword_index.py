@@ -0,0 +1,35 @@
+import os
+import random
+
+from app.utils.keyword_index import BM25Index, BM25IndexWriter
+
+WORDS = "hostel fee library admission course exam tuition campus bus visa scholarship dean".split()
+
+
+def test_streamed_index_matches_one_built_in_memory(tmp_path):
+    rng = random.Random(0)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 30))) for _ in range(200)]
+    metadatas = [{"section": rng.choice(["a", "b"])} for _ in texts]
+    ids = [f"id{i}" for i in range(len(texts))]
+
+    path = tmp_path / "bm25.npz"
+    with BM25IndexWriter(str(path)) as writer:
+        for id_, text, metadata in zip(ids, texts, metadatas):
+            writer.add(id_, text, metadata)
+        assert writer.save() == len(texts)
+    assert os.listdir(tmp_path) == ["bm25.npz"]
+
+    streamed = BM25Index.load(str(path))
+    built = BM25Index.build(texts, metadatas, ids)
+    built.save(str(tmp_path / "built.npz"))
+    built = BM25Index.load(str(tmp_path / "built.npz"))
+    assert streamed.records == built.records
+    for query in ["hostel fee", "visa dean", "unknown"]:
+        for filter in (None, {"section": "a"}):
+            assert ([(doc.id, round(score, 5)) for doc, score in streamed.search(query, k=10, filter=filter)]
+                    == [(doc.id, round(score, 5)) for doc, score in built.search(query, k=10, filter=filter)])
+
+def test_unsaved_writer_leaves_no_files(tmp_path):
+    with BM25IndexWriter(str(tmp_path / "bm25.npz")) as writer:
+        writer.add("a", "library")
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,46 @@
+import os
+
+from app.utils.vector_store import LocalVectorStore
+from benchmarks.stubs import StubEmbeddings
+
+EMBEDDINGS = StubEmbeddings(dim=16)
+
+
+def reopen(path) -> LocalVectorStore:
+    return LocalVectorStore(EMBEDDINGS, path=str(path))
+
+def test_add_replace_and_delete_survive_a_reopen(tmp_path):
+    store = reopen(tmp_path)
+    store.add_texts(["hostel fees", "library hours", "exam schedule"], ids=["a", "b", "c"],
+                    metadatas=[{"section": "hostel"}, {"section": "library"}, {"section": "exams"}])
+    assert len(reopen(tmp_path)) == 3
+
+    store.add_texts(["library opening times"], ids=["b"], metadatas=[{"section": "library"}])
+    store.add_texts(["admission deadline"], ids=["d"], metadatas=[{"section": "admissions"}])
+    assert store.delete(["c", "missing"])
+    assert not store.delete(["missing"])
+
+    reopened = reopen(tmp_path)
+    assert len(reopened) == 3
+    texts = {doc.id: doc.page_content for doc in reopened.similarity_search("library", k=10)}
+    assert texts == {"a": "hostel fees", "b": "library opening times", "d": "admission deadline"}
+    [(doc, score)] = reopened.similarity_search_with_score("library opening times", k=1)
+    assert doc.id == "b" and doc.metadata == {"section": "library"} and score > 0.99
+    assert [doc.id for doc in reopened.similarity_search("fees", k=5, filter={"section": "hostel"})] == ["a"]
+    assert sorted(os.listdir(tmp_path)) == ["offsets.npy", "records.bin", "vectors.npy"]
+
+def test_writer_applies_changes_only_on_commit(tmp_path):
+    store = reopen(tmp_path)
+    store.add_texts(["one", "two"], ids=["1", "2"])
+    with store.writer() as writer:
+        writer.add(["3"], ["three"], EMBEDDINGS.embed_documents(["three"]))
+        writer.delete(["1"])
+        assert len(store) == 2
+        assert writer.commit() == 2
+    assert sorted(doc.id for doc in reopen(tmp_path).similarity_search("x", k=5)) == ["2", "3"]
+
+    writer = store.writer()
+    writer.add(["4"], ["four"], EMBEDDINGS.embed_documents(["four"]))
+    writer.abort()
+    assert len(reopen(tmp_path)) == 2
+    assert sorted(os.listdir(tmp_path)) == ["offsets.npy", "records.bin", "vectors.npy"]